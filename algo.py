@@ -1,9 +1,10 @@
 from datetime import datetime
 from src.algorithm.score import ScoreExample, Filter, SCORE_ENTRY_KEYS
 from src.data.data_services import DataServices
+from src.data.universe import UniverseIndex
 from flask import Flask, request
 from src.algorithm.stock_list import LONG_TICKER_LIST
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import logging
 
 algo = Flask(__name__)
@@ -42,26 +43,35 @@ def gain_from_buy_and_sell(ticker: str, start: datetime, end: datetime) -> float
         return 0
 
 
-def get_scores(filter_params: List[Filter], short_list: bool = False) -> List:
+def gains_from_buy_and_sell(tickers: List[str], start: datetime, end: datetime) -> Dict[str, float]:
+    ds = DataServices()
+    prices = ds.get_prices_at(tickers, [start, end])
+    return {ticker: end_price / start_price if start_price else 0
+            for ticker, (start_price, end_price) in prices.items()}
+
+
+def get_scores(filter_params: List[Filter], short_list: bool = False, sort: str = None, descending: bool = False,
+               limit: int = None, cursor: str = None) -> Tuple[List, Optional[str]]:
     """
-    Returns a list of tickers with their scores (after filtering)
-    :return:
+    Returns a list of tickers with their scores (after filtering), or a page of them when sort, limit or cursor
+    is passed, see BaseScore.compute_score. Gains are only looked up for the returned tickers
+    :return: the scores, and the cursor of the next page
     """
     ticker_list = SHORT_TICKER_LIST if short_list else LONG_TICKER_LIST
-    algo_score = ScoreExample(ticker_list, FINANCE_START_DATE, FINANCE_END_DATE)
-    algo_score.compute_score(filter_params)
+    algo_score = ScoreExample(ticker_list, FINANCE_START_DATE, FINANCE_END_DATE, universe=UniverseIndex.load())
+    algo_score.compute_score(filter_params, sort, descending, limit, cursor)
+    gains = gains_from_buy_and_sell([score_entry.ticker for score_entry in algo_score.score_list],
+                                    BUY_DATE, SELL_DATE)
     response = []
     for score_entry in algo_score.score_list:
-        ticker = score_entry.ticker
-        gain = gain_from_buy_and_sell(ticker, BUY_DATE, SELL_DATE)
         entry = {name: value for name, value in score_entry._asdict().items()}
-        entry['gain'] = gain
+        entry['gain'] = gains[score_entry.ticker]
         response.append(entry)
-    return response
+    return response, algo_score.next_cursor
 
 
 def main(filter_params: List[Filter]):
-    score_list = get_scores(filter_params, short_list=True)
+    score_list, _ = get_scores(filter_params, short_list=True)
     if not score_list:
         print('No stocks match the filter')
         return
@@ -111,22 +121,45 @@ def print_table(score_list):
     print(f'avg \t{avg_gain*100:.2f}%')
 
 
-def calc_stats(score_list: List[Dict]) -> Dict:
-    avg_score = sum(s.get('gain') for s in score_list)/len(score_list)
-    index_list = [{ticker: gain_from_buy_and_sell(ticker, BUY_DATE, SELL_DATE)}
-                  for ticker in INDEX_LIST]
+def calc_stats(score_list: List[Dict], next_cursor: str = None) -> Dict:
+    avg_score = sum(s.get('gain') for s in score_list)/len(score_list) if score_list else 0
+    index_gains = gains_from_buy_and_sell(INDEX_LIST, BUY_DATE, SELL_DATE)
+    index_list = [{ticker: gain} for ticker, gain in index_gains.items()]
     return {
         'score_list': score_list,
         'avg_gain': avg_score,
-        'index_gains': index_list
+        'index_gains': index_list,
+        'next_cursor': next_cursor
     }
 
 
+def page_params() -> Dict:
+    """
+    Read the ranking query parameters: sort=<field> ascending or sort=-<field> descending, limit and cursor
+    :return: get_scores keyword arguments
+    """
+    sort = request.args.get('sort') or None
+    limit = request.args.get('limit')
+    return {
+        'sort': sort.lstrip('-') if sort else None,
+        'descending': bool(sort) and sort.startswith('-'),
+        'limit': int(limit) if limit else None,
+        'cursor': request.args.get('cursor') or None
+    }
+
+
+def scores_response(filter_params: List[Filter]):
+    is_short_list = request.args.get('short_list', '').lower() == 'true'
+    try:
+        score_list, next_cursor = get_scores(filter_params, is_short_list, **page_params())
+    except ValueError as error:
+        return {'error': str(error)}, 400
+    return calc_stats(score_list, next_cursor)
+
+
 @algo.route('/api/ticker-scores', methods=['GET'])
 def get_all_scores():
-    is_short_list = request.args.get('short_list', '').lower() == 'true'
-    score_list = get_scores([], is_short_list)
-    return calc_stats(score_list)
+    return scores_response([])
 
 
 @algo.route('/api/ticker-scores', methods=['POST'])
@@ -144,9 +177,7 @@ def get_ticker_scores():
             )
         )
 
-    is_short_list = request.args.get('short_list', '').lower() == 'true'
-    score_list = get_scores(filter_params, is_short_list)
-    return calc_stats(score_list)
+    return scores_response(filter_params)
 
 
 @algo.route('/api/filters', methods=['GET'])
@@ -7,5 +7,21 @@ CREATE TABLE IF NOT EXISTS sec_idx (
     company TEXT,
     report_type TEXT,
     url TEXT,
-    PRIMARY KEY (cik, year)
-);
\ No newline at end of file
+    PRIMARY KEY (cik, year),
+    INDEX sec_idx_year (year, cik)
+);
+
+CREATE TABLE IF NOT EXISTS ingest_progress (
+    cik INT,
+    year INT,
+    status VARCHAR(16),
+    updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (year, cik)
+);
+
+CREATE TABLE IF NOT EXISTS index_files (
+    path VARCHAR(255) PRIMARY KEY,
+    etag VARCHAR(255),
+    last_modified VARCHAR(64),
+    updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,2 @@
+-- sec_idx is read one year at a time, while its primary key leads with cik
+CREATE INDEX sec_idx_year ON sec_idx (year, cik);
@@ -0,0 +1,8 @@
+-- per filing status of the whole year ingestion, see SecGov.ingest_year
+CREATE TABLE IF NOT EXISTS ingest_progress (
+    cik INT,
+    year INT,
+    status VARCHAR(16),
+    updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (year, cik)
+);
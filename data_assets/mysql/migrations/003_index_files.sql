@@ -0,0 +1,7 @@
+-- ETag and Last-Modified of the stored edgar index files, see SecGov.refresh_index
+CREATE TABLE IF NOT EXISTS index_files (
+    path VARCHAR(255) PRIMARY KEY,
+    etag VARCHAR(255),
+    last_modified VARCHAR(64),
+    updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -16,21 +16,38 @@ def main():
     parser.add_argument("--ticker",
                         type=str,
                         help="Add a single ticker to the database")
+    parser.add_argument("--refresh-index",
+                        action='store_true',
+                        help="Fetch the new and changed edgar index files of each year first, "
+                             "queueing their new filings for --bulk")
+    parser.add_argument("--bulk",
+                        action='store_true',
+                        help="Ingest the 10-K of every filer of each year, resuming where a previous run stopped")
+    parser.add_argument("--retry-failed",
+                        action='store_true',
+                        help="With --bulk, ingest again the filings that failed in previous runs")
     args = parser.parse_args()
     # Startup parameters
     year_start = args.yearStart
     year_end = args.yearEnd
 
     ds = DataServices()
+    if args.refresh_index:
+        for year in range(year_start, year_end + 1):
+            ds.sec_gov.refresh_index(year)
+
     ticker_list = ds.fetch_ticker_list()
     if args.ticker:
         ticker_list = [args.ticker]
 
-    for ticker in ticker_list:
-        ds.fetch_ticker_prices(ticker)
+    # prices first, the market cap of the financials is computed from them
+    ds.refresh_prices(ticker_list)
 
+    if args.bulk and not args.ticker:
         for year in range(year_start, year_end + 1):
-            ds.fetch_ticker_financials_by_year(year, ticker)
+            ds.sec_gov.ingest_year(year, args.retry_failed)
+    else:
+        ds.fetch_financials_many(ticker_list, list(range(year_start, year_end + 1)))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,37 @@
+import argparse
+import logging
+import sys
+from src.data.sec_gov import SecGov
+
+
+def main():
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Re-extract the financials extracted by an older parser version '
+                                                 'or ELEMENT_LIST')
+    parser.add_argument("yearStart",
+                        type=int,
+                        help="The first year to check")
+    parser.add_argument("yearEnd",
+                        type=int,
+                        help="The last year to check")
+    parser.add_argument("--ticker",
+                        type=str,
+                        help="Check a single ticker")
+    parser.add_argument("--dry-run",
+                        action='store_true',
+                        help="Only list the stale rows")
+    args = parser.parse_args()
+
+    sec_gov = SecGov()
+    years = list(range(args.yearStart, args.yearEnd + 1))
+    tickers = [args.ticker] if args.ticker else None
+    if args.dry_run:
+        for ticker, year, _ in sec_gov.find_stale_financials(years, tickers):
+            print(f'{ticker} {year}')
+    else:
+        count = sec_gov.reextract_stale(years, tickers)
+        logging.info(f'Re-extracted {count} financials')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def to_float(value) -> float:
+    """
+    Parse a stored financial value, NaN for the values the per ticker score functions skip:
+    missing, empty or not numeric
+    """
+    if not value:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class FinancialsCube:
+    """
+    Financials of many tickers as a tickers x years x fields float64 array, NaN where a value is missing.
+    Every value is parsed once, so scores are computed for the whole universe in a few vectorized passes.
+    """
+
+    def __init__(self, tickers: List[str], years: List[int], fields: List[str], values: np.ndarray,
+                 present: np.ndarray):
+        """
+        :param tickers:
+        :param years:
+        :param fields: raw financial field names, e.g. GrossProfit
+        :param values: tickers x years x fields
+        :param present: tickers x years, False where no financials are stored for the year
+        """
+        self.tickers = tickers
+        self.years = years
+        self.fields = fields
+        self.values = values
+        self.present = present
+        self._column_of = {field: column for column, field in enumerate(fields)}
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        """
+        :param field:
+        :return: tickers x years view of the field
+        """
+        return self.values[:, :, self._column_of[field]]
+
+    @classmethod
+    def from_financials(cls, financials: Dict[str, Dict[str, dict]], tickers: List[str], years: List[int],
+                        fields: List[str]) -> 'FinancialsCube':
+        """
+        :param financials: ticker to str(year) to financials, as returned by DataServices.get_financials_bulk
+        :param tickers: the rows, tickers without financials have no present year
+        :param years:
+        :param fields:
+        :return:
+        """
+        rows = []
+        for ticker in tickers:
+            by_year = financials.get(ticker) or {}
+            rows.extend(by_year.get(str(year)) or None for year in years)
+        return cls.from_rows(tickers, years, fields, rows)
+
+    @classmethod
+    def from_rows(cls, tickers: List[str], years: List[int], fields: List[str],
+                  rows: List[Optional[dict]]) -> 'FinancialsCube':
+        """
+        :param tickers:
+        :param years:
+        :param fields:
+        :param rows: the financials of every ticker and year, in ticker then year order, None for the years
+        without financials. They may hold only the cube fields, see DataAccess.get_ticker_fields_many
+        :return:
+        """
+        values = np.full((len(tickers), len(years), len(fields)), np.nan)
+        present = np.zeros((len(tickers), len(years)), dtype=bool)
+        for i, entry in enumerate(rows):
+            if entry is not None:
+                row, column = divmod(i, len(years))
+                present[row, column] = True
+                values[row, column] = [to_float(entry.get(field)) for field in fields]
+        return cls(tickers, years, fields, values, present)
@@ -0,0 +1,60 @@
+import base64
+import heapq
+import json
+from typing import Callable, List, Optional, Sequence, Tuple
+
+
+def _sort_key(key: str, descending: bool) -> Callable:
+    # ties are broken by ticker, so every entry has a single position a cursor can point to
+    if descending:
+        return lambda entry: (-getattr(entry, key), entry.ticker)
+    return lambda entry: (getattr(entry, key), entry.ticker)
+
+
+def encode_cursor(key: str, descending: bool, entry) -> str:
+    """
+    :return: an opaque cursor pointing after the entry in the ranking by key
+    """
+    data = json.dumps([key, descending, getattr(entry, key), entry.ticker])
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str, key: str, descending: bool) -> Tuple[float, str]:
+    """
+    :return: the value and ticker of the entry the cursor points after
+    :raise ValueError: if the cursor is malformed or was issued for another ranking
+    """
+    try:
+        cursor_key, cursor_descending, value, ticker = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as error:
+        raise ValueError(f'invalid cursor {cursor!r}') from error
+    if cursor_key != key or cursor_descending != descending:
+        raise ValueError(f'cursor {cursor!r} is for another sort order')
+    return value, ticker
+
+
+def rank(entries: Sequence, key: str, descending: bool = False, limit: int = None,
+         cursor: str = None) -> Tuple[List, Optional[str]]:
+    """
+    Select a page of the entries ranked by one of their fields, with a heap holding only the page
+    :param entries: namedtuples with a ticker field
+    :param key: the field to rank by
+    :param descending:
+    :param limit: page size, all the remaining entries if None
+    :param cursor: returned with the previous page, the page starts after the entry it points to
+    :return: the page, and the cursor of the next page, None if it's the last one
+    """
+    sort_key = _sort_key(key, descending)
+    if cursor is not None:
+        value, ticker = decode_cursor(cursor, key, descending)
+        start = (-value if descending else value, ticker)
+        entries = [entry for entry in entries if sort_key(entry) > start]
+    if limit is None:
+        return sorted(entries, key=sort_key), None
+
+    # one more than the page tells if there is a next one
+    page = heapq.nsmallest(limit + 1, entries, key=sort_key)
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, encode_cursor(key, descending, page[-1]) if page else None
@@ -1,13 +1,21 @@
 import logging
 from dataclasses import dataclass
 from src.algorithm.utils import TickerData
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
-from src.algorithm.utils import Statements, Income, dict2income, dict2balance_sheet, dict2profile
+from src.algorithm.utils import Statements, Income
 from operator import itemgetter
 from collections import namedtuple
-from src.algorithm.score_functions import average, avg_growth
+from src.algorithm.score_functions import average, avg_growth, avg_growth_columns, average_columns, \
+    average_ratio_columns, last_year_columns
+from src.algorithm.columnar import FinancialsCube
+from src.algorithm.screening import ScreeningPlanner
+from src.algorithm.ranking import decode_cursor, rank
+from src.algorithm.workers import run_concurrently
+import numpy as np
+from src.common import config
 from src.data.data_services import DataServices
+from src.data.universe import UniverseIndex
 
 SCORE_ENTRY_KEYS = ['grossProfitGrowth', 'incomeGrowth', 'RnDRatio', 'cashPerDebt',
                                   'netIncome', 'mktCap']
@@ -23,13 +31,44 @@ class Filter:
 
 
 class BaseScore:
-
-    def __init__(self, ticker_list: List[str], start_date: datetime, end_date: datetime):
+    # TODO: get years dynamically
+    FROM_YEAR = 2016
+    TO_YEAR = 2019
+    # raw financial fields score_columns reads, sub-classes that set them are scored for all the tickers
+    # at once in vectorized passes instead of with score per ticker, unless they override score without
+    # overriding score_columns too, see vectorized
+    COLUMNS: List[str] = []
+    # score name to the raw financial fields it's computed from and its vectorized computation over a cube
+    # of those fields, which lets the screening planner rule tickers out before loading all their financials
+    SCORE_COLUMNS: Dict[str, Tuple[List[str], Callable[[FinancialsCube], np.ndarray]]] = {}
+
+    def __init__(self, ticker_list: List[str], start_date: datetime, end_date: datetime,
+                 universe: UniverseIndex = None, universe_query: Dict = None,
+                 workers: int = config.SCORE_WORKERS, ticker_timeout: float = config.SCORE_TICKER_TIMEOUT):
+        """
+        :param ticker_list:
+        :param start_date:
+        :param end_date:
+        :param universe: when passed, only tickers that can pass the filters according to it are processed
+        :param universe_query: extra UniverseIndex.select criteria, e.g. exchanges
+        :param workers: tickers processed concurrently by the per ticker score, 1 to process them in turn
+        :param ticker_timeout: seconds a ticker may take before it's given up, when processed concurrently
+        """
         self.ticker_list = ticker_list
         self.start_date = start_date
         self.end_date = end_date
+        self.universe = universe
+        self.universe_query = universe_query or {}
         self.score_list = []
         self.ds = DataServices()
+        # ticker to str(year) to financials, loaded in bulk by compute_score
+        self.financials: Dict[str, Dict[str, dict]] = {}
+        self.workers = workers
+        self.ticker_timeout = ticker_timeout
+        # ticker to the reason it could not be scored, filled by compute_score
+        self.failures: Dict[str, str] = {}
+        # cursor of the page after score_list when compute_score returned a page, None if it's the last one
+        self.next_cursor: Optional[str] = None
 
     def filter_by_date(self, income_list: List[Income]) -> List[Income]:
         new_income_list: List[Income] = []
@@ -40,78 +79,194 @@ class BaseScore:
                 print(f'ValueError: could not parse {income.Date}')
         return new_income_list
 
-    def compute_score(self, filter_params: List[Filter]):
+    def candidate_tickers(self, filter_params: List[Filter]) -> List[str]:
         """
-
+        Narrow the ticker list using the universe index, before any financials are loaded.
+        Tickers the index doesn't know or has no market cap for are kept, since they can't be ruled out.
+        :param filter_params:
+        :return: the tickers to process, in ticker list order
+        """
+        if self.universe is None:
+            return self.ticker_list
+
+        query = dict(self.universe_query)
+        # the index market cap only matches the score's mktCap if taken from the same year
+        if self.universe.year == self.end_date.year:
+            for current_filter in filter_params:
+                if current_filter.name == 'mktCap':
+                    query['min_mkt_cap'] = current_filter.min
+                    query['max_mkt_cap'] = current_filter.max
+                    # no MarketCap stored yet for the year, the full load fetches it
+                    query['unknown_mkt_cap'] = True
+        if not query:
+            return self.ticker_list
+
+        selected = set(self.universe.select(tickers=self.ticker_list, **query))
+        candidates = [ticker for ticker in self.ticker_list if ticker in selected or ticker not in self.universe]
+        logging.info(f'universe index selected {len(candidates)}/{len(self.ticker_list)} tickers')
+        return candidates
+
+    def compute_score(self, filter_params: List[Filter], sort: str = None, descending: bool = False,
+                      limit: int = None, cursor: str = None):
+        """
+        When any of sort, limit or cursor is passed, score_list is a page of the scores ranked by a field,
+        otherwise all the scores in the sort method order
+        :param filter_params:
+        :param sort: the SCORE_ENTRY_KEYS field to rank by, defaults to the first one
+        :param descending:
+        :param limit: page size
+        :param cursor: next_cursor of the previous page
         :return: List where each row contains the ticker name and a scores (maybe more than 1)
         """
+        paged = sort is not None or limit is not None or cursor is not None
+        sort = sort or SCORE_ENTRY_KEYS[0]
+        # bad requests fail before anything is loaded
+        if sort not in SCORE_ENTRY_KEYS:
+            raise ValueError(f'cannot sort by {sort!r}, expected one of {SCORE_ENTRY_KEYS}')
+        if limit is not None and limit < 0:
+            raise ValueError(f'invalid limit {limit}')
+        if cursor is not None:
+            decode_cursor(cursor, sort, descending)
 
         score_list: [ScoreEntry] = []
-
-        for ticker in self.ticker_list:
-            score = self.process_ticker(ticker)
-            score_list.append(score)
+        self.failures = {}
+        self.next_cursor = None
+
+        candidates = self.candidate_tickers(filter_params)
+        vectorized = self.vectorized()
+        if vectorized and self.SCORE_COLUMNS and filter_params:
+            planner = ScreeningPlanner(self.ds.get_financials_fields, list(range(self.FROM_YEAR, self.TO_YEAR)),
+                                       self.SCORE_COLUMNS)
+            candidates = planner.screen(candidates, filter_params)
+        self.financials = self.ds.get_financials_bulk(candidates, list(range(self.FROM_YEAR, self.TO_YEAR + 1)))
+        if vectorized:
+            # same years get_financials returns
+            cube = FinancialsCube.from_financials(self.financials, candidates,
+                                                  list(range(self.FROM_YEAR, self.TO_YEAR)), self.COLUMNS)
+            score_list = self.score_columns(cube)
+            self.failures = {ticker: 'missing financials' for ticker, score in zip(candidates, score_list)
+                             if score is None}
+        elif self.workers > 1:
+            score_list = self.process_tickers(candidates)
+        else:
+            for ticker in candidates:
+                score = self.process_ticker(ticker)
+                score_list.append(score)
 
         self.score_list: [ScoreEntry] = [score for score in score_list if score]
         self.filter(filter_params)
-        self.sort()
+        if paged:
+            self.score_list, self.next_cursor = rank(self.score_list, sort, descending, limit, cursor)
+        else:
+            self.sort()
+
+    def vectorized(self) -> bool:
+        """
+        :return: True if the scores are computed by score_columns, which holds only if it's the same score as
+        score: COLUMNS is set and score isn't overridden by a class deriving from the one defining score_columns
+        """
+        if not self.COLUMNS:
+            return False
+        mro = type(self).__mro__
+        score_owner = next(cls for cls in mro if 'score' in vars(cls))
+        columns_owner = next(cls for cls in mro if 'score_columns' in vars(cls))
+        return issubclass(columns_owner, score_owner)
 
     def score(self, ticker: str, ticker_data: TickerData) -> ScoreEntry:
         raise Exception("Unimplemented exception")
 
+    def score_columns(self, cube: FinancialsCube) -> List[ScoreEntry]:
+        """
+        Score every ticker of the cube, same as score does one ticker at a time
+        :param cube: the COLUMNS of the candidate tickers
+        :return: the scores, None for the tickers that can't be scored
+        """
+        raise Exception("Unimplemented exception")
+
     def filter(self, filter_params: List[Filter]) -> None:
         pass
 
     def sort(self):
         self.score_list.sort()
 
-    # TODO: get years dynamically
-    def get_financials(self, ticker: str, from_year: int = 2016, to_year: int = 2019,
+    def load_ticker_data(self, ticker: str, from_year: int = FROM_YEAR, to_year: int = TO_YEAR) -> TickerData:
+        """
+        Load the financials of a ticker once for all its statements, from the ones compute_score loaded in bulk
+        when it has them. Its prices are only loaded if the score asks for them.
+        :param ticker:
+        :param from_year:
+        :param to_year: exclusive
+        :return:
+        """
+        resp = self.financials.get(ticker)
+        if resp is None or any(str(year) not in resp for year in range(from_year, to_year)):
+            resp = self.ds.get_financials_bulk([ticker], list(range(from_year, to_year)))[ticker]
+        return TickerData.from_financials(
+            resp, range(from_year, to_year),
+            load_prices=lambda: self.ds.get_ticker_prices(ticker, from_year, to_year, columnar=True))
+
+    def get_financials(self, ticker: str, from_year: int = FROM_YEAR, to_year: int = TO_YEAR,
                        statement: Statements = Statements.Income, ) -> List[Income]:
-        resp = self.ds.get_ticker_data(ticker, from_year, to_year)
-        fin_by_year = []
-        for year in range(from_year, to_year):
-            element = resp.get(str(year))
-            if element:
-                element['date'] = str(year)
-                fin_by_year.append(element)
-
-        financial_list = []
-
+        ticker_data = self.load_ticker_data(ticker, from_year, to_year)
         if statement == Statements.Income:
-            financial_list = [dict2income(d) for d in fin_by_year]
+            return ticker_data.income_list
         elif statement == Statements.BalanceSheet:
-            financial_list = [dict2balance_sheet(d) for d in fin_by_year]
+            return ticker_data.balance_sheet_list
         elif statement == Statements.Profile:
-            financial_list = [dict2profile(d) for d in fin_by_year]
+            return ticker_data.profile
+        return []
 
-        return financial_list
+    def process_tickers(self, tickers: List[str]) -> List[Optional[ScoreEntry]]:
+        """
+        Process the tickers on a pool of worker threads, a ticker running for longer than ticker_timeout
+        is given up, see run_concurrently
+        :param tickers:
+        :return: the scores in ticker order, None for the tickers that failed or timed out
+        """
+        score_list, failures = run_concurrently(lambda ticker: self.score(ticker, self.load_ticker_data(ticker)),
+                                                tickers, self.workers, self.ticker_timeout)
+        self.failures.update({tickers[i]: reason for i, reason in failures.items()})
+        if self.failures:
+            logging.info(f'failed to score {len(self.failures)}/{len(tickers)} tickers')
+        return score_list
 
     def process_ticker(self, ticker) -> ScoreEntry:
-        financial_dict = {}
         try:
-            for statement_type in [Statements.Income, Statements.BalanceSheet]:
-                data_by_year = self.get_financials(ticker, statement=statement_type)
-                data_until_today = self.filter_by_date(data_by_year)
-                financial_dict[statement_type] = data_until_today
-
-            ticker_data = TickerData(
-                profile=self.get_financials(ticker, statement=Statements.Profile),
-                income_list=financial_dict[Statements.Income],
-                balance_sheet_list=financial_dict[Statements.BalanceSheet],
-                # cash_flow_list=financial_dict[Statements.CashFlow]
-            )
-            return self.score(ticker, ticker_data)
+            return self.score(ticker, self.load_ticker_data(ticker))
         except Exception as e:
+            self.failures[ticker] = f'{type(e).__name__}: {e}'
             print(f'Error processing {ticker!r}: {e}')
 
 
+def _last_year(field: str) -> Callable[[FinancialsCube], np.ndarray]:
+    return lambda cube: last_year_columns(cube[field], cube.present)
+
+
+def _cash_per_debt(cube: FinancialsCube) -> np.ndarray:
+    last_assets = last_year_columns(cube['Assets'], cube.present)
+    last_liabilities = last_year_columns(cube['Liabilities'], cube.present)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.isnan(last_assets) | np.isnan(last_liabilities), 0, last_assets / last_liabilities)
+
+
 class ScoreExample(BaseScore):
+    COLUMNS = ['GrossProfit', 'NetIncome', 'RndExpenses', 'OperatingExpenses', 'Assets', 'Liabilities',
+               'MarketCap']
+    SCORE_COLUMNS = {
+        'grossProfitGrowth': (['GrossProfit'], lambda cube: avg_growth_columns(cube['GrossProfit'], cube.present)),
+        'incomeGrowth': (['NetIncome'], lambda cube: avg_growth_columns(cube['NetIncome'], cube.present)),
+        'RnDRatio': (['RndExpenses', 'OperatingExpenses'],
+                     lambda cube: average_ratio_columns(cube['RndExpenses'], cube['OperatingExpenses'])),
+        'cashPerDebt': (['Assets', 'Liabilities'], _cash_per_debt),
+        'netIncome': (['NetIncome'], lambda cube: average_columns(cube['NetIncome'])),
+        'mktCap': (['MarketCap'], _last_year('MarketCap')),
+    }
 
     def score(self, ticker: str, ticker_data: TickerData) -> ScoreEntry:
         """
         Example of a score algorithm. To make your own score algorithm you can change the code here, or sub-class
-        the BaseScore class and implement the score method
+        the BaseScore class and implement the score method. ScoreExample scores with score_columns, the vectorized
+        version of this method: change both, or only score in a sub-class, which is then scored per ticker
 
         :param ticker_data:
         :param ticker:
@@ -155,6 +310,18 @@ class ScoreExample(BaseScore):
             mktCap=float(ticker_data.profile[-1].mktCap)
         )
 
+    def score_columns(self, cube: FinancialsCube) -> List[ScoreEntry]:
+        columns = {name: compute(cube) for name, (_, compute) in self.SCORE_COLUMNS.items()}
+        last_assets = last_year_columns(cube['Assets'], cube.present)
+        last_liabilities = last_year_columns(cube['Liabilities'], cube.present)
+        # the tickers score fails on: no financials, no market cap, or assets over zero liabilities
+        scored = cube.present.any(axis=1) & ~np.isnan(columns['mktCap']) & \
+            ~(~np.isnan(last_assets) & (last_liabilities == 0))
+        rows = zip(cube.tickers, *(columns[name].tolist() for name in SCORE_ENTRY_KEYS), scored.tolist())
+        score_list = [ScoreEntry(*row[:-1]) if row[-1] else None for row in rows]
+        logging.info(f'scored {int(scored.sum())}/{len(cube)} tickers')
+        return score_list
+
     def sort(self):
         self.score_list = sorted(self.score_list, key=itemgetter(1))
 
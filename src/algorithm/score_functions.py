@@ -1,6 +1,8 @@
 from typing import List
 import logging
 
+import numpy as np
+
 
 def avg_growth(ticker: str, my_list: List, field: str) -> float:
     acc_growth = 0
@@ -30,3 +32,68 @@ def average(my_list: List, field: str) -> float:
             my_sum += float(data_point)
             count += 1
     return my_sum / count if count else 0.0
+
+
+# Vectorized versions over tickers x years arrays with NaN for missing values, one result per ticker.
+# They add up the years in the same order as the per ticker functions, so the results are identical.
+
+def compact_years(values: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """
+    :param values: tickers x years
+    :param present: tickers x years, False for the years without financials
+    :return: the values of the present years of every ticker moved to the front, like the per ticker
+    statement lists that skip those years, NaN padded
+    """
+    order = np.argsort(~present, axis=1, kind='stable')
+    compact = np.take_along_axis(values, order, axis=1)
+    compact[np.arange(values.shape[1]) >= present.sum(axis=1)[:, None]] = np.nan
+    return compact
+
+
+def avg_growth_columns(values: np.ndarray, present: np.ndarray) -> np.ndarray:
+    compact = compact_years(values, present)
+    acc_growth = np.zeros(len(compact))
+    count = np.zeros(len(compact), dtype=np.int64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(compact.shape[1] - 1):
+            start = compact[:, i]
+            end = compact[:, i + 1]
+            # a zero start fails the division, which the per ticker function skips
+            valid = ~np.isnan(start) & ~np.isnan(end) & (start != 0)
+            acc_growth += np.where(valid, end / start - 1, 0)
+            count += valid
+        return np.where(count > 0, 1 + acc_growth / count, 0)
+
+
+def average_columns(values: np.ndarray) -> np.ndarray:
+    my_sum = np.zeros(len(values))
+    count = np.zeros(len(values), dtype=np.int64)
+    for i in range(values.shape[1]):
+        valid = ~np.isnan(values[:, i])
+        my_sum += np.where(valid, values[:, i], 0)
+        count += valid
+    with np.errstate(invalid='ignore'):
+        return np.where(count > 0, my_sum / count, 0.0)
+
+
+def average_ratio_columns(numerators: np.ndarray, denominators: np.ndarray) -> np.ndarray:
+    """
+    :return: the average of the yearly ratios, over the years where both values are known and the denominator
+    isn't zero
+    """
+    acc_ratio = np.zeros(len(numerators))
+    count = np.zeros(len(numerators), dtype=np.int64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(numerators.shape[1]):
+            valid = ~np.isnan(numerators[:, i]) & ~np.isnan(denominators[:, i]) & (denominators[:, i] != 0)
+            acc_ratio += np.where(valid, numerators[:, i] / denominators[:, i], 0)
+            count += valid
+        return np.where(count > 0, acc_ratio / count, 0)
+
+
+def last_year_columns(values: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """
+    :return: the values of the last present year, NaN for the tickers without any
+    """
+    last = present.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+    return np.where(present.any(axis=1), values[np.arange(len(values)), last], np.nan)
@@ -0,0 +1,121 @@
+import logging
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from src.algorithm.columnar import FinancialsCube
+from src.common import config
+
+# A filter that can be evaluated on a projection of the raw financials: min < compute(cube) < max,
+# where the cube holds only the fields
+Predicate = namedtuple('Predicate', ['name', 'min', 'max', 'fields', 'compute'])
+
+# (ticker, year) pairs and fields to the stored fields, None for the pairs without financials
+LoadFields = Callable[[List[Tuple[str, int]], List[str]], List[Optional[dict]]]
+
+
+class ScreeningPlanner:
+    """
+    Narrows the tickers of a screen before their financials are fully loaded and scored.
+    Each filter with a vectorized score column becomes a predicate over the few raw fields that column reads,
+    and the predicates are evaluated in turn on the tickers the previous ones passed, reading only the fields
+    not read yet. The order puts cheap and selective predicates first, using the pass rates measured on a sample.
+    Tickers whose financials are not all stored are never ruled out, since they are fetched with the full load.
+    """
+
+    def __init__(self, load_fields: LoadFields, years: List[int],
+                 score_columns: Dict[str, Tuple[List[str], Callable[[FinancialsCube], np.ndarray]]],
+                 sample_size: int = config.SCREEN_SAMPLE_SIZE):
+        """
+        :param load_fields: e.g. DataAccess.get_ticker_fields_many
+        :param years: the years the scores are computed from
+        :param score_columns: score name to the raw fields it's computed from and its vectorized computation
+        :param sample_size: tickers the pass rates are measured on
+        """
+        self.load_fields = load_fields
+        self.years = years
+        self.score_columns = score_columns
+        self.sample_size = sample_size
+        # (ticker, year) to the fields read so far, None if not stored
+        self._rows: Dict[Tuple[str, int], Optional[dict]] = {}
+        self._loaded: Dict[str, set] = {}
+
+    def predicates(self, filter_params: List) -> List[Predicate]:
+        """
+        :param filter_params: Filter list
+        :return: a predicate per filter on a score with a vectorized column, the others can't be planned
+        """
+        return [Predicate(f.name, f.min, f.max, *self.score_columns[f.name])
+                for f in filter_params if f.name in self.score_columns]
+
+    def _load(self, tickers: List[str], fields: List[str]) -> None:
+        needed = {ticker: [field for field in fields if field not in self._loaded.get(ticker, ())]
+                  for ticker in tickers}
+        missing = [ticker for ticker in tickers if needed[ticker]]
+        if not missing:
+            return
+        read_fields = sorted({field for ticker in missing for field in needed[ticker]})
+        keys = [(ticker, year) for ticker in missing for year in self.years]
+        for key, entry in zip(keys, self.load_fields(keys, read_fields)):
+            if entry is None or self._rows.get(key) is None:
+                self._rows[key] = entry
+            else:
+                self._rows[key].update(entry)
+        for ticker in missing:
+            self._loaded.setdefault(ticker, set()).update(read_fields)
+
+    def _evaluate(self, predicate: Predicate, tickers: List[str]) -> np.ndarray:
+        """
+        :return: per ticker, False if it's known to fail the predicate
+        """
+        self._load(tickers, predicate.fields)
+        rows = [self._rows[(ticker, year)] for ticker in tickers for year in self.years]
+        cube = FinancialsCube.from_rows(tickers, self.years, predicate.fields, rows)
+        values = predicate.compute(cube)
+        known = np.array([row is not None for row in rows], dtype=bool).reshape(len(tickers), len(self.years))
+        return ~known.all(axis=1) | ((predicate.min < values) & (values < predicate.max))
+
+    def order(self, predicates: List[Predicate], tickers: List[str]) -> List[Predicate]:
+        """
+        Order the predicates by the fields they add to the ones already read, over the share of tickers they
+        rule out on a sample, so the ones cutting the most tickers for the least reads go first
+        :param predicates:
+        :param tickers:
+        :return:
+        """
+        step = max(len(tickers) // self.sample_size, 1)
+        sample = tickers[::step][:self.sample_size]
+        pass_rates = [float(self._evaluate(predicate, sample).mean()) if sample else 1.0
+                      for predicate in predicates]
+
+        ordered = []
+        loaded = set()
+        remaining = list(range(len(predicates)))
+        while remaining:
+            def rank(i: int) -> Tuple[float, float]:
+                reads = len(set(predicates[i].fields) - loaded)
+                return reads / max(1 - pass_rates[i], 0.01), pass_rates[i]
+            best = min(remaining, key=rank)
+            remaining.remove(best)
+            ordered.append(predicates[best])
+            loaded.update(predicates[best].fields)
+        return ordered
+
+    def screen(self, tickers: List[str], filter_params: List) -> List[str]:
+        """
+        :param tickers:
+        :param filter_params: Filter list
+        :return: the tickers that can pass the filters, in ticker order
+        """
+        predicates = self.predicates(filter_params)
+        if not predicates or not tickers:
+            return tickers
+        survivors = tickers
+        for predicate in self.order(predicates, tickers):
+            passed = self._evaluate(predicate, survivors)
+            logging.info(f'screen {predicate.name} passed {int(passed.sum())}/{len(survivors)} tickers '
+                         f'reading {predicate.fields}')
+            survivors = [ticker for ticker, keep in zip(survivors, passed.tolist()) if keep]
+            if not survivors:
+                break
+        return survivors
@@ -0,0 +1,36 @@
+from collections import namedtuple
+
+import pytest
+from .ranking import rank
+
+Entry = namedtuple('Entry', ['ticker', 'growth', 'mktCap'])
+
+ENTRIES = [Entry(f't{i:02d}', (i * 7) % 10, float(i)) for i in range(30)]
+
+
+def test_top_k():
+    page, cursor = rank(ENTRIES, 'mktCap', descending=True, limit=3)
+    assert [entry.ticker for entry in page] == ['t29', 't28', 't27']
+    assert cursor is not None
+    page, cursor = rank(ENTRIES, 'mktCap', limit=30)
+    assert page == ENTRIES and cursor is None
+
+
+def test_pages_cover_the_ranking_once():
+    expected = sorted(ENTRIES, key=lambda entry: (-entry.growth, entry.ticker))
+    pages = []
+    cursor = None
+    while True:
+        page, cursor = rank(ENTRIES, 'growth', descending=True, limit=4, cursor=cursor)
+        pages.extend(page)
+        if cursor is None:
+            break
+    assert pages == expected
+
+
+def test_cursor_of_another_ranking():
+    _, cursor = rank(ENTRIES, 'growth', limit=4)
+    with pytest.raises(ValueError):
+        rank(ENTRIES, 'growth', descending=True, limit=4, cursor=cursor)
+    with pytest.raises(ValueError):
+        rank(ENTRIES, 'mktCap', limit=4, cursor='garbage')
@@ -1,4 +1,8 @@
-from .score_functions import avg_growth
+import numpy as np
+
+from .columnar import FinancialsCube
+from .score_functions import avg_growth, average, avg_growth_columns, average_columns, average_ratio_columns, \
+    last_year_columns
 from .utils import dict2income
 TICKER = 'tk'
 
@@ -33,3 +37,57 @@ def test_avg_growth_variable():
     income_data_list = [dict2income(d) for d in income_data_list]
 
     assert avg_growth(TICKER, income_data_list, 'GrossProfit') == (sum(growth[1:]) / len(growth[1:]))
+
+
+def test_columns_match_per_ticker():
+    rng = np.random.default_rng(7)
+    fields = ['GrossProfit', 'NetIncome', 'RndExpenses', 'OperatingExpenses']
+    years = list(range(2015, 2020))
+    financials = {}
+    for t in range(200):
+        by_year = {}
+        for year in years:
+            # some years are missing, some values are missing, empty or zero
+            if rng.random() < 0.2:
+                by_year[str(year)] = {}
+                continue
+            entry = {}
+            for field in fields:
+                draw = rng.random()
+                if draw < 0.1:
+                    continue
+                entry[field] = '' if draw < 0.15 else '0' if draw < 0.2 else str(rng.normal(1e6, 5e5))
+            entry['MarketCap'] = '1e9'
+            by_year[str(year)] = entry
+        financials[f't{t}'] = by_year
+    tickers = list(financials)
+    cube = FinancialsCube.from_financials(financials, tickers, years, fields)
+
+    income_lists = []
+    for ticker in tickers:
+        entries = []
+        for year in years:
+            entry = financials[ticker][str(year)]
+            if entry:
+                entries.append(dict(entry, date=str(year)))
+        income_lists.append([dict2income(d) for d in entries])
+
+    assert avg_growth_columns(cube['GrossProfit'], cube.present).tolist() == \
+        [avg_growth(TICKER, income_list, 'GrossProfit') for income_list in income_lists]
+    assert average_columns(cube['NetIncome']).tolist() == \
+        [average(income_list, 'NetIncome') for income_list in income_lists]
+
+    expected_ratios = []
+    for income_list in income_lists:
+        ratios = [float(income.RnDExpenses) / float(income.OperatingExpenses) for income in income_list
+                  if income.RnDExpenses and income.OperatingExpenses and float(income.OperatingExpenses)]
+        acc_ratio = 0.0
+        for ratio in ratios:
+            acc_ratio += ratio
+        expected_ratios.append(acc_ratio / len(ratios) if ratios else 0)
+    assert average_ratio_columns(cube['RndExpenses'], cube['OperatingExpenses']).tolist() == expected_ratios
+
+    expected_last = [float(income_list[-1].NetIncome) if income_list and income_list[-1].NetIncome else None
+                     for income_list in income_lists]
+    last = last_year_columns(cube['NetIncome'], cube.present).tolist()
+    assert [None if np.isnan(value) else value for value in last] == expected_last
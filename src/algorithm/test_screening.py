@@ -0,0 +1,56 @@
+from collections import namedtuple
+
+from .score_functions import average_columns, last_year_columns
+from .screening import ScreeningPlanner
+
+YEARS = [2016, 2017]
+Filter = namedtuple('Filter', ['name', 'min', 'max'])
+
+SCORE_COLUMNS = {
+    'mktCap': (['MarketCap'], lambda cube: last_year_columns(cube['MarketCap'], cube.present)),
+    'netIncome': (['NetIncome'], lambda cube: average_columns(cube['NetIncome'])),
+}
+
+
+def make_financials(count):
+    financials = {}
+    for i in range(count):
+        financials[f't{i}'] = {
+            year: dict(MarketCap=str(i * 1e9), NetIncome=str(i % 2), Revenue='1') for year in YEARS
+        }
+    # not stored yet, so it can't be ruled out
+    financials['new'] = {2016: None, 2017: dict(MarketCap='1')}
+    return financials
+
+
+class FieldReader:
+    def __init__(self, financials):
+        self.financials = financials
+        self.reads = []
+
+    def __call__(self, keys, fields):
+        self.reads.append((len(keys), fields))
+        entries = []
+        for ticker, year in keys:
+            entry = self.financials[ticker][year]
+            entries.append(None if entry is None else {field: entry[field] for field in fields if field in entry})
+        return entries
+
+
+def test_screen_keeps_the_tickers_that_can_pass():
+    financials = make_financials(100)
+    reader = FieldReader(financials)
+    planner = ScreeningPlanner(reader, YEARS, SCORE_COLUMNS, sample_size=10)
+    filters = [Filter('netIncome', 0.5, 2), Filter('mktCap', 90e9, 1e12), Filter('RnDRatio', 0, 1)]
+    survivors = planner.screen(list(financials), filters)
+    assert survivors == [f't{i}' for i in range(91, 100, 2)] + ['new']
+    # Revenue is never read, and each field of a ticker is read at most once
+    assert all('Revenue' not in fields for _, fields in reader.reads)
+    assert sum(keys for keys, _ in reader.reads) <= 2 * len(financials) * len(YEARS)
+
+
+def test_selective_predicate_first():
+    financials = make_financials(100)
+    planner = ScreeningPlanner(FieldReader(financials), YEARS, SCORE_COLUMNS, sample_size=20)
+    predicates = planner.predicates([Filter('netIncome', 0.5, 2), Filter('mktCap', 90e9, 1e12)])
+    assert [predicate.name for predicate in planner.order(predicates, list(financials))] == ['mktCap', 'netIncome']
@@ -0,0 +1,40 @@
+from .utils import TickerData
+
+FINANCIALS = {
+    '2016': dict(GrossProfit='10', NetIncome='2', Assets='50', Liabilities='20', MarketCap='100'),
+    '2017': {},
+    '2018': dict(GrossProfit='12', NetIncome='3', Assets='55', Liabilities='25', MarketCap='120'),
+}
+
+
+def test_statements_share_the_records():
+    ticker_data = TickerData.from_financials(FINANCIALS, range(2016, 2019))
+    assert [income.Date for income in ticker_data.income_list] == ['2016', '2018']
+    assert [income.GrossProfit for income in ticker_data.income_list] == ['10', '12']
+    assert [balance_sheet.TotalAssets for balance_sheet in ticker_data.balance_sheet_list] == ['50', '55']
+    assert [profile.mktCap for profile in ticker_data.profile] == ['100', '120']
+    # the raw financials are left untouched
+    assert 'date' not in FINANCIALS['2016']
+
+
+def test_prices_are_loaded_lazily_once():
+    calls = []
+
+    def load_prices():
+        calls.append(1)
+        return [(2016, 1.0)]
+
+    ticker_data = TickerData.from_financials(FINANCIALS, range(2016, 2019), load_prices=load_prices)
+    assert ticker_data.income_list and not calls
+    assert ticker_data.prices == [(2016, 1.0)]
+    assert ticker_data.prices == [(2016, 1.0)]
+    assert len(calls) == 1
+
+
+def test_takes_the_statements_like_a_namedtuple():
+    ticker_data = TickerData.from_financials(FINANCIALS, range(2016, 2019))
+    profile, income_list, balance_sheet_list = ticker_data
+    assert income_list is ticker_data.income_list
+    copy = TickerData(profile, income_list, balance_sheet_list=balance_sheet_list)
+    assert list(copy) == [profile, income_list, balance_sheet_list]
+    assert copy.prices == []
@@ -0,0 +1,44 @@
+import threading
+import time
+
+from .workers import run_concurrently
+
+
+def test_results_in_item_order():
+    def func(item):
+        # the first items finish last
+        time.sleep((5 - item) * 0.01)
+        return item * 10
+
+    results, failures = run_concurrently(func, list(range(6)), workers=3, timeout=5)
+    assert results == [0, 10, 20, 30, 40, 50]
+    assert failures == {}
+
+
+def test_failures_are_recorded():
+    def func(item):
+        if item == 'bad':
+            raise ValueError('no financials')
+        return item.upper()
+
+    results, failures = run_concurrently(func, ['aaa', 'bad', 'ccc'], workers=2, timeout=5)
+    assert results == ['AAA', None, 'CCC']
+    assert failures == {1: 'ValueError: no financials'}
+
+
+def test_slow_items_are_given_up():
+    release = threading.Event()
+
+    def func(item):
+        if item == 'slow':
+            release.wait(10)
+        return item
+
+    try:
+        start = time.monotonic()
+        results, failures = run_concurrently(func, ['aaa', 'slow', 'ccc'], workers=2, timeout=0.2)
+        assert time.monotonic() - start < 5
+    finally:
+        release.set()
+    assert results == ['aaa', None, 'ccc']
+    assert failures == {1: 'timed out after 0.2s'}
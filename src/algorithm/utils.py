@@ -1,6 +1,6 @@
 from enum import Enum
 from collections import namedtuple
-from typing import Dict
+from typing import Callable, Dict, Iterable, List
 
 
 class Period(Enum):
@@ -35,7 +35,75 @@ BalanceSheet = namedtuple('BalanceSheet',
 
 # KeyMetrics = namedtuple('KeyMetrics', ['Date', 'MarketCap', 'Dividend'])
 
-TickerData = namedtuple('TickerData', ['profile', 'income_list', 'balance_sheet_list'])
+class TickerData:
+    """
+    Everything a score function knows about a ticker. Built by from_financials, the statements are views built on
+    first access from the raw financials, which are loaded once for all of them, and the prices are only loaded
+    if asked for. Still takes the statements themselves like the TickerData namedtuple it replaced, and unpacks
+    to them.
+    """
+
+    def __init__(self, profile: List[Profile] = None, income_list: List[Income] = None,
+                 balance_sheet_list: List[BalanceSheet] = None, load_prices: Callable = None):
+        """
+        :param profile:
+        :param income_list:
+        :param balance_sheet_list:
+        :param load_prices: returns the ticker prices
+        """
+        # the statements not passed are built from records
+        self.records: List[Dict] = []
+        self._profile = profile
+        self._income_list = income_list
+        self._balance_sheet_list = balance_sheet_list
+        self._load_prices = load_prices
+        self._prices = None
+
+    @classmethod
+    def from_financials(cls, financials: Dict[str, dict], years: Iterable[int],
+                        load_prices: Callable = None) -> 'TickerData':
+        """
+        :param financials: str(year) to the raw financials of the ticker
+        :param years: the years of the statements, the ones without financials are skipped
+        :param load_prices: returns the ticker prices
+        :return:
+        """
+        ticker_data = cls(load_prices=load_prices)
+        ticker_data.records = [dict(financials[str(year)], date=str(year))
+                               for year in years if financials.get(str(year))]
+        return ticker_data
+
+    @property
+    def profile(self) -> List[Profile]:
+        if self._profile is None:
+            self._profile = [dict2profile(d) for d in self.records]
+        return self._profile
+
+    @property
+    def income_list(self) -> List[Income]:
+        if self._income_list is None:
+            self._income_list = [dict2income(d) for d in self.records]
+        return self._income_list
+
+    @property
+    def balance_sheet_list(self) -> List[BalanceSheet]:
+        if self._balance_sheet_list is None:
+            self._balance_sheet_list = [dict2balance_sheet(d) for d in self.records]
+        return self._balance_sheet_list
+
+    @property
+    def prices(self):
+        """
+        :return: PriceSeries view of the local price store, or list of (datetime, price) tuples,
+        see DataServices.get_ticker_prices
+        """
+        if self._prices is None:
+            self._prices = self._load_prices() if self._load_prices else []
+        return self._prices
+
+    def __iter__(self):
+        return iter((self.profile, self.income_list, self.balance_sheet_list))
+
 
 SUPPORTED_STOCK_EXCHANGES = ['NASDAQ Capital Market', 'NASDAQ Global Market', 'NYSE', 'NYSE American', 'NYSE Arca',
                              'NYSEArca', 'Nasdaq', 'Nasdaq Global Select', 'NasdaqGM', 'NasdaqGS',
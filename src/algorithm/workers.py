@@ -0,0 +1,52 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def run_concurrently(func: Callable, items: List, workers: int,
+                     timeout: float) -> Tuple[List[Optional[object]], Dict[int, str]]:
+    """
+    Call func on every item on a pool of worker threads, so an item waiting on the DB or on sec
+    doesn't hold the others back. An item running for longer than timeout is given up: its thread
+    can't be stopped, but its result is dropped and the caller doesn't wait for it.
+    :param func:
+    :param items:
+    :param workers: concurrent calls
+    :param timeout: seconds a call may take
+    :return: the results in item order, None for the items that failed or timed out,
+    and the index of those items to the reason
+    """
+    started: Dict[int, float] = {}
+
+    def run(i: int):
+        started[i] = time.monotonic()
+        return func(items[i])
+
+    results: List[Optional[object]] = [None] * len(items)
+    failures: Dict[int, str] = {}
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='worker')
+    pending = {}
+    try:
+        pending = {executor.submit(run, i): i for i in range(len(items))}
+        while pending:
+            done, _ = wait(pending, timeout=min(timeout, 1.0), return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    failures[i] = f'{type(e).__name__}: {e}'
+                    logging.error(f'Error processing {items[i]!r}: {e}')
+            now = time.monotonic()
+            for future, i in list(pending.items()):
+                if i in started and now - started[i] > timeout:
+                    del pending[future]
+                    failures[i] = f'timed out after {timeout:g}s'
+                    logging.error(f'Gave up processing {items[i]!r} after {timeout:g}s')
+    finally:
+        # the calls not started yet, e.g. when interrupted, the running ones are left to finish
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+    return results, failures
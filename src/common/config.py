@@ -8,3 +8,66 @@ DB_HOST_NAME = os.getenv('MYSQL_URL') or 'localhost'
 DB_USER = 'finuser'
 DB_PASSWORD = 'fin'
 DB_NAME = 'findb'
+
+# Number of samples sent per TS.MADD command when bulk loading prices
+PRICE_BATCH_SIZE = int(os.getenv('PRICE_BATCH_SIZE') or 5000)
+
+# Connection pools, shared by all threads
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS') or 50)
+REDIS_HEALTH_CHECK_INTERVAL = 30
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE') or 10)
+DB_POOL_TIMEOUT = 30
+
+# Local memory-mapped copy of the price series, see src/data/price_store.py
+PRICE_STORE_DIR = os.getenv('PRICE_STORE_DIR') or os.path.join(ASSETS_DIR, 'prices')
+
+# Ticker metadata index used to pre-filter screens, see src/data/universe.py
+UNIVERSE_INDEX_PATH = os.getenv('UNIVERSE_INDEX_PATH') or os.path.join(ASSETS_DIR, 'universe.npz')
+
+# Number of rows per multi-row INSERT when loading the EDGAR index
+INDEX_BATCH_SIZE = int(os.getenv('INDEX_BATCH_SIZE') or 1000)
+
+# Storage backend, 'redis' for the RedisTimeSeries and MySQL servers above,
+# or 'embedded' for a local SQLite DB and time series files
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND') or 'redis'
+EMBEDDED_DB_PATH = os.getenv('EMBEDDED_DB_PATH') or os.path.join(ASSETS_DIR, 'findb.sqlite')
+EMBEDDED_SERIES_DIR = os.getenv('EMBEDDED_SERIES_DIR') or os.path.join(ASSETS_DIR, 'series')
+
+# XBRL parser of the sec filings, 'lxml' for the single pass XbrlDocument or 'soup' for BeautifulSoup
+XBRL_PARSER = os.getenv('XBRL_PARSER') or 'lxml'
+
+# Bytes per read when streaming filings from sec
+FILING_CHUNK_SIZE = int(os.getenv('FILING_CHUNK_SIZE') or 64 * 1024)
+
+# Sec fair access policy: at most 10 requests per second, declaring who is sending them
+SEC_RATE_LIMIT = float(os.getenv('SEC_RATE_LIMIT') or 10)
+SEC_MAX_IN_FLIGHT = int(os.getenv('SEC_MAX_IN_FLIGHT') or 8)
+SEC_RETRIES = 5
+SEC_BACKOFF = 0.5
+SEC_TIMEOUT = 30
+SEC_USER_AGENT = os.getenv('SEC_USER_AGENT') or 'findb research'
+
+# Local compressed copy of the raw sec archive files, see src/data/filing_cache.py. Filings read up to
+# their instance document are cached up to there, enough to extract them again offline.
+# In offline mode sec archive files are only read from the cache
+FILING_CACHE_ENABLED = (os.getenv('FILING_CACHE_ENABLED') or '1') == '1'
+FILING_CACHE_DIR = os.getenv('FILING_CACHE_DIR') or os.path.join(ASSETS_DIR, 'filings')
+FILING_CACHE_MAX_BYTES = int(os.getenv('FILING_CACHE_MAX_BYTES') or 20 * 1024 ** 3)
+SEC_OFFLINE = (os.getenv('SEC_OFFLINE') or '0') == '1'
+
+# Filing ingestion pipeline, see src/data/ingest.py
+INGEST_PARSERS = int(os.getenv('INGEST_PARSERS') or os.cpu_count() or 1)
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE') or 100)
+
+# Price history source, 'yahoo' or 'directory' for local {ticker}.csv files, see src/data/price_sources.py
+PRICE_SOURCE = os.getenv('PRICE_SOURCE') or 'yahoo'
+PRICE_SOURCE_DIR = os.getenv('PRICE_SOURCE_DIR') or os.path.join(ASSETS_DIR, 'price_files')
+# Tickers per price download, and concurrent requests of a download
+PRICE_DOWNLOAD_BATCH = int(os.getenv('PRICE_DOWNLOAD_BATCH') or 100)
+PRICE_DOWNLOAD_THREADS = int(os.getenv('PRICE_DOWNLOAD_THREADS') or 8)
+
+# Per ticker scoring, see BaseScore.compute_score: tickers scored at once, and seconds before one is given up
+SCORE_WORKERS = int(os.getenv('SCORE_WORKERS') or 8)
+SCORE_TICKER_TIMEOUT = float(os.getenv('SCORE_TICKER_TIMEOUT') or 120)
+# Tickers the screening planner measures the pass rate of the filters on, see src/algorithm/screening.py
+SCREEN_SAMPLE_SIZE = int(os.getenv('SCREEN_SAMPLE_SIZE') or 64)
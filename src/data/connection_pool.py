@@ -0,0 +1,109 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+import pymysql
+
+
+class MySQLConnectionPool:
+    """
+    A bounded pool of pymysql connections.
+    Connections are created lazily, checked out per thread and health checked before reuse.
+    A thread that already holds a connection gets the same one back on nested checkouts.
+    """
+
+    def __init__(self, max_size: int, checkout_timeout: float = None, **connect_kwargs):
+        """
+        :param max_size: maximal number of open connections
+        :param checkout_timeout: seconds to wait for a free connection, None waits forever
+        :param connect_kwargs: passed as is to pymysql.connect
+        """
+        self._connect_kwargs = connect_kwargs
+        self._checkout_timeout = checkout_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._local = threading.local()
+
+    def _connect(self) -> pymysql.connections.Connection:
+        return pymysql.connect(**self._connect_kwargs)
+
+    def _checkout(self) -> pymysql.connections.Connection:
+        if not self._slots.acquire(timeout=self._checkout_timeout):
+            raise TimeoutError('timed out waiting for a free MySQL connection')
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+
+        try:
+            # reconnects in place if the server dropped the connection
+            connection.ping(reconnect=True)
+        except pymysql.err.Error as error:
+            logging.info(f'replacing broken MySQL connection: {error}')
+            self._close(connection)
+            try:
+                connection = self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+        return connection
+
+    def _checkin(self, connection: pymysql.connections.Connection) -> None:
+        self._idle.put(connection)
+        self._slots.release()
+
+    def _release(self, connection: pymysql.connections.Connection) -> None:
+        # end the transaction before the connection is reused: writes are committed by their callers,
+        # and an open REPEATABLE READ snapshot would keep hiding the rows other processes write
+        try:
+            connection.rollback()
+        except pymysql.err.Error:
+            self._discard(connection)
+        else:
+            self._checkin(connection)
+
+    def _discard(self, connection: pymysql.connections.Connection) -> None:
+        self._close(connection)
+        self._slots.release()
+
+    @staticmethod
+    def _close(connection: pymysql.connections.Connection) -> None:
+        try:
+            connection.close()
+        except pymysql.err.Error:
+            pass
+
+    @contextmanager
+    def connection(self) -> pymysql.connections.Connection:
+        held = getattr(self._local, 'connection', None)
+        if held is not None:
+            yield held
+            return
+
+        connection = self._checkout()
+        self._local.connection = connection
+        try:
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # the connection is in an unknown state, don't hand it out again
+            self._discard(connection)
+            raise
+        except Exception:
+            self._release(connection)
+            raise
+        else:
+            self._release(connection)
+        finally:
+            self._local.connection = None
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
@@ -1,28 +1,28 @@
 import logging
-import pymysql
+import threading
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
-from typing import List, Tuple
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
 
-import redis
+import numpy as np
 from src.common import config
+from src.data.price_store import PriceStore
 
 
-class DataAccess:
-    redis_client = redis.Redis(
-        host=config.REDIS_HOST_NAME,
-        port=config.REDIS_PORT,
-        decode_responses=True
-    )
+class DataAccess(ABC):
+    """
+    Storage interface for the ticker financials, info, prices and the sec index.
+    RedisDataAccess stores them in RedisTimeSeries and MySQL servers, EmbeddedDataAccess in SQLite and local files.
+    Use get_data_access() to get the backend selected by config.STORAGE_BACKEND.
+    """
 
-    DBConnection = pymysql.connect(
-        host=config.DB_HOST_NAME,
-        user=config.DB_USER,
-        passwd=config.DB_PASSWORD,
-        db=config.DB_NAME
-    )
+    # year to the sec_idx rows of that year, keyed by cik
+    _year_index: Dict[int, Dict[int, Tuple[str, str]]] = {}
+    _year_index_lock = threading.Lock()
 
-    REDIS_TICKER_SET = 'ticker_set'
-    REDIS_CIK2TICKER_KEY = 'cik2ticker'
+    # prices exported from Redis, read in place of it for the exported tickers
+    price_store = PriceStore()
 
     # Ticker financials
 
@@ -30,80 +30,152 @@ class DataAccess:
     def _financials_key(ticker: str, year: int) -> str:
         return f'{ticker}:{year}'
 
+    @abstractmethod
     def store_ticker_financials(self, ticker: str, year: int, data: dict):
-        try:
-            self.redis_client.hset(self._financials_key(ticker, year), mapping=data)
-        except redis.ResponseError as error:
-            logging.debug(error)
+        pass
 
+    @abstractmethod
+    def store_ticker_financials_many(self, rows: Dict[Tuple[str, int], dict]) -> None:
+        """
+        Store the financials of many (ticker, year) pairs at once
+        :param rows: (ticker, year) to the financials to store
+        """
+
+    @abstractmethod
     def get_ticker_financials(self, ticker: str, year: int):
-        try:
-            return self.redis_client.hgetall(f'{ticker}:{year}')
-        except redis.ResponseError as error:
-            logging.error(error)
+        pass
+
+    @abstractmethod
+    def get_ticker_financials_many(self, keys: List[Tuple[str, int]]) -> List[dict]:
+        """
+        Read the financials of many (ticker, year) pairs at once
+        :param keys: (ticker, year) pairs
+        :return: the financials aligned with keys, empty for the ones that are not stored
+        """
 
+    def get_financials_bulk(self, tickers: List[str], years: List[int]) -> Dict[str, Dict[str, dict]]:
+        """
+        :param tickers:
+        :param years:
+        :return: ticker to str(year) to the stored financials, empty if not stored
+        """
+        keys = [(ticker, year) for ticker in tickers for year in years]
+        data = {ticker: {} for ticker in tickers}
+        for (ticker, year), entry in zip(keys, self.get_ticker_financials_many(keys)):
+            data[ticker][str(year)] = entry
+        return data
+
+    def get_ticker_fields_many(self, keys: List[Tuple[str, int]], fields: List[str]) -> List[Optional[dict]]:
+        """
+        Read only some of the financials of many (ticker, year) pairs at once
+        :param keys: (ticker, year) pairs
+        :param fields:
+        :return: the stored fields aligned with keys, None for the pairs without any stored financials
+        """
+        return [{field: entry[field] for field in fields if field in entry} if entry else None
+                for entry in self.get_ticker_financials_many(keys)]
+
+    @abstractmethod
     def is_ticker_stored(self, ticker: str, year: int):
-        try:
-            return self.redis_client.exists(self._financials_key(ticker, year))
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
+        pass
 
+    @abstractmethod
     def commit_ticker_data(self):
-        try:
-            return self.redis_client.bgsave()
-        except redis.ResponseError as error:
-            logging.debug(error)
+        pass
 
     # Ticker info
-    @staticmethod
-    def _info_key(ticker: str) -> str:
-        return f'{ticker}:info'
 
+    @abstractmethod
     def store_ticker_info(self, ticker: str, data: dict):
-        try:
-            self.redis_client.hset(self._info_key(ticker), mapping=data)
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
+        pass
+
+    @abstractmethod
+    def store_ticker_info_bulk(self, info: Dict[str, dict]) -> None:
+        """
+        :param info: ticker to the info fields to store
+        """
+
+    @abstractmethod
+    def get_ticker_info_many(self, tickers: List[str]) -> List[dict]:
+        """
+        :param tickers:
+        :return: the info of the tickers, aligned with tickers
+        """
 
+    def get_universe_records(self, tickers: List[str], year: int) -> Dict[str, dict]:
+        """
+        Read the metadata of many tickers in bulk
+        :param tickers:
+        :param year: the year to take the market cap from
+        :return: ticker to a dict with the keys cik, mktCap, exchange, industry and currency
+        """
+        info_list = self.get_ticker_info_many(tickers)
+        financials_list = self.get_ticker_financials_many([(ticker, year) for ticker in tickers])
+        records = {}
+        for ticker, info, financials in zip(tickers, info_list, financials_list):
+            records[ticker] = {
+                'cik': info.get('cik'),
+                'mktCap': financials.get('MarketCap'),
+                'exchange': financials.get('exchangeShortName') or info.get('exchange'),
+                'industry': financials.get('industry') or info.get('industry'),
+                'currency': financials.get('currency') or info.get('currency'),
+            }
+        return records
+
+    @abstractmethod
     def get_ticker_url(self, ticker: str, year: int):
-        try:
-            return self.redis_client.hget(self._info_key(ticker), f'txt_url:{year}')
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
+        pass
 
+    @abstractmethod
     def get_ticker_cik(self, ticker: str):
-        try:
-            return self.redis_client.hget(self._info_key(ticker), 'cik')
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
+        pass
 
     # Ticker price
+
+    @abstractmethod
     def store_ticker_price(self, ticker: str, timestamp: int, value: float) -> None:
-        try:
-            self.redis_client.execute_command(
-                "TS.ADD", f"{ticker}:price", timestamp, value)
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
+        pass
 
+    @abstractmethod
     def store_ticker_volume(self, ticker: str, timestamp: int, value: float) -> None:
-        try:
-            self.redis_client.execute_command(
-                "TS.ADD", f"{ticker}:volume", timestamp, value)
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
+        pass
+
+    @abstractmethod
+    def store_ticker_series_bulk(self, ticker: str, timestamps: List[int], prices: List[float],
+                                 volumes: List[float], batch_size: int = config.PRICE_BATCH_SIZE) -> int:
+        """
+        Store whole price and volume columns at once
+        :param ticker:
+        :param timestamps: sample timestamps in seconds
+        :param prices: close prices, aligned with timestamps
+        :param volumes: volumes, aligned with timestamps
+        :param batch_size: number of samples per write
+        :return: number of samples written to each series
+        """
 
+    @abstractmethod
     def is_ticker_volume_exists(self, ticker: str):
-        try:
-            return self.redis_client.exists(f'{ticker}:volume')
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
+        pass
 
+    @abstractmethod
     def is_ticker_price_exists(self, ticker: str):
-        try:
-            return self.redis_client.exists(f'{ticker}:price')
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
+        pass
+
+    @abstractmethod
+    def get_missing_price_tickers(self, tickers: List[str]) -> List[str]:
+        """
+        :param tickers:
+        :return: the tickers which have no stored price series
+        """
 
+    @abstractmethod
+    def get_last_price_timestamps(self, tickers: List[str]) -> List[Optional[int]]:
+        """
+        :param tickers:
+        :return: the timestamp in seconds of the last stored price of every ticker, None if it has none
+        """
+
+    @abstractmethod
     def get_prices(self, ticker: str, start: datetime, end: datetime) -> List[Tuple[datetime, float]]:
         """
         :param ticker:
@@ -111,30 +183,23 @@ class DataAccess:
         :param end:
         :return: list of (datetime, price) tuples
         """
-        try:
-            start_time = int(start.timestamp())
-            end_time = int(end.timestamp())
-            redis_response = self.redis_client.execute_command("TS.RANGE", f"{ticker}:price", start_time, end_time)
-            response_list = [(datetime.fromtimestamp(e[0]), float(e[1])) for e in redis_response]
-            return response_list
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
 
+    @abstractmethod
     def get_volumes(self, ticker: str, start: datetime, end: datetime) -> List[Tuple[datetime, float]]:
         """
         :param ticker:
         :param start:
         :param end:
-        :return: list of (datetime, price) tuples
+        :return: list of (datetime, volume) tuples
+        """
+
+    @abstractmethod
+    def get_price_volume_columns(self, ticker: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Read the whole price and volume series of a ticker as columns
+        :param ticker:
+        :return: (timestamps, prices, volumes) arrays aligned on the price timestamps, or None if there are no prices
         """
-        try:
-            start_time = int(start.timestamp())
-            end_time = int(end.timestamp())
-            redis_response = self.redis_client.execute_command("TS.RANGE", f"{ticker}:volume", start_time, end_time)
-            response_list = [(datetime.fromtimestamp(e[0]), float(e[1])) for e in redis_response]
-            return response_list
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
 
     def get_price(self, ticker: str, date: datetime) -> float:
         """
@@ -143,13 +208,37 @@ class DataAccess:
         :param date:
         :return: price at the specified date
         """
+        local_price = self.price_store.get_price(ticker, date)
+        if local_price is not None:
+            return local_price
+
         start_time = date - timedelta(weeks=1)
         price_res = self.get_prices(ticker, start_time, date)
         if price_res is not None and len(price_res) and len(price_res[-1]):
-            return self.get_prices(ticker, start_time, date)[-1][-1]
+            return price_res[-1][-1]
         else:
             return 0
 
+    def get_prices_at(self, tickers: List[str], dates: List[datetime]) -> Dict[str, List[float]]:
+        """
+        Resolve the as-of price of every (ticker, date) pair in a single batch
+        :param tickers:
+        :param dates:
+        :return: dict of ticker to a list of prices aligned with dates, 0 where no price is known
+        """
+        prices = {ticker: [self.price_store.get_price(ticker, date) for date in dates]
+                  for ticker in tickers if self.price_store.has_ticker(ticker)}
+        remote_tickers = [ticker for ticker in tickers if ticker not in prices]
+        if remote_tickers:
+            prices.update(self._get_prices_at(remote_tickers, dates))
+        return {ticker: prices[ticker] for ticker in tickers}
+
+    @abstractmethod
+    def _get_prices_at(self, tickers: List[str], dates: List[datetime]) -> Dict[str, List[float]]:
+        """
+        get_prices_at of the tickers which are not in the price store
+        """
+
     def get_volume(self, ticker: str, date: datetime) -> float:
         """
 
@@ -157,6 +246,10 @@ class DataAccess:
         :param date:
         :return: price at the specified date
         """
+        local_volume = self.price_store.get_volume(ticker, date)
+        if local_volume is not None:
+            return local_volume
+
         start_time = date - timedelta(weeks=1)
         price_res = self.get_prices(ticker, start_time, date)
         if price_res is not None and len(price_res) and len(price_res[-1]):
@@ -164,74 +257,149 @@ class DataAccess:
         else:
             return 0
 
+    # Ticker list and cik mapping
+
+    @abstractmethod
     def get_ticker_by_cik(self, ticker):
-        try:
-            return self.redis_client.hget(self.REDIS_CIK2TICKER_KEY, ticker)
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
+        pass
+
+    @abstractmethod
+    def get_tickers_by_cik_many(self, ciks: List[int]) -> List[Optional[str]]:
+        """
+        :param ciks:
+        :return: the tickers aligned with ciks, None for the unmapped ones
+        """
 
+    @abstractmethod
     def store_ticker_cik_mapping(self, ticker: str, cik: str) -> None:
-        try:
-            self.redis_client.hset(self._info_key(ticker), 'cik', cik)
-            self.redis_client.hset(f'{self.REDIS_CIK2TICKER_KEY}', cik, ticker)
-            self.redis_client.sadd(self.REDIS_TICKER_SET, ticker)
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
+        pass
 
+    @abstractmethod
     def is_ticker_mapped(self, ticker: str) -> bool:
-        try:
-            return self.redis_client.sismember(self.REDIS_TICKER_SET, ticker)
-        except redis.ResponseError as error:
-            logging.debug(f'{error} ticker: {ticker}')
+        pass
 
+    @abstractmethod
     def is_ticker_list_exist(self) -> bool:
-        try:
-            return self.redis_client.exists(self.REDIS_TICKER_SET)
-        except redis.ResponseError as error:
-            logging.debug(f'{error}')
+        pass
 
+    @abstractmethod
     def get_ticker_list(self) -> List[str]:
-        try:
-            ticker_list_resp = self.redis_client.sscan(self.REDIS_TICKER_SET, 0, count=30 * 1000)
-            if ticker_list_resp[0] == 0:  # i.e. status OK
-                return ticker_list_resp[1]
-            else:
-                logging.error('failed to load ticker list')
-        except redis.ResponseError as error:
-            logging.debug(error)
+        pass
 
     # Index
-    def store_index(self, data: List[str], year, filling: str) -> None:
-        with self.DBConnection.cursor() as cursor:
-            # Create a new record
-            sql = "INSERT INTO `sec_idx` (`cik`, `year`, `company`, `report_type`, `url`) VALUES (%s, %s, %s, %s, %s)"
-            for item in data:
-                if filling in item:
-                    values = item.split('|')
-                    try:
-                        cursor.execute(sql, (values[0], int(year), values[1], values[2], values[4]))
-                    # TBD - some companies have multiple 10-K
-                    except pymysql.err.IntegrityError:
-                        pass
-        self.DBConnection.commit()
+
+    def store_index(self, rows: Iterable[Tuple[str, str, str, str]], year: int,
+                    batch_size: int = config.INDEX_BATCH_SIZE) -> int:
+        """
+        Store index rows in batches, committing every batch
+        :param rows: (cik, company, report_type, url) tuples, may be a generator
+        :param year:
+        :param batch_size: number of rows per write
+        :return: number of rows sent
+        """
+        rows = iter(rows)
+        count = 0
+        while True:
+            batch = [(cik, int(year), company, report_type, url)
+                     for cik, company, report_type, url in islice(rows, batch_size)]
+            if not batch:
+                break
+            # TBD - some companies have multiple 10-K, the first one is kept
+            self._store_index_batch(batch)
+            count += len(batch)
+        DataAccess._year_index.pop(int(year), None)
+        return count
+
+    @abstractmethod
+    def _store_index_batch(self, batch: List[Tuple[str, int, str, str, str]]) -> None:
+        """
+        Insert (cik, year, company, report_type, url) rows, keeping the existing row on a duplicate (cik, year)
+        """
 
     def is_index_stored(self, year: int) -> bool:
-        with self.DBConnection.cursor() as cursor:
-            sql = f'SELECT COUNT(*) FROM {config.DB_NAME}.sec_idx where year={year}'
-            cursor.execute(sql)
-            result = cursor.fetchone()
-            return result[0]
-
-    def get_index_row_by_cik(self, cik: int, year: int) -> List[str]:
-        with self.DBConnection.cursor() as cursor:
-            # Create a new record
-            sql = f'SELECT company, url FROM sec_idx where cik={cik} and year={year}'
-            cursor.execute(sql)
-            return cursor.fetchone()
-
-    def get_index_by_year(self, year: int) -> List[List[str]]:
-        with self.DBConnection.cursor() as cursor:
-            # Create a new record
-            sql = f'SELECT company, url, cik FROM sec_idx where year={year}'
-            cursor.execute(sql)
-            return cursor.fetchall()
+        if DataAccess._year_index.get(year):
+            return True
+        return self._count_index_rows(year)
+
+    @abstractmethod
+    def _count_index_rows(self, year: int) -> int:
+        pass
+
+    def get_index_row_by_cik(self, cik: int, year: int) -> Optional[Tuple[str, str]]:
+        """
+        :param cik:
+        :param year:
+        :return: (company, url) of the cik filing in that year, or None
+        """
+        if cik is None:
+            return None
+        return self.get_year_index(year).get(int(cik))
+
+    def get_index_by_year(self, year: int) -> List[Tuple[str, str, int]]:
+        """
+        :param year:
+        :return: (company, url, cik) of every filing in that year
+        """
+        return [(company, url, cik) for cik, (company, url) in self.get_year_index(year).items()]
+
+    def get_year_index(self, year: int) -> Dict[int, Tuple[str, str]]:
+        """
+        The index of a year, loaded from the DB once and then shared by all DataAccess instances
+        :param year:
+        :return: cik to (company, url)
+        """
+        year_index = DataAccess._year_index.get(year)
+        if year_index is None:
+            with DataAccess._year_index_lock:
+                year_index = DataAccess._year_index.get(year)
+                if year_index is None:
+                    year_index = self._load_year_index(year)
+                    logging.info(f'loaded {len(year_index)} index rows for year {year}')
+                    # an empty index is not cached, so it's picked up once the year is loaded
+                    if year_index:
+                        DataAccess._year_index[year] = year_index
+        return year_index
+
+    @abstractmethod
+    def _load_year_index(self, year: int) -> Dict[int, Tuple[str, str]]:
+        pass
+
+    @abstractmethod
+    def get_index_file_state(self, path: str) -> Optional[Tuple[str, str]]:
+        """
+        :param path: archive path of an edgar index file
+        :return: (etag, last_modified) of the stored copy of the file, or None if it was never stored
+        """
+
+    @abstractmethod
+    def store_index_file_state(self, path: str, etag: str, last_modified: str) -> None:
+        pass
+
+    # Ingestion progress
+
+    @abstractmethod
+    def store_ingest_status(self, year: int, statuses: Dict[int, str]) -> None:
+        """
+        :param year:
+        :param statuses: cik to the status of its filing of that year, pending, done, failed or no-xbrl
+        """
+
+    @abstractmethod
+    def get_ingest_status(self, year: int) -> Dict[int, str]:
+        """
+        :param year:
+        :return: cik to the status of its filing of that year
+        """
+
+
+def get_data_access() -> DataAccess:
+    """
+    :return: the storage backend selected by config.STORAGE_BACKEND
+    """
+    if config.STORAGE_BACKEND == 'redis':
+        from src.data.redis_data_access import RedisDataAccess
+        return RedisDataAccess()
+    elif config.STORAGE_BACKEND == 'embedded':
+        from src.data.embedded_data_access import EmbeddedDataAccess
+        return EmbeddedDataAccess()
+    raise ValueError(f'Unknown storage backend {config.STORAGE_BACKEND!r}')
@@ -1,10 +1,10 @@
 import logging
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from datetime import datetime
 from src.data import ticker_price
 from src.data.sec_gov import SecGov
-from src.data.data_access import DataAccess
+from src.data.data_access import get_data_access
 from flask import Flask, request
 
 data_services = Flask(__name__)
@@ -14,7 +14,7 @@ class DataServices:
 
     def __init__(self):
         self.sec_gov = SecGov()
-        self.data_access = DataAccess()
+        self.data_access = get_data_access()
         if not self.data_access.is_ticker_list_exist():
             self.sec_gov.fetch_tickers_list()
 
@@ -28,6 +28,19 @@ class DataServices:
             ticker_price.fetch_ticker_price_volume(ticker)
         return self.data_access.get_price(ticker, date)
 
+    def get_prices_at(self, tickers: List[str], dates: List[datetime]) -> Dict[str, List[float]]:
+        """
+        :param tickers:
+        :param dates:
+        :return: dict of ticker to a list of prices aligned with dates, 0 where no price is known
+        """
+        remote_tickers = [ticker for ticker in tickers if not self.data_access.price_store.has_ticker(ticker)]
+        missing = self.data_access.get_missing_price_tickers(remote_tickers)
+        if missing:
+            # many tickers per download, e.g. on a cold backtest
+            ticker_price.refresh_prices(missing)
+        return self.data_access.get_prices_at(tickers, dates)
+
     def get_ticker_volume(self, ticker: str, date: datetime) -> float:
         """
         :param ticker:
@@ -46,6 +59,14 @@ class DataServices:
         """
         ticker_price.fetch_ticker_price_volume(ticker)
 
+    @staticmethod
+    def refresh_prices(tickers: List[str]) -> Tuple[int, int]:
+        """ Append the missing price bars of the tickers
+        :param tickers:
+        :return: number of new bars, and of fetched bars that were already stored
+        """
+        return ticker_price.refresh_prices(tickers)
+
     def fetch_ticker_list(self) -> List[str]:
         """Fetch a list of tickers from sec, and store them in the DB.
         Skip if already in cache.
@@ -54,24 +75,20 @@ class DataServices:
         """
         return self.data_access.get_ticker_list()
 
-    def get_ticker_data(self, ticker: str, start_year: int, end_year: int):
+    def get_ticker_data(self, ticker: str, start_year: int, end_year: int, columnar: bool = False):
         """
         Could be called externally to get all data_assets known about that ticker.
         :param ticker:
         :param start_year:
         :param end_year: inclusive
+        :param columnar: return the prices as PriceSeries views of the local price store when it has the ticker,
+        instead of a list of (datetime, price) tuples
         :return:
         """
         data = {}
 
-        if not self.data_access.is_ticker_price_exists(ticker):
-            ticker_price.fetch_ticker_price_volume(ticker)
-
         data['volume'] = {'volume': 'NA'}
-        # TODO: use more accurate dates
-        start_year_datetime = datetime.fromisoformat(f'{start_year}-01-01')
-        end_year_datetime = datetime.fromisoformat(f'{end_year}-12-30')
-        data['price'] = self.data_access.get_prices(ticker, start_year_datetime, end_year_datetime)
+        data['price'] = self.get_ticker_prices(ticker, start_year, end_year, columnar)
 
         for year in range(start_year, end_year + 1):
             self.fetch_ticker_financials_by_year(year, ticker)
@@ -83,6 +100,26 @@ class DataServices:
 
         return data
 
+    def get_ticker_prices(self, ticker: str, start_year: int, end_year: int, columnar: bool = False):
+        """
+        :param ticker:
+        :param start_year:
+        :param end_year: inclusive
+        :param columnar: return a PriceSeries view of the local price store when it has the ticker,
+        instead of a list of (datetime, price) tuples
+        :return:
+        """
+        # TODO: use more accurate dates
+        start_year_datetime = datetime.fromisoformat(f'{start_year}-01-01')
+        end_year_datetime = datetime.fromisoformat(f'{end_year}-12-30')
+        if columnar:
+            local_prices = self.data_access.price_store.get_range(ticker, start_year_datetime, end_year_datetime)
+            if local_prices is not None:
+                return local_prices
+        if not self.data_access.is_ticker_price_exists(ticker):
+            ticker_price.fetch_ticker_price_volume(ticker)
+        return self.data_access.get_prices(ticker, start_year_datetime, end_year_datetime)
+
     def get_ticker_financials(self, ticker: str, start_year: int, end_year: int):
         """
         Could be called to get ticker financials
@@ -103,6 +140,49 @@ class DataServices:
 
         return data
 
+    def get_financials_bulk(self, tickers: List[str], years: List[int],
+                            fetch_missing: bool = True) -> Dict[str, Dict[str, dict]]:
+        """
+        Get the financials of many tickers and years in a few pipelined round trips
+        :param tickers:
+        :param years:
+        :param fetch_missing: fetch from sec the financials that are not stored yet
+        :return: ticker to str(year) to financials, empty if they could not be retrieved
+        """
+        data = self.data_access.get_financials_bulk(tickers, years)
+        missing = [(ticker, year) for ticker in tickers for year in years
+                   if not data[ticker][str(year)] and ticker not in ['spy', 'qqq']]
+        if fetch_missing and missing:
+            self.sec_gov.fetch_financials_many(missing)
+            for (ticker, year), entry in zip(missing, self.data_access.get_ticker_financials_many(missing)):
+                if not entry:
+                    logging.error(f"Could not retrieve data_assets for '{ticker} {year}' ")
+                data[ticker][str(year)] = entry
+        return data
+
+    def get_financials_fields(self, keys: List[Tuple[str, int]], fields: List[str]) -> List[Optional[dict]]:
+        """
+        Read only some of the stored financials, without fetching the missing ones
+        :param keys: (ticker, year) pairs
+        :param fields:
+        :return: the stored fields aligned with keys, None for the pairs without any stored financials
+        """
+        return self.data_access.get_ticker_fields_many(keys, fields)
+
+    def fetch_financials_many(self, tickers: List[str], years: List[int]) -> None:
+        """Fetch from sec the financials of the passed tickers and years that are not stored yet, concurrently
+        Args:
+            tickers list: The tickers
+            years list: The years
+        Returns:
+            None
+        """
+        missing = [(ticker, year) for ticker in tickers for year in years
+                   if ticker not in ['spy', 'qqq'] and not self.data_access.is_ticker_stored(ticker, year)]
+        logging.info(f'{len(tickers) * len(years) - len(missing)} financials are already cached, '
+                     f'fetching {len(missing)}')
+        self.sec_gov.fetch_financials_many(missing)
+
     def get_ticker_volumes(self, ticker: str, start: datetime, end: datetime = None) -> List[Tuple[datetime, float]]:
         """
         :param ticker:
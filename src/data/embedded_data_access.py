@@ -0,0 +1,290 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from src.common import config
+from src.data.data_access import DataAccess
+from src.data.price_store import PriceStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS financials (
+    ticker TEXT,
+    year INTEGER,
+    field TEXT,
+    value TEXT,
+    PRIMARY KEY (ticker, year, field)
+);
+CREATE TABLE IF NOT EXISTS ticker_info (
+    ticker TEXT,
+    field TEXT,
+    value TEXT,
+    PRIMARY KEY (ticker, field)
+);
+CREATE TABLE IF NOT EXISTS ticker_set (
+    ticker TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS cik2ticker (
+    cik TEXT PRIMARY KEY,
+    ticker TEXT
+);
+CREATE TABLE IF NOT EXISTS sec_idx (
+    cik INTEGER,
+    year INTEGER,
+    company TEXT,
+    report_type TEXT,
+    url TEXT,
+    PRIMARY KEY (cik, year)
+);
+CREATE INDEX IF NOT EXISTS sec_idx_year ON sec_idx (year, cik);
+CREATE TABLE IF NOT EXISTS index_files (
+    path TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS ingest_progress (
+    cik INTEGER,
+    year INTEGER,
+    status TEXT,
+    updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (year, cik)
+);
+"""
+
+
+class EmbeddedDataAccess(DataAccess):
+    """
+    Stores the financials, info and sec index in a local SQLite DB, and the price series in a local PriceStore.
+    Needs no server, for CI, laptops and single node backtests.
+    Values are returned as strings, like the Redis backend does.
+    """
+
+    # per thread SQLite connections and shared series stores, keyed by path
+    _local = threading.local()
+    _series_stores: Dict[str, PriceStore] = {}
+    _init_lock = threading.Lock()
+
+    def __init__(self, db_path: str = None, series_dir: str = None):
+        """
+        :param db_path: defaults to config.EMBEDDED_DB_PATH
+        :param series_dir: defaults to config.EMBEDDED_SERIES_DIR
+        """
+        self.db_path = db_path or config.EMBEDDED_DB_PATH
+        series_dir = series_dir or config.EMBEDDED_SERIES_DIR
+        with EmbeddedDataAccess._init_lock:
+            if series_dir not in EmbeddedDataAccess._series_stores:
+                EmbeddedDataAccess._series_stores[series_dir] = PriceStore(series_dir)
+        # the series are already local, so they are read through the price store path of DataAccess
+        self.price_store = EmbeddedDataAccess._series_stores[series_dir]
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        connections = getattr(EmbeddedDataAccess._local, 'connections', None)
+        if connections is None:
+            connections = EmbeddedDataAccess._local.connections = {}
+        connection = connections.get(self.db_path)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            connections[self.db_path] = connection
+        return connection
+
+    @staticmethod
+    def _encode(value) -> str:
+        # same conversion redis-py applies to hash values
+        return value if isinstance(value, str) else str(value)
+
+    # Ticker financials
+
+    def store_ticker_financials(self, ticker: str, year: int, data: dict):
+        self.store_ticker_financials_many({(ticker, year): data})
+
+    def store_ticker_financials_many(self, rows: Dict[Tuple[str, int], dict]) -> None:
+        with self.db as db:
+            db.executemany('INSERT OR REPLACE INTO financials (ticker, year, field, value) VALUES (?, ?, ?, ?)',
+                           [(ticker, year, field, self._encode(value))
+                            for (ticker, year), data in rows.items() for field, value in data.items()])
+
+    def get_ticker_financials(self, ticker: str, year: int):
+        cursor = self.db.execute('SELECT field, value FROM financials WHERE ticker = ? AND year = ?', (ticker, year))
+        return dict(cursor.fetchall())
+
+    def get_ticker_financials_many(self, keys: List[Tuple[str, int]]) -> List[dict]:
+        return [self.get_ticker_financials(ticker, year) for ticker, year in keys]
+
+    def get_ticker_fields_many(self, keys: List[Tuple[str, int]], fields: List[str]) -> List[Optional[dict]]:
+        placeholders = ', '.join('?' * len(fields))
+        entries = []
+        for ticker, year in keys:
+            if not self.is_ticker_stored(ticker, year):
+                entries.append(None)
+                continue
+            if not fields:
+                entries.append({})
+                continue
+            cursor = self.db.execute(f'SELECT field, value FROM financials WHERE ticker = ? AND year = ? '
+                                     f'AND field IN ({placeholders})', (ticker, year, *fields))
+            entries.append(dict(cursor.fetchall()))
+        return entries
+
+    def is_ticker_stored(self, ticker: str, year: int):
+        cursor = self.db.execute('SELECT 1 FROM financials WHERE ticker = ? AND year = ? LIMIT 1', (ticker, year))
+        return int(cursor.fetchone() is not None)
+
+    def commit_ticker_data(self):
+        # every write is committed as it happens
+        return True
+
+    # Ticker info
+
+    def store_ticker_info(self, ticker: str, data: dict):
+        self.store_ticker_info_bulk({ticker: data})
+
+    def store_ticker_info_bulk(self, info: Dict[str, dict]) -> None:
+        with self.db as db:
+            db.executemany('INSERT OR REPLACE INTO ticker_info (ticker, field, value) VALUES (?, ?, ?)',
+                           [(ticker, field, self._encode(value))
+                            for ticker, data in info.items() for field, value in data.items()])
+
+    def _get_ticker_info(self, ticker: str) -> dict:
+        cursor = self.db.execute('SELECT field, value FROM ticker_info WHERE ticker = ?', (ticker,))
+        return dict(cursor.fetchall())
+
+    def get_ticker_info_many(self, tickers: List[str]) -> List[dict]:
+        return [self._get_ticker_info(ticker) for ticker in tickers]
+
+    def _get_ticker_info_field(self, ticker: str, field: str) -> Optional[str]:
+        cursor = self.db.execute('SELECT value FROM ticker_info WHERE ticker = ? AND field = ?', (ticker, field))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def get_ticker_url(self, ticker: str, year: int):
+        return self._get_ticker_info_field(ticker, f'txt_url:{year}')
+
+    def get_ticker_cik(self, ticker: str):
+        return self._get_ticker_info_field(ticker, 'cik')
+
+    # Ticker price
+
+    def store_ticker_price(self, ticker: str, timestamp: int, value: float) -> None:
+        self.price_store.upsert(ticker, [timestamp], close=[value])
+
+    def store_ticker_volume(self, ticker: str, timestamp: int, value: float) -> None:
+        self.price_store.upsert(ticker, [timestamp], volume=[value])
+
+    def store_ticker_series_bulk(self, ticker: str, timestamps: List[int], prices: List[float],
+                                 volumes: List[float], batch_size: int = config.PRICE_BATCH_SIZE) -> int:
+        # a single local write, batch_size doesn't apply
+        self.price_store.upsert(ticker, timestamps, close=prices, volume=volumes)
+        return len(timestamps)
+
+    def is_ticker_volume_exists(self, ticker: str):
+        return int(self.price_store.has_ticker(ticker))
+
+    def is_ticker_price_exists(self, ticker: str):
+        return int(self.price_store.has_ticker(ticker))
+
+    def get_missing_price_tickers(self, tickers: List[str]) -> List[str]:
+        return [ticker for ticker in tickers if not self.price_store.has_ticker(ticker)]
+
+    def get_last_price_timestamps(self, tickers: List[str]) -> List[Optional[int]]:
+        last_timestamps = []
+        for ticker in tickers:
+            series = self.price_store.load(ticker)
+            last_timestamps.append(int(series.timestamps[-1]) if series is not None and len(series.timestamps)
+                                   else None)
+        return last_timestamps
+
+    def _get_samples(self, ticker: str, start: datetime, end: datetime, column: str) -> List[Tuple[datetime, float]]:
+        series = self.price_store.get_range(ticker, start, end)
+        if series is None:
+            return []
+        values = getattr(series, column)
+        stored = ~np.isnan(values)
+        return [(datetime.fromtimestamp(timestamp), float(value))
+                for timestamp, value in zip(series.timestamps[stored].tolist(), values[stored].tolist())]
+
+    def get_prices(self, ticker: str, start: datetime, end: datetime) -> List[Tuple[datetime, float]]:
+        return self._get_samples(ticker, start, end, 'close')
+
+    def get_volumes(self, ticker: str, start: datetime, end: datetime) -> List[Tuple[datetime, float]]:
+        return self._get_samples(ticker, start, end, 'volume')
+
+    def get_price_volume_columns(self, ticker: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        series = self.price_store.load(ticker)
+        if series is None:
+            return None
+        stored = ~np.isnan(series.close)
+        if not stored.any():
+            return None
+        return (np.array(series.timestamps[stored]),
+                series.close[stored].astype(np.float64),
+                np.nan_to_num(series.volume[stored].astype(np.float64)))
+
+    def _get_prices_at(self, tickers: List[str], dates: List[datetime]) -> Dict[str, List[float]]:
+        # only the tickers without any stored series get here
+        return {ticker: [0] * len(dates) for ticker in tickers}
+
+    # Ticker list and cik mapping
+
+    def get_ticker_by_cik(self, ticker):
+        row = self.db.execute('SELECT ticker FROM cik2ticker WHERE cik = ?', (str(ticker),)).fetchone()
+        return row[0] if row else None
+
+    def get_tickers_by_cik_many(self, ciks: List[int]) -> List[Optional[str]]:
+        return [self.get_ticker_by_cik(cik) for cik in ciks]
+
+    def store_ticker_cik_mapping(self, ticker: str, cik: str) -> None:
+        with self.db as db:
+            db.execute('INSERT OR REPLACE INTO ticker_info (ticker, field, value) VALUES (?, ?, ?)',
+                       (ticker, 'cik', str(cik)))
+            db.execute('INSERT OR REPLACE INTO cik2ticker (cik, ticker) VALUES (?, ?)', (str(cik), ticker))
+            db.execute('INSERT OR IGNORE INTO ticker_set (ticker) VALUES (?)', (ticker,))
+
+    def is_ticker_mapped(self, ticker: str) -> bool:
+        return self.db.execute('SELECT 1 FROM ticker_set WHERE ticker = ?', (ticker,)).fetchone() is not None
+
+    def is_ticker_list_exist(self) -> bool:
+        return self.db.execute('SELECT 1 FROM ticker_set LIMIT 1').fetchone() is not None
+
+    def get_ticker_list(self) -> List[str]:
+        return [row[0] for row in self.db.execute('SELECT ticker FROM ticker_set')]
+
+    # Index
+
+    def _store_index_batch(self, batch: List[Tuple[str, int, str, str, str]]) -> None:
+        with self.db as db:
+            db.executemany('INSERT OR IGNORE INTO sec_idx (cik, year, company, report_type, url) '
+                           'VALUES (?, ?, ?, ?, ?)', [(int(row[0]), *row[1:]) for row in batch])
+
+    def _count_index_rows(self, year: int) -> int:
+        return self.db.execute('SELECT COUNT(*) FROM sec_idx WHERE year = ?', (year,)).fetchone()[0]
+
+    def _load_year_index(self, year: int) -> Dict[int, Tuple[str, str]]:
+        cursor = self.db.execute('SELECT cik, company, url FROM sec_idx WHERE year = ?', (year,))
+        return {cik: (company, url) for cik, company, url in cursor}
+
+    def get_index_file_state(self, path: str) -> Optional[Tuple[str, str]]:
+        return self.db.execute('SELECT etag, last_modified FROM index_files WHERE path = ?', (path,)).fetchone()
+
+    def store_index_file_state(self, path: str, etag: str, last_modified: str) -> None:
+        with self.db as db:
+            db.execute('INSERT OR REPLACE INTO index_files (path, etag, last_modified, updated) '
+                       'VALUES (?, ?, ?, CURRENT_TIMESTAMP)', (path, etag, last_modified))
+
+    # Ingestion progress
+
+    def store_ingest_status(self, year: int, statuses: Dict[int, str]) -> None:
+        with self.db as db:
+            db.executemany('INSERT OR REPLACE INTO ingest_progress (cik, year, status, updated) '
+                           'VALUES (?, ?, ?, CURRENT_TIMESTAMP)',
+                           [(int(cik), int(year), status) for cik, status in statuses.items()])
+
+    def get_ingest_status(self, year: int) -> Dict[int, str]:
+        cursor = self.db.execute('SELECT cik, status FROM ingest_progress WHERE year = ?', (year,))
+        return dict(cursor.fetchall())
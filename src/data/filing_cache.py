@@ -0,0 +1,230 @@
+import argparse
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import IO, Iterable, Iterator, Optional
+
+from src.common import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    digest TEXT,
+    size INTEGER,
+    accessed REAL,
+    complete INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+
+class FilingCache:
+    """
+    Local cache of raw sec archive files (filings and index files), keyed by their archive path.
+    Contents are stored gzip compressed under their sha256 digest, so identical files are stored once,
+    and the least recently read are evicted once the compressed size exceeds max_bytes.
+    A file whose reader stopped early, e.g. after the XBRL instance of a filing, is stored as the prefix
+    that was read, which is only opened for readers asking for a prefix.
+    """
+
+    def __init__(self, directory: str = config.FILING_CACHE_DIR, max_bytes: int = config.FILING_CACHE_MAX_BYTES):
+        """
+        :param directory:
+        :param max_bytes: compressed size to evict down to
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(entries)')]
+        if 'complete' not in columns:
+            # created before prefixes were stored, its entries are all complete
+            with self._db as db:
+                db.execute('ALTER TABLE entries ADD COLUMN complete INTEGER NOT NULL DEFAULT 1')
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'objects', digest[:2], f'{digest}.gz')
+
+    def _digest(self, path: str, prefix: bool = False) -> Optional[str]:
+        row = self._db.execute('SELECT digest, complete FROM entries WHERE path = ?', (path,)).fetchone()
+        return row[0] if row and (prefix or row[1]) else None
+
+    def __contains__(self, path: str) -> bool:
+        with self._lock:
+            digest = self._digest(path)
+        return digest is not None and os.path.exists(self._object_path(digest))
+
+    def open(self, path: str, prefix: bool = False) -> Optional[IO[bytes]]:
+        """
+        :param path: archive path
+        :param prefix: accept the prefix a reader stopping early stored, for readers stopping at the same point
+        :return: a file object reading the decompressed content, or None if it is not cached
+        """
+        with self._lock:
+            digest = self._digest(path, prefix)
+            if digest is None:
+                return None
+            with self._db as db:
+                db.execute('UPDATE entries SET accessed = ? WHERE path = ?', (time.time(), path))
+        try:
+            return gzip.open(self._object_path(digest), 'rb')
+        except FileNotFoundError:
+            return None
+
+    def get(self, path: str) -> Optional[bytes]:
+        """
+        :param path: archive path
+        :return: the content, or None if it is not cached
+        """
+        f = self.open(path)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def tee(self, path: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Yield the chunks of a streamed file while storing them, holding a single chunk in memory.
+        A reader closing the chunks early stores the prefix it read, a stream failing stores nothing.
+        :param path: archive path
+        :param chunks: the content
+        :return: the chunks
+        """
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp.gz', dir=os.path.join(self.directory, 'objects'))
+        stored = False
+        try:
+            hasher = hashlib.sha256()
+            complete = False
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as f:
+                try:
+                    for chunk in chunks:
+                        hasher.update(chunk)
+                        f.write(chunk)
+                        yield chunk
+                    complete = True
+                except GeneratorExit:
+                    pass
+            self._store(path, tmp_path, hasher.hexdigest(), complete)
+            stored = True
+        finally:
+            if not stored:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+
+    def _store(self, path: str, tmp_path: str, digest: str, complete: bool = True) -> None:
+        with self._lock:
+            if not complete and self._digest(path) is not None:
+                # never replace the whole file with a prefix of it
+                os.remove(tmp_path)
+                return
+            object_path = self._object_path(digest)
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(tmp_path, object_path)
+            with self._db as db:
+                db.execute('INSERT OR REPLACE INTO entries (path, digest, size, accessed, complete) '
+                           'VALUES (?, ?, ?, ?, ?)',
+                           (path, digest, os.path.getsize(object_path), time.time(), int(complete)))
+            self._evict()
+
+    def put_chunks(self, path: str, chunks: Iterable[bytes]) -> str:
+        """
+        Store a file as it is streamed, holding a single chunk in memory
+        :param path: archive path
+        :param chunks: the content
+        :return: the sha256 digest of the content
+        """
+        hasher = hashlib.sha256()
+        for chunk in self.tee(path, chunks):
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def put(self, path: str, data: bytes) -> str:
+        return self.put_chunks(path, [data])
+
+    def size(self) -> int:
+        """
+        :return: compressed size of the cached contents
+        """
+        with self._lock:
+            return self._size()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def evict(self) -> None:
+        """
+        Evict the least recently read files until the compressed size is within max_bytes
+        """
+        with self._lock:
+            self._evict()
+
+    def _size(self) -> int:
+        row = self._db.execute('SELECT SUM(size) FROM (SELECT DISTINCT digest, size FROM entries)').fetchone()
+        return row[0] or 0
+
+    def _evict(self) -> None:
+        total = self._size()
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        cursor = self._db.execute('SELECT path, digest, size FROM entries ORDER BY accessed')
+        for path, digest, size in cursor.fetchall():
+            if total <= self.max_bytes:
+                break
+            with self._db as db:
+                db.execute('DELETE FROM entries WHERE path = ?', (path,))
+            # the object may still be shared by another path
+            if self._db.execute('SELECT 1 FROM entries WHERE digest = ? LIMIT 1', (digest,)).fetchone() is None:
+                try:
+                    os.remove(self._object_path(digest))
+                except FileNotFoundError:
+                    pass
+                total -= size
+            evicted += 1
+        logging.info(f'evicted {evicted} files from the filing cache, {total} bytes left')
+
+
+_cache: Optional[FilingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_filing_cache() -> Optional[FilingCache]:
+    """
+    :return: the cache shared by the process, or None if config.FILING_CACHE_ENABLED is off
+    """
+    global _cache
+    if not config.FILING_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = FilingCache()
+        return _cache
+
+
+def main():
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Show the filing cache usage, or evict it down to a size')
+    parser.add_argument("--max-bytes",
+                        type=int,
+                        help="Evict the least recently read files down to this compressed size")
+    args = parser.parse_args()
+
+    cache = FilingCache(max_bytes=config.FILING_CACHE_MAX_BYTES if args.max_bytes is None else args.max_bytes)
+    cache.evict()
+    print(f'{cache.directory}: {len(cache)} files, {cache.size()} compressed bytes')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import logging
+import sys
+import time
+import zipfile
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Iterator, List, Set, Tuple
+
+from src.common import config
+
+# A 10-K of a financial statement data set, year is the year it was filed in like in the edgar index
+Submission = namedtuple('Submission', ['adsh', 'cik', 'name', 'year', 'period'])
+
+SHARES_TAG = 'entitycommonstocksharesoutstanding'
+
+# num.txt rows of the fiscal year of the report: instants at the period end, and durations of 4 quarters ending then
+FOCUS_QUARTERS = {'0', '4'}
+
+# Version of the data set extraction logic. The fingerprint of the rows it stores has its own prefix, since they
+# aren't extracted from a filing and SecGov.find_stale_financials must not take them for extractor rows
+ENGINE_VERSION = 1
+FINGERPRINT_PREFIX = 'fsds-'
+
+
+def fingerprint(element_list: Dict[str, List[str]]) -> str:
+    """
+    :param element_list: as SecGov.ELEMENT_LIST
+    :return: fingerprint of the data set extraction logic and element list, stored with every ingested row
+    """
+    payload = json.dumps({'version': ENGINE_VERSION, 'elements': element_list}, sort_keys=True)
+    return FINGERPRINT_PREFIX + hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _read_table(archive: zipfile.ZipFile, name: str) -> Iterator[Dict[str, str]]:
+    with archive.open(name) as raw:
+        reader = csv.DictReader(io.TextIOWrapper(raw, encoding='utf-8', errors='replace', newline=''),
+                                delimiter='\t', quoting=csv.QUOTE_NONE)
+        yield from reader
+
+
+class FinancialStatementDataSet:
+    """
+    A quarterly financial statement data set zip of sec (e.g. 2018q1.zip), read from local disk.
+    The sub table is loaded for its 10-K submissions, and the num table is streamed row by row,
+    keeping the us-gaap tags of SecGov.ELEMENT_LIST and the shares outstanding.
+    """
+
+    def __init__(self, path: str, element_list: Dict[str, List[str]]):
+        """
+        :param path: the zip
+        :param element_list: field name to the tags to read it from, in priority order, as SecGov.ELEMENT_LIST
+        """
+        self.path = path
+        # lower case tag to (field, priority)
+        self.fields: Dict[str, Tuple[str, int]] = {}
+        for field, tags in element_list.items():
+            for priority, tag in enumerate(tags):
+                prefix, _, name = tag.lower().rpartition(':')
+                if prefix == 'us-gaap':
+                    self.fields.setdefault(name, (field, priority))
+
+    def submissions(self, archive: zipfile.ZipFile) -> Dict[str, Submission]:
+        """
+        :param archive:
+        :return: adsh to the 10-K submissions of the data set
+        """
+        submissions = {}
+        for row in _read_table(archive, 'sub.txt'):
+            if row['form'] != '10-K' or not row['period']:
+                continue
+            submissions[row['adsh']] = Submission(row['adsh'], int(row['cik']), row['name'],
+                                                  int(row['filed'][:4]), row['period'])
+        return submissions
+
+    def iter_records(self) -> Iterator[Tuple[Submission, Dict, str]]:
+        """
+        :return: (submission, financials, shares date) of every 10-K, financials as SecGov.extract_financial_data
+        """
+        with zipfile.ZipFile(self.path) as archive:
+            submissions = self.submissions(archive)
+            # adsh to field to (priority, value)
+            values: Dict[str, Dict[str, Tuple[int, float]]] = {}
+            # adsh to ddate to the summed shares
+            shares: Dict[str, Dict[str, float]] = {}
+            for row in _read_table(archive, 'num.txt'):
+                submission = submissions.get(row['adsh'])
+                # coreg facts are of a sub entity, like the segment contexts skipped by SecGov
+                if submission is None or row['coreg'] or not row['value']:
+                    continue
+                tag = row['tag'].lower()
+                if tag == SHARES_TAG and row['version'].startswith('dei'):
+                    by_date = shares.setdefault(row['adsh'], {})
+                    by_date[row['ddate']] = by_date.get(row['ddate'], 0) + float(row['value'])
+                    continue
+                field = self.fields.get(tag)
+                if (field is None or not row['version'].startswith('us-gaap')
+                        or row['ddate'] != submission.period or row['qtrs'] not in FOCUS_QUARTERS):
+                    continue
+                name, priority = field
+                adsh_values = values.setdefault(row['adsh'], {})
+                if name not in adsh_values or priority < adsh_values[name][0]:
+                    adsh_values[name] = (priority, float(row['value']))
+
+        for adsh, submission in submissions.items():
+            data = {name: value for name, (_, value) in values.get(adsh, {}).items()}
+            shares_date = 'NA'
+            if adsh in shares:
+                ddate = max(shares[adsh])
+                data['SharesOutstanding'] = shares[adsh][ddate]
+                shares_date = datetime.strptime(ddate, '%Y%m%d').date().isoformat()
+            if not data:
+                data['None'] = 0
+            if 'Assets' in data and 'Liabilities' in data:
+                data['TotalEquityGross'] = data['Assets'] - data['Liabilities']
+            if 'GrossProfit' not in data and 'Revenue' in data and 'Costs' in data:
+                data['GrossProfit'] = data['Revenue'] - data['Costs']
+            data['ReportFocus'] = datetime.strptime(submission.period, '%Y%m%d').date().isoformat()
+            yield submission, data, shares_date
+
+
+def ingest(paths: List[str], batch_size: int = config.INGEST_BATCH_SIZE) -> int:
+    """
+    Store the 10-K financials of the passed data sets as ticker:year records, without any network access.
+    A ticker:year already written by an earlier data set of the run is kept, like the edgar index keeps
+    the first 10-K of a year.
+    :param paths: data set zips, in chronological order
+    :param batch_size: records per write
+    :return: number of stored records
+    """
+    from src.data.sec_gov import SecGov
+    sec_gov = SecGov()
+    da = sec_gov.data_access
+    data_set_fingerprint = fingerprint(SecGov.ELEMENT_LIST)
+    seen: Set[Tuple[int, int]] = set()
+    stored = 0
+    start = time.time()
+    for path in paths:
+        data_set = FinancialStatementDataSet(path, SecGov.ELEMENT_LIST)
+        records = [record for record in data_set.iter_records()
+                   if (record[0].cik, record[0].year) not in seen]
+        tickers = da.get_tickers_by_cik_many([submission.cik for submission, _, _ in records])
+        mapped = 0
+        for i in range(0, len(records), batch_size):
+            rows = {}
+            info = {}
+            for (submission, data, shares_date), ticker in zip(records[i:i + batch_size],
+                                                              tickers[i:i + batch_size]):
+                seen.add((submission.cik, submission.year))
+                if not ticker:
+                    continue
+                sec_gov.add_market_cap(ticker, data, shares_date)
+                rows[(ticker, submission.year)] = data
+                info.setdefault(ticker, {}).update({
+                    'company_name': submission.name,
+                    f'txt_url:{submission.year}': f'edgar/data/{submission.cik}/{submission.adsh}.txt',
+                    f'fingerprint:{submission.year}': data_set_fingerprint,
+                })
+            if rows:
+                da.store_ticker_financials_many(rows)
+                da.store_ticker_info_bulk(info)
+                da.commit_ticker_data()
+            mapped += len(rows)
+        stored += mapped
+        elapsed = time.time() - start
+        logging.info(f'{path}: stored {mapped} of {len(records)} 10-K, {stored} in {elapsed:.0f}s '
+                     f'({stored / elapsed if elapsed else 0:.0f} records/s)')
+    return stored
+
+
+def main():
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Ingest sec financial statement data set zips')
+    parser.add_argument("zips",
+                        nargs='+',
+                        help="Data set zips, e.g. 2018q1.zip, ingested in the passed order")
+    args = parser.parse_args()
+    ingest(args.zips)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.common import config
+from src.data.xbrl_extractor import XbrlDocument
+
+# A filing to ingest, txt_url is its archive path
+FilingJob = namedtuple('FilingJob', ['ticker', 'year', 'txt_url'])
+
+# per filing outcome of the pipeline, PENDING until it ran
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+NO_XBRL = 'no-xbrl'
+
+_extractor = None
+
+
+def _init_parser() -> None:
+    global _extractor
+    from src.data.sec_gov import SecGov
+    # extraction needs neither the data access nor the network, so no connection is opened in the parsers
+    _extractor = SecGov.__new__(SecGov)
+
+
+def _parse(data: bytes) -> Tuple[Optional[Dict], str]:
+    """
+    Run in the parser processes
+    :param data: the XBRL instance document
+    :return: SecGov.extract_financial_data of the document
+    """
+    return _extractor.extract_financial_data(XbrlDocument(data))
+
+
+class IngestPipeline:
+    """
+    Staged filing ingestion: download threads read the XBRL instance of each filing through SecGov,
+    a process pool parses them on every core, and a single writer thread stores the results in batches.
+    Queues between the stages are bounded, so a slow stage holds back the ones before it.
+    """
+
+    def __init__(self, sec_gov, downloaders: int = config.SEC_MAX_IN_FLIGHT, parsers: int = config.INGEST_PARSERS,
+                 batch_size: int = config.INGEST_BATCH_SIZE,
+                 on_status: Callable[[List[Tuple[FilingJob, str]]], None] = None):
+        """
+        :param sec_gov: the SecGov to download through and store with
+        :param downloaders: download threads
+        :param parsers: parser processes
+        :param batch_size: filings per write
+        :param on_status: called by the writer with the (job, status) pairs of every written batch
+        """
+        self.sec_gov = sec_gov
+        self.downloaders = downloaders
+        self.parsers = parsers
+        self.batch_size = batch_size
+        self.on_status = on_status
+
+    def run(self, jobs: Iterable[FilingJob]) -> Counter:
+        """
+        :param jobs: the filings to ingest, read lazily
+        :return: number of filings per status
+        """
+        jobs_queue = queue.Queue(maxsize=self.downloaders * 2)
+        results = queue.Queue()
+        # filings downloaded but not written yet, bounds the parser input and the writer queue
+        pending = threading.BoundedSemaphore(self.parsers * 4)
+        counts = Counter()
+        start = time.time()
+
+        def download(pool: ProcessPoolExecutor) -> None:
+            while True:
+                job = jobs_queue.get()
+                if job is None:
+                    return
+                try:
+                    data = self.sec_gov.download_instance(job.txt_url)
+                except Exception as error:
+                    logging.error(f'Failed to download {job.txt_url}: {error}')
+                    data = error
+                pending.acquire()
+                if isinstance(data, bytes):
+                    try:
+                        future = pool.submit(_parse, data)
+                    except Exception as error:
+                        # e.g. BrokenProcessPool once a parser process died, the job fails and the queue drains
+                        logging.error(f'Failed to queue {job.txt_url} for parsing: {error}')
+                        results.put((job, error))
+                    else:
+                        future.add_done_callback(lambda f, job=job: results.put((job, f)))
+                else:
+                    results.put((job, data))
+
+        def write() -> None:
+            batch = []
+            while True:
+                try:
+                    item = results.get(timeout=1)
+                except queue.Empty:
+                    item = ()
+                if item:
+                    pending.release()
+                    batch.append(item)
+                # flush full batches, and partial ones when the results run dry
+                if batch and (len(batch) >= self.batch_size or not item):
+                    try:
+                        self._write(batch, counts, start)
+                    except Exception as error:
+                        logging.exception(f'Failed to write {len(batch)} filings: {error}')
+                    batch = []
+                if item is None:
+                    return
+
+        writer = threading.Thread(target=write, name='ingest-writer')
+        writer.start()
+        # the parsers are started once the writer and download threads run, forking them could copy a lock
+        # another thread holds, e.g. of logging. _init_parser sets up everything a spawned parser needs
+        with ProcessPoolExecutor(max_workers=self.parsers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_parser) as pool:
+            threads = [threading.Thread(target=download, args=(pool,), name=f'ingest-download-{i}')
+                       for i in range(self.downloaders)]
+            for thread in threads:
+                thread.start()
+            for job in jobs:
+                jobs_queue.put(FilingJob(*job))
+            for _ in threads:
+                jobs_queue.put(None)
+            for thread in threads:
+                thread.join()
+        # the pool shut down, every parse result was queued
+        results.put(None)
+        writer.join()
+        return counts
+
+    def _write(self, batch: List[Tuple[FilingJob, object]], counts: Counter, start: float) -> None:
+        rows = {}
+        info = {}
+        statuses = []
+        fingerprint = self.sec_gov.fingerprint()
+        for job, result in batch:
+            if isinstance(result, Future):
+                result = result.exception() or result.result()
+            if isinstance(result, Exception):
+                logging.error(f'Failed to ingest {job.ticker} {job.year}: {result}')
+                statuses.append((job, FAILED))
+                continue
+            data, shares_date = result if result is not None else (None, 'NA')
+            if data is None:
+                statuses.append((job, NO_XBRL))
+                continue
+            try:
+                self.sec_gov.add_market_cap(job.ticker, data, shares_date)
+            except Exception as error:
+                logging.error(f'Failed to ingest {job.ticker} {job.year}: {error}')
+                statuses.append((job, FAILED))
+                continue
+            rows[(job.ticker, job.year)] = data
+            info.setdefault(job.ticker, {})[f'fingerprint:{job.year}'] = fingerprint
+            statuses.append((job, DONE))
+
+        da = self.sec_gov.data_access
+        if rows:
+            da.store_ticker_financials_many(rows)
+            da.store_ticker_info_bulk(info)
+            da.commit_ticker_data()
+        if self.on_status is not None:
+            self.on_status(statuses)
+
+        counts.update(status for _, status in statuses)
+        total = sum(counts.values())
+        elapsed = time.time() - start
+        logging.info(f'ingested {total} filings ({dict(counts)}) in {elapsed:.0f}s '
+                     f'({total / elapsed if elapsed else 0:.1f} filings/s)')
@@ -0,0 +1,121 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from src.common import config
+from src.data.price_store import COLUMNS, PriceSeries
+
+
+def _to_series(frame) -> Optional[PriceSeries]:
+    """
+    :param frame: daily bars with a datetime index and Close and Volume columns
+    :return: the bars with a close price, None if there are none
+    """
+    frame = frame.dropna(subset=['Close'])
+    if frame.empty:
+        return None
+    index = frame.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return PriceSeries(timestamps=index.values.astype('datetime64[s]').astype(COLUMNS['timestamps']),
+                       close=frame['Close'].to_numpy(dtype=np.float64),
+                       volume=frame['Volume'].fillna(0).to_numpy(dtype=np.float64))
+
+
+class PriceSource(ABC):
+    """
+    Daily price and volume history of many tickers
+    """
+
+    @abstractmethod
+    def history(self, tickers: List[str], start: Optional[datetime] = None) -> Dict[str, PriceSeries]:
+        """
+        :param tickers:
+        :param start: the first day to return, all the history if None
+        :return: ticker to its bars, tickers without any bar are missing
+        """
+
+
+class YahooPriceSource(PriceSource):
+    """
+    Yahoo finance, many tickers per yfinance download
+    """
+
+    def __init__(self, threads: int = config.PRICE_DOWNLOAD_THREADS):
+        """
+        :param threads: concurrent requests of a download
+        """
+        self.threads = threads
+
+    def history(self, tickers: List[str], start: Optional[datetime] = None) -> Dict[str, PriceSeries]:
+        import yfinance as yf
+        if not tickers:
+            return {}
+        kwargs = {'start': start.strftime('%Y-%m-%d')} if start is not None else {'period': 'max'}
+        # adjusted closes, like yf.Ticker.history
+        data = yf.download(tickers, group_by='ticker', auto_adjust=True, threads=self.threads,
+                           progress=False, **kwargs)
+        if data.empty:
+            return {}
+        history = {}
+        for ticker in tickers:
+            if len(tickers) == 1:
+                frame = data
+            elif ticker.upper() in data.columns.get_level_values(0):
+                frame = data[ticker.upper()]
+            else:
+                continue
+            series = _to_series(frame)
+            if series is not None:
+                history[ticker] = series
+        return history
+
+
+class DirectoryPriceSource(PriceSource):
+    """
+    A local directory with a {ticker}.csv file per ticker, with a Date column and Close and Volume columns,
+    e.g. as exported from yfinance. For offline loads and tests.
+    """
+
+    def __init__(self, directory: str = config.PRICE_SOURCE_DIR):
+        self.directory = directory
+
+    def _read(self, ticker: str):
+        import pandas as pd
+        path = os.path.join(self.directory, f'{ticker}.csv')
+        if not os.path.exists(path):
+            return None
+        frame = pd.read_csv(path)
+        if 'Date' in frame.columns:
+            frame = frame.set_index(pd.to_datetime(frame['Date'], utc=True))
+        if getattr(frame.index, 'tz', None) is not None:
+            frame.index = frame.index.tz_convert('UTC').tz_localize(None)
+        return frame
+
+    def history(self, tickers: List[str], start: Optional[datetime] = None) -> Dict[str, PriceSeries]:
+        history = {}
+        for ticker in tickers:
+            frame = self._read(ticker)
+            if frame is None:
+                logging.debug(f'No price file for {ticker} in {self.directory}')
+                continue
+            if start is not None:
+                frame = frame[frame.index >= start]
+            series = _to_series(frame)
+            if series is not None:
+                history[ticker] = series
+        return history
+
+
+def get_price_source() -> PriceSource:
+    """
+    :return: the price source selected by config.PRICE_SOURCE
+    """
+    if config.PRICE_SOURCE == 'yahoo':
+        return YahooPriceSource()
+    if config.PRICE_SOURCE == 'directory':
+        return DirectoryPriceSource()
+    raise ValueError(f'Unknown price source {config.PRICE_SOURCE}')
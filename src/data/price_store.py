@@ -0,0 +1,234 @@
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from src.common import config
+
+# Column views over the memory-mapped files of a single ticker.
+# timestamps are int64 seconds, close and volume are float32
+PriceSeries = namedtuple('PriceSeries', ['timestamps', 'close', 'volume'])
+
+COLUMNS = {
+    'timestamps': np.int64,
+    'close': np.float32,
+    'volume': np.float32,
+}
+
+
+class PriceStore:
+    """
+    Local columnar copy of the RedisTimeSeries price and volume series.
+    Each ticker is stored as one .npy file per column and read back through memory maps,
+    so lookups never copy the data and never touch the network.
+    Every write stores the columns in a new version directory, {ticker}.current names the version to read
+    and is replaced in a single step, so readers never see the columns of different writes.
+    """
+
+    # as-of lookups only accept a sample this old, same as DataAccess.get_price
+    MAX_AGE = timedelta(weeks=1)
+
+    def __init__(self, directory: str = config.PRICE_STORE_DIR):
+        self.directory = directory
+        # ticker to the version of its series when loaded, and its series
+        self._series: Dict[str, Tuple[str, PriceSeries]] = {}
+
+    def _current_path(self, ticker: str) -> str:
+        return os.path.join(self.directory, f'{ticker}.current')
+
+    def _path(self, ticker: str, column: str, version: str) -> str:
+        # an empty version is the layout from before versions, a file per column next to the others
+        if not version:
+            return os.path.join(self.directory, f'{ticker}.{column}.npy')
+        return os.path.join(self.directory, version, f'{column}.npy')
+
+    def _version(self, ticker: str) -> Optional[str]:
+        """
+        :return: the version directory of the stored series, None if the ticker is not stored
+        """
+        try:
+            with open(self._current_path(ticker)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return '' if os.path.exists(self._path(ticker, 'timestamps', '')) else None
+
+    def has_ticker(self, ticker: str) -> bool:
+        return ticker in self._series or self._version(ticker) is not None
+
+    def write(self, ticker: str, timestamps, close, volume) -> int:
+        """
+        Replace the stored series of a ticker
+        :param ticker:
+        :param timestamps: sample timestamps in seconds, sorted
+        :param close: close prices, aligned with timestamps
+        :param volume: volumes, aligned with timestamps
+        :return: number of samples written
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        values = {'timestamps': timestamps, 'close': close, 'volume': volume}
+        if len({len(column) for column in values.values()}) != 1:
+            raise ValueError(f'columns of {ticker} are not aligned: {[len(column) for column in values.values()]}')
+        previous = self._version(ticker)
+        version_dir = tempfile.mkdtemp(prefix=f'{ticker}.', dir=self.directory)
+        for column, column_values in values.items():
+            np.save(os.path.join(version_dir, f'{column}.npy'), np.asarray(column_values, dtype=COLUMNS[column]))
+        fd, tmp_path = tempfile.mkstemp(prefix=f'{ticker}.', suffix='.tmp', dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            f.write(os.path.basename(version_dir))
+        os.replace(tmp_path, self._current_path(ticker))
+
+        # readers that loaded it keep their memory maps, the ones about to load it read the new version instead
+        if previous:
+            shutil.rmtree(os.path.join(self.directory, previous), ignore_errors=True)
+        elif previous is not None:
+            for column in COLUMNS:
+                try:
+                    os.remove(self._path(ticker, column, previous))
+                except FileNotFoundError:
+                    pass
+        self._series.pop(ticker, None)
+        return len(timestamps)
+
+    def upsert(self, ticker: str, timestamps, **columns) -> int:
+        """
+        Merge samples into the stored series of a ticker.
+        Samples at an existing timestamp overwrite the passed columns, new samples get NaN in the missing ones.
+        :param ticker:
+        :param timestamps: sample timestamps in seconds
+        :param columns: close and/or volume values, aligned with timestamps
+        :return: number of new samples
+        """
+        new_timestamps = np.asarray(timestamps, dtype=np.int64)
+        series = self.load(ticker)
+        if series is None:
+            series = PriceSeries(**{column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()})
+
+        merged_timestamps = np.union1d(series.timestamps, new_timestamps)
+        old_rows = np.searchsorted(merged_timestamps, series.timestamps)
+        new_rows = np.searchsorted(merged_timestamps, new_timestamps)
+        merged = {'timestamps': merged_timestamps}
+        for column in ['close', 'volume']:
+            values = np.full(len(merged_timestamps), np.nan, dtype=COLUMNS[column])
+            values[old_rows] = getattr(series, column)
+            if column in columns:
+                values[new_rows] = np.asarray(columns[column], dtype=COLUMNS[column])
+            merged[column] = values
+        self.write(ticker, **merged)
+        return len(merged_timestamps) - len(series.timestamps)
+
+    def load(self, ticker: str) -> Optional[PriceSeries]:
+        """
+        :param ticker:
+        :return: memory-mapped columns of the ticker, or None if it is not stored
+        """
+        for attempt in range(3):
+            version = self._version(ticker)
+            if version is None:
+                self._series.pop(ticker, None)
+                return None
+            cached = self._series.get(ticker)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            try:
+                series = PriceSeries(**{column: np.load(self._path(ticker, column, version), mmap_mode='r')
+                                        for column in COLUMNS})
+            except FileNotFoundError:
+                # replaced by another writer since the version was read
+                if attempt == 2:
+                    raise
+                continue
+            self._series[ticker] = (version, series)
+            return series
+
+    def get_range(self, ticker: str, start: datetime, end: datetime) -> Optional[PriceSeries]:
+        """
+        :param ticker:
+        :param start:
+        :param end: inclusive
+        :return: views of the columns between start and end, or None if the ticker is not stored
+        """
+        series = self.load(ticker)
+        if series is None:
+            return None
+        first = np.searchsorted(series.timestamps, int(start.timestamp()), side='left')
+        last = np.searchsorted(series.timestamps, int(end.timestamp()), side='right')
+        return PriceSeries(*(column[first:last] for column in series))
+
+    def _as_of(self, ticker: str, date: datetime, column: str) -> Optional[float]:
+        series = self.load(ticker)
+        if series is None:
+            return None
+        timestamp = int(date.timestamp())
+        first = np.searchsorted(series.timestamps, timestamp - self.MAX_AGE.total_seconds(), side='left')
+        last = np.searchsorted(series.timestamps, timestamp, side='right')
+        # upsert leaves NaN in the columns a sample wasn't written with, those samples are skipped
+        known = np.flatnonzero(~np.isnan(getattr(series, column)[first:last]))
+        if not len(known):
+            return 0
+        return float(getattr(series, column)[first + known[-1]])
+
+    def get_price(self, ticker: str, date: datetime) -> Optional[float]:
+        """
+        :param ticker:
+        :param date:
+        :return: the last known close price up to date, 0 if there is none in the week before,
+        None if the ticker is not stored
+        """
+        return self._as_of(ticker, date, 'close')
+
+    def get_volume(self, ticker: str, date: datetime) -> Optional[float]:
+        """
+        :param ticker:
+        :param date:
+        :return: the last known volume up to date, 0 if there is none in the week before,
+        None if the ticker is not stored
+        """
+        return self._as_of(ticker, date, 'volume')
+
+
+def export_from_redis(tickers: List[str], store: PriceStore = None) -> int:
+    """
+    Copy the price and volume series of the passed tickers from Redis into the local store
+    :param tickers:
+    :param store: defaults to the store used by DataAccess
+    :return: number of exported tickers
+    """
+    from src.data.data_access import get_data_access
+    da = get_data_access()
+    store = store or da.price_store
+    exported = 0
+    for ticker in tickers:
+        columns = da.get_price_volume_columns(ticker)
+        if columns is None:
+            logging.info(f'No prices to export for {ticker}')
+            continue
+        count = store.write(ticker, *columns)
+        exported += 1
+        logging.debug(f'exported {count} prices for {ticker}')
+    logging.info(f'exported {exported}/{len(tickers)} tickers to {store.directory}')
+    return exported
+
+
+def main():
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Export prices from Redis to the local price store')
+    parser.add_argument("tickers",
+                        nargs='*',
+                        help="The tickers to export, all known tickers if omitted")
+    args = parser.parse_args()
+
+    tickers = args.tickers
+    if not tickers:
+        from src.data.data_access import get_data_access
+        tickers = get_data_access().get_ticker_list()
+    export_from_redis(tickers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pymysql
+import redis
+from src.common import config
+from src.data.connection_pool import MySQLConnectionPool
+from src.data.data_access import DataAccess
+
+
+class RedisDataAccess(DataAccess):
+    """
+    Stores the financials, info and prices in RedisTimeSeries and the sec index in MySQL
+    """
+
+    # Both clients are shared by every instance and created lazily on first use
+    _redis_client: redis.Redis = None
+    _db_pool: MySQLConnectionPool = None
+    _init_lock = threading.Lock()
+
+    REDIS_TICKER_SET = 'ticker_set'
+    REDIS_CIK2TICKER_KEY = 'cik2ticker'
+
+    @property
+    def redis_client(self) -> redis.Redis:
+        if RedisDataAccess._redis_client is None:
+            with RedisDataAccess._init_lock:
+                if RedisDataAccess._redis_client is None:
+                    pool = redis.BlockingConnectionPool(
+                        host=config.REDIS_HOST_NAME,
+                        port=config.REDIS_PORT,
+                        max_connections=config.REDIS_MAX_CONNECTIONS,
+                        health_check_interval=config.REDIS_HEALTH_CHECK_INTERVAL,
+                        decode_responses=True
+                    )
+                    RedisDataAccess._redis_client = redis.Redis(connection_pool=pool)
+        return RedisDataAccess._redis_client
+
+    @property
+    def db_pool(self) -> MySQLConnectionPool:
+        if RedisDataAccess._db_pool is None:
+            with RedisDataAccess._init_lock:
+                if RedisDataAccess._db_pool is None:
+                    RedisDataAccess._db_pool = MySQLConnectionPool(
+                        max_size=config.DB_POOL_SIZE,
+                        checkout_timeout=config.DB_POOL_TIMEOUT,
+                        host=config.DB_HOST_NAME,
+                        user=config.DB_USER,
+                        passwd=config.DB_PASSWORD,
+                        db=config.DB_NAME
+                    )
+        return RedisDataAccess._db_pool
+
+    # Ticker financials
+
+    def store_ticker_financials(self, ticker: str, year: int, data: dict):
+        try:
+            self.redis_client.hset(self._financials_key(ticker, year), mapping=data)
+        except redis.ResponseError as error:
+            logging.debug(error)
+
+    def store_ticker_financials_many(self, rows: Dict[Tuple[str, int], dict]) -> None:
+        pipe = self.redis_client.pipeline(transaction=False)
+        for (ticker, year), data in rows.items():
+            pipe.hset(self._financials_key(ticker, year), mapping=data)
+        try:
+            pipe.execute()
+        except redis.ResponseError as error:
+            logging.debug(error)
+
+    def get_ticker_financials(self, ticker: str, year: int):
+        try:
+            return self.redis_client.hgetall(f'{ticker}:{year}')
+        except redis.ResponseError as error:
+            logging.error(error)
+
+    def get_ticker_financials_many(self, keys: List[Tuple[str, int]]) -> List[dict]:
+        """
+        Read many ticker:year hashes in one pipelined round trip
+        :param keys: (ticker, year) pairs
+        :return: the hashes aligned with keys, empty for the ones that are not stored
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        for ticker, year in keys:
+            pipe.hgetall(self._financials_key(ticker, year))
+        try:
+            results = pipe.execute(raise_on_error=False)
+        except redis.RedisError as error:
+            logging.error(error)
+            return [{} for _ in keys]
+        return [result if isinstance(result, dict) else {} for result in results]
+
+    def get_ticker_fields_many(self, keys: List[Tuple[str, int]], fields: List[str]) -> List[Optional[dict]]:
+        pipe = self.redis_client.pipeline(transaction=False)
+        for ticker, year in keys:
+            pipe.exists(self._financials_key(ticker, year))
+            # HMGET needs a field, without any this only checks which pairs are stored
+            if fields:
+                pipe.hmget(self._financials_key(ticker, year), fields)
+        try:
+            results = pipe.execute(raise_on_error=False)
+        except redis.RedisError as error:
+            logging.error(error)
+            return [None for _ in keys]
+        replies = iter(results)
+        entries = []
+        for _ in keys:
+            exists = next(replies)
+            values = next(replies) if fields else []
+            # failed commands are returned as exceptions
+            if not isinstance(exists, int) or not exists or not isinstance(values, list):
+                entries.append(None)
+            else:
+                entries.append({field: value for field, value in zip(fields, values) if value is not None})
+        return entries
+
+    def is_ticker_stored(self, ticker: str, year: int):
+        try:
+            return self.redis_client.exists(self._financials_key(ticker, year))
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def commit_ticker_data(self):
+        try:
+            return self.redis_client.bgsave()
+        except redis.ResponseError as error:
+            logging.debug(error)
+
+    # Ticker info
+    @staticmethod
+    def _info_key(ticker: str) -> str:
+        return f'{ticker}:info'
+
+    def store_ticker_info(self, ticker: str, data: dict):
+        try:
+            self.redis_client.hset(self._info_key(ticker), mapping=data)
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def store_ticker_info_bulk(self, info: Dict[str, dict]) -> None:
+        pipe = self.redis_client.pipeline(transaction=False)
+        for ticker, data in info.items():
+            pipe.hset(self._info_key(ticker), mapping=data)
+        try:
+            pipe.execute()
+        except redis.ResponseError as error:
+            logging.debug(error)
+
+    def get_ticker_info_many(self, tickers: List[str]) -> List[dict]:
+        pipe = self.redis_client.pipeline(transaction=False)
+        for ticker in tickers:
+            pipe.hgetall(self._info_key(ticker))
+        try:
+            results = pipe.execute(raise_on_error=False)
+        except redis.RedisError as error:
+            logging.error(error)
+            return [{} for _ in tickers]
+        return [result if isinstance(result, dict) else {} for result in results]
+
+    def get_ticker_url(self, ticker: str, year: int):
+        try:
+            return self.redis_client.hget(self._info_key(ticker), f'txt_url:{year}')
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def get_ticker_cik(self, ticker: str):
+        try:
+            return self.redis_client.hget(self._info_key(ticker), 'cik')
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    # Ticker price
+    def store_ticker_price(self, ticker: str, timestamp: int, value: float) -> None:
+        try:
+            self.redis_client.execute_command(
+                "TS.ADD", f"{ticker}:price", timestamp, value)
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def store_ticker_volume(self, ticker: str, timestamp: int, value: float) -> None:
+        try:
+            self.redis_client.execute_command(
+                "TS.ADD", f"{ticker}:volume", timestamp, value)
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def store_ticker_series_bulk(self, ticker: str, timestamps: List[int], prices: List[float],
+                                 volumes: List[float], batch_size: int = config.PRICE_BATCH_SIZE) -> int:
+        """
+        Store whole price and volume columns using pipelined TS.MADD batches
+        :param ticker:
+        :param timestamps: sample timestamps in seconds
+        :param prices: close prices, aligned with timestamps
+        :param volumes: volumes, aligned with timestamps
+        :param batch_size: number of samples per TS.MADD command
+        :return: number of samples written to each series
+        """
+        price_key = f'{ticker}:price'
+        volume_key = f'{ticker}:volume'
+        pipe = self.redis_client.pipeline(transaction=False)
+        # TS.MADD does not create missing keys, unlike TS.ADD
+        pipe.execute_command('TS.CREATE', price_key)
+        pipe.execute_command('TS.CREATE', volume_key)
+        for start in range(0, len(timestamps), batch_size):
+            end = start + batch_size
+            ts_batch = timestamps[start:end]
+            price_args = [arg for sample in zip(ts_batch, prices[start:end]) for arg in (price_key, *sample)]
+            volume_args = [arg for sample in zip(ts_batch, volumes[start:end]) for arg in (volume_key, *sample)]
+            pipe.execute_command('TS.MADD', *price_args)
+            pipe.execute_command('TS.MADD', *volume_args)
+        written = 0
+        try:
+            results = pipe.execute(raise_on_error=False)
+        except redis.RedisError as error:
+            logging.error(f'{error} ticker: {ticker}')
+            return written
+        # the first two results are the TS.CREATE replies, which fail if the key already exists
+        for batch_result in results[2::2]:
+            if isinstance(batch_result, list):
+                written += sum(1 for sample in batch_result if not isinstance(sample, redis.ResponseError))
+            else:
+                logging.debug(f'{batch_result} ticker: {ticker}')
+        # keep the local copy of the series in sync, once it was exported
+        if self.price_store.has_ticker(ticker):
+            self.price_store.upsert(ticker, timestamps, close=prices, volume=volumes)
+        return written
+
+    def is_ticker_volume_exists(self, ticker: str):
+        try:
+            return self.redis_client.exists(f'{ticker}:volume')
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def is_ticker_price_exists(self, ticker: str):
+        try:
+            return self.redis_client.exists(f'{ticker}:price')
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def get_missing_price_tickers(self, tickers: List[str]) -> List[str]:
+        """
+        :param tickers:
+        :return: the tickers which have no stored price series, checked in one pipelined batch
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        for ticker in tickers:
+            pipe.exists(f'{ticker}:price')
+        try:
+            return [ticker for ticker, exists in zip(tickers, pipe.execute()) if not exists]
+        except redis.RedisError as error:
+            logging.error(error)
+            return []
+
+    def get_last_price_timestamps(self, tickers: List[str]) -> List[Optional[int]]:
+        pipe = self.redis_client.pipeline(transaction=False)
+        for ticker in tickers:
+            pipe.execute_command('TS.GET', f'{ticker}:price')
+        try:
+            results = pipe.execute(raise_on_error=False)
+        except redis.RedisError as error:
+            logging.error(error)
+            return [None for _ in tickers]
+        # TS.GET fails on a missing key, and is empty for an empty series
+        return [int(result[0]) if isinstance(result, list) and result else None for result in results]
+
+    def get_prices(self, ticker: str, start: datetime, end: datetime) -> List[Tuple[datetime, float]]:
+        """
+        :param ticker:
+        :param start:
+        :param end:
+        :return: list of (datetime, price) tuples
+        """
+        try:
+            start_time = int(start.timestamp())
+            end_time = int(end.timestamp())
+            redis_response = self.redis_client.execute_command("TS.RANGE", f"{ticker}:price", start_time, end_time)
+            response_list = [(datetime.fromtimestamp(e[0]), float(e[1])) for e in redis_response]
+            return response_list
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def get_price_volume_columns(self, ticker: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.execute_command('TS.RANGE', f'{ticker}:price', '-', '+')
+        pipe.execute_command('TS.RANGE', f'{ticker}:volume', '-', '+')
+        try:
+            price_response, volume_response = pipe.execute(raise_on_error=False)
+        except redis.RedisError as error:
+            logging.error(f'{error} ticker: {ticker}')
+            return None
+        if not isinstance(price_response, list) or not price_response:
+            return None
+
+        timestamps = np.array([e[0] for e in price_response], dtype=np.int64)
+        prices = np.array([e[1] for e in price_response], dtype=np.float64)
+        volumes = np.zeros(len(timestamps), dtype=np.float64)
+        if isinstance(volume_response, list) and volume_response:
+            volume_timestamps = np.array([e[0] for e in volume_response], dtype=np.int64)
+            volume_values = np.array([e[1] for e in volume_response], dtype=np.float64)
+            # both series are written together, but don't assume they have the exact same samples
+            i = np.minimum(np.searchsorted(volume_timestamps, timestamps), len(volume_timestamps) - 1)
+            matched = volume_timestamps[i] == timestamps
+            volumes[matched] = volume_values[i[matched]]
+        return timestamps, prices, volumes
+
+    def get_volumes(self, ticker: str, start: datetime, end: datetime) -> List[Tuple[datetime, float]]:
+        """
+        :param ticker:
+        :param start:
+        :param end:
+        :return: list of (datetime, price) tuples
+        """
+        try:
+            start_time = int(start.timestamp())
+            end_time = int(end.timestamp())
+            redis_response = self.redis_client.execute_command("TS.RANGE", f"{ticker}:volume", start_time, end_time)
+            response_list = [(datetime.fromtimestamp(e[0]), float(e[1])) for e in redis_response]
+            return response_list
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def _get_prices_at(self, tickers: List[str], dates: List[datetime]) -> Dict[str, List[float]]:
+        # one pipelined batch for all the (ticker, date) pairs
+        pipe = self.redis_client.pipeline(transaction=False)
+        for ticker in tickers:
+            for date in dates:
+                start_time = int((date - timedelta(weeks=1)).timestamp())
+                end_time = int(date.timestamp())
+                pipe.execute_command('TS.REVRANGE', f'{ticker}:price', start_time, end_time, 'COUNT', 1)
+        try:
+            results = pipe.execute(raise_on_error=False)
+        except redis.RedisError as error:
+            logging.error(error)
+            return {ticker: [0] * len(dates) for ticker in tickers}
+
+        prices = {}
+        for i, ticker in enumerate(tickers):
+            ticker_prices = []
+            for sample in results[i * len(dates):(i + 1) * len(dates)]:
+                if isinstance(sample, list) and sample:
+                    ticker_prices.append(float(sample[0][1]))
+                else:
+                    ticker_prices.append(0)
+            prices[ticker] = ticker_prices
+        return prices
+
+    def get_ticker_by_cik(self, ticker):
+        try:
+            return self.redis_client.hget(self.REDIS_CIK2TICKER_KEY, ticker)
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def get_tickers_by_cik_many(self, ciks: List[int]) -> List[Optional[str]]:
+        if not ciks:
+            return []
+        try:
+            return self.redis_client.hmget(self.REDIS_CIK2TICKER_KEY, [str(cik) for cik in ciks])
+        except redis.ResponseError as error:
+            logging.error(error)
+            return [None for _ in ciks]
+
+    def store_ticker_cik_mapping(self, ticker: str, cik: str) -> None:
+        try:
+            self.redis_client.hset(self._info_key(ticker), 'cik', cik)
+            self.redis_client.hset(f'{self.REDIS_CIK2TICKER_KEY}', cik, ticker)
+            self.redis_client.sadd(self.REDIS_TICKER_SET, ticker)
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def is_ticker_mapped(self, ticker: str) -> bool:
+        try:
+            return self.redis_client.sismember(self.REDIS_TICKER_SET, ticker)
+        except redis.ResponseError as error:
+            logging.debug(f'{error} ticker: {ticker}')
+
+    def is_ticker_list_exist(self) -> bool:
+        try:
+            return self.redis_client.exists(self.REDIS_TICKER_SET)
+        except redis.ResponseError as error:
+            logging.debug(f'{error}')
+
+    def get_ticker_list(self) -> List[str]:
+        try:
+            # a single SSCAN call may stop before the end of the set, so follow the cursor
+            return list(self.redis_client.sscan_iter(self.REDIS_TICKER_SET, count=30 * 1000))
+        except redis.ResponseError as error:
+            logging.debug(error)
+
+    # Index
+    def _store_index_batch(self, batch: List[Tuple[str, int, str, str, str]]) -> None:
+        sql = "INSERT INTO `sec_idx` (`cik`, `year`, `company`, `report_type`, `url`) " \
+              "VALUES (%s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE `cik` = `cik`"
+        with self.db_pool.connection() as connection, connection.cursor() as cursor:
+            # pymysql turns executemany of a single INSERT ... VALUES into multi-row statements
+            cursor.executemany(sql, batch)
+            connection.commit()
+
+    def _count_index_rows(self, year: int) -> int:
+        with self.db_pool.connection() as connection, connection.cursor() as cursor:
+            sql = 'SELECT COUNT(*) FROM sec_idx WHERE year = %s'
+            cursor.execute(sql, (year,))
+            result = cursor.fetchone()
+            return result[0]
+
+    def _load_year_index(self, year: int) -> Dict[int, Tuple[str, str]]:
+        year_index = {}
+        with self.db_pool.connection() as connection, connection.cursor(pymysql.cursors.SSCursor) as cursor:
+            # server side cursor, rows are streamed instead of buffered by the client
+            cursor.execute('SELECT cik, company, url FROM sec_idx WHERE year = %s', (year,))
+            for cik, company, url in cursor:
+                year_index[int(cik)] = (company, url)
+        return year_index
+
+    def get_index_file_state(self, path: str) -> Optional[Tuple[str, str]]:
+        with self.db_pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute('SELECT etag, last_modified FROM index_files WHERE path = %s', (path,))
+            return cursor.fetchone()
+
+    def store_index_file_state(self, path: str, etag: str, last_modified: str) -> None:
+        sql = "INSERT INTO `index_files` (`path`, `etag`, `last_modified`) VALUES (%s, %s, %s) " \
+              "ON DUPLICATE KEY UPDATE `etag` = VALUES(`etag`), `last_modified` = VALUES(`last_modified`)"
+        with self.db_pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(sql, (path, etag, last_modified))
+            connection.commit()
+
+    def store_ingest_status(self, year: int, statuses: Dict[int, str]) -> None:
+        sql = "INSERT INTO `ingest_progress` (`cik`, `year`, `status`) VALUES (%s, %s, %s) " \
+              "ON DUPLICATE KEY UPDATE `status` = VALUES(`status`)"
+        rows = [(int(cik), int(year), status) for cik, status in statuses.items()]
+        with self.db_pool.connection() as connection, connection.cursor() as cursor:
+            for i in range(0, len(rows), config.INDEX_BATCH_SIZE):
+                cursor.executemany(sql, rows[i:i + config.INDEX_BATCH_SIZE])
+            connection.commit()
+
+    def get_ingest_status(self, year: int) -> Dict[int, str]:
+        with self.db_pool.connection() as connection, connection.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute('SELECT cik, status FROM ingest_progress WHERE year = %s', (year,))
+            return {int(cik): status for cik, status in cursor}
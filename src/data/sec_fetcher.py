@@ -0,0 +1,125 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from src.common import config
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket, refilled continuously at rate tokens per second up to capacity
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Block until a token is available and take it
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SecFetcher:
+    """
+    Concurrent fetcher of sec resources, sharing one request rate ceiling across all threads.
+    Requests go through a single session with a bounded connection pool to www.sec.gov,
+    so at most max_in_flight requests (streamed bodies included) are open at once and connections are reused.
+    """
+
+    # throttled or transient server errors, retried with jittered exponential backoff
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    MAX_BACKOFF = 60
+
+    def __init__(self, rate: float = config.SEC_RATE_LIMIT, max_in_flight: int = config.SEC_MAX_IN_FLIGHT,
+                 retries: int = config.SEC_RETRIES, backoff: float = config.SEC_BACKOFF):
+        """
+        :param rate: requests per second
+        :param max_in_flight: concurrent requests
+        :param retries: retries of a failed request
+        :param backoff: base delay of the first retry in seconds
+        """
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(rate)
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = config.SEC_USER_AGENT
+        adapter = HTTPAdapter(pool_maxsize=max_in_flight, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _delay(self, attempt: int, resp: requests.Response = None) -> float:
+        retry_after = resp.headers.get('Retry-After') if resp is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.MAX_BACKOFF)
+        # full jitter, so throttled threads don't retry in lockstep
+        return random.uniform(0, min(self.MAX_BACKOFF, self.backoff * 2 ** attempt))
+
+    def get(self, url: str, stream: bool = False, headers: Dict[str, str] = None) -> requests.Response:
+        """
+        :param url:
+        :param stream: don't read the body yet, the response must be closed by the caller
+        :param headers: extra request headers
+        :return: the response, the last failed one if all retries failed
+        """
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            try:
+                resp = self.session.get(url, stream=stream, headers=headers, timeout=config.SEC_TIMEOUT)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if attempt == self.retries:
+                    raise
+                delay = self._delay(attempt)
+                logging.warning(f'Failed to fetch {url}: {error}, retrying in {delay:.1f}s')
+                time.sleep(delay)
+                continue
+            if resp.status_code not in self.RETRY_STATUS or attempt == self.retries:
+                return resp
+            delay = self._delay(attempt, resp)
+            resp.close()
+            logging.warning(f'Failed to fetch {url}: {resp.status_code}, retrying in {delay:.1f}s')
+            time.sleep(delay)
+
+    def map(self, fn: Callable, items: Iterable) -> List:
+        """
+        Run fn on every item concurrently, with one worker per in-flight request
+        :param fn: a function making requests through this fetcher
+        :param items:
+        :return: the results, in items order
+        """
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            return list(executor.map(fn, items))
+
+
+_fetcher: Optional[SecFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_sec_fetcher() -> SecFetcher:
+    """
+    :return: the fetcher shared by the process, so the rate ceiling holds across all SecGov instances
+    """
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = SecFetcher()
+        return _fetcher
@@ -1,14 +1,58 @@
+import hashlib
+import json
 import logging
 import time
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple, Union
 
-import requests
 from bs4 import BeautifulSoup
 from bs4.element import SoupStrainer
 from dateutil import parser
-from datetime import datetime
-
-from src.data.data_access import DataAccess
+from datetime import date, datetime, timedelta
+
+from src.common import config
+from src.data.data_access import get_data_access
+from src.data.filing_cache import get_filing_cache
+from src.data.fs_datasets import FINGERPRINT_PREFIX
+from src.data.ingest import DONE, FAILED, PENDING, FilingJob, IngestPipeline
+from src.data.sec_fetcher import get_sec_fetcher
+from src.data.xbrl_extractor import XbrlDocument, clean_value, read_instance
+
+
+class ArchiveUnavailable(IOError):
+    """
+    A file of the sec archive could not be fetched, e.g. it is not cached and sec is offline
+    """
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Split a stream of chunks into lines, without their line endings
+    """
+    pending = b''
+    for chunk in chunks:
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b'\r')
+    if pending:
+        yield pending.rstrip(b'\r')
+
+
+def parse_index_rows(chunks: Iterable[bytes], filing: str = '10-K') -> Iterator[Tuple[str, str, str, str]]:
+    """
+    Parse the rows of an edgar master index file
+    :param chunks: the file
+    :param filing: the form type to keep
+    :return: (cik, company, form type, url) tuples of the matching filings
+    """
+    for line in iter_lines(chunks):
+        # CIK|Company Name|Form Type|Date Filed|Filename
+        values = line.decode("ISO-8859-1").split('|')
+        if len(values) == 5 and values[2] == filing:
+            yield values[0], values[1], values[2], values[4]
 
 
 class SecGov:
@@ -53,58 +97,165 @@ class SecGov:
         ]
     }
 
+    # bump on any change of the extraction logic that changes the stored financials,
+    # so the rows extracted before are found stale by find_stale_financials
+    EXTRACTOR_VERSION = 1
+
     SEC_ARCHIVE_URL = 'https://www.sec.gov/Archives/'
     TICKER_CIK_LIST_URL = 'https://www.sec.gov/include/ticker.txt'
+    TICKER_EXCHANGE_URL = 'https://www.sec.gov/files/company_tickers_exchange.json'
 
     def __init__(self):
-        self.data_access = DataAccess()
+        self.data_access = get_data_access()
+        self.fetcher = get_sec_fetcher()
+        self.cache = get_filing_cache()
+
+    @classmethod
+    def fingerprint(cls) -> str:
+        """
+        @return: fingerprint of the extraction logic and ELEMENT_LIST, stored with every extracted row
+        """
+        payload = json.dumps({'version': cls.EXTRACTOR_VERSION, 'elements': cls.ELEMENT_LIST}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
 
-    def _get_data_by_key(self, soup: BeautifulSoup, keywords: [], doc_filter: str) -> Optional[Dict]:
+    def _get_data_by_key(self, document: 'SoupDocument', keywords: [], doc_filter: str) -> Optional[Dict]:
         """
-        @param soup:
+        @param document:
         @param keywords:
         @param doc_filter:
         @return:
         """
         for key in keywords:
-            element = soup.find(
-                str.lower(key), {"contextref": doc_filter})
+            element = document.find(str.lower(key), doc_filter)
             if element:
-                element_dict = self.parse_element(soup, element)
+                element_dict = document.parse_element(element)
                 if element_dict:
                     return element_dict
 
-    def get_financial_data(self, soup: BeautifulSoup, ticker: str, year: int) -> None:
-        """Extract from passed soup document all financial data_assets according to keywords list
+    def parse_soup(self, data: bytes) -> BeautifulSoup:
+        """Parse the XBRL documents of a filing with BeautifulSoup
         Args:
-            soup BeautifulSoup: The soup document holding the report to parse
-            ticker int: The ticker of the company
-            year int: The year to fetch stocks data_assets
+            data bytes: The full submission .txt filing
         Returns:
-            None
+            The soup of the XBRL documents
         """
-        start = time.time()
+        xbrl_doc = SoupStrainer("xbrl")
+        return BeautifulSoup(data, 'lxml', parse_only=xbrl_doc)
+
+    def parse_document(self, data: bytes) -> Union[BeautifulSoup, XbrlDocument]:
+        """Parse a filing with the parser selected by config.XBRL_PARSER
+        Args:
+            data bytes: The full submission .txt filing
+        Returns:
+            The parsed document, to pass to get_financial_data
+        """
+        if config.XBRL_PARSER == 'soup':
+            return self.parse_soup(data)
+        return XbrlDocument(data)
+
+    @contextmanager
+    def open_archive(self, path: str, prefix: bool = False, required: bool = False) -> Iterator[Iterator[bytes]]:
+        """Open a file of the sec archive, reading through the filing cache when it is enabled
+        Args:
+            path str: The archive path, e.g. edgar/full-index/2018/QTR1/master.idx
+            prefix bool: The reader stops after the XBRL instance, so the cached prefix of a reader stopping
+                there too will do, and the prefix it reads is cached
+            required bool: Raise ArchiveUnavailable when the file could not be fetched
+        Returns:
+            A context manager over the chunks of the file, empty if it could not be fetched
+        """
+        def unavailable(reason: str) -> Iterator[bytes]:
+            if required:
+                raise ArchiveUnavailable(reason)
+            logging.error(reason)
+            return iter([])
+
+        url = f'{self.SEC_ARCHIVE_URL}/{path}'
+        f = self.cache.open(path, prefix) if self.cache is not None else None
+        if f is not None:
+            with f:
+                yield iter(lambda: f.read(config.FILING_CHUNK_SIZE), b'')
+        elif config.SEC_OFFLINE:
+            yield unavailable(f'{path} is not cached, and sec is offline' if self.cache is not None else
+                              f'Cannot fetch {path}, sec is offline and the filing cache is disabled')
+        else:
+            with self.fetcher.get(url, stream=True) as resp:
+                if resp.status_code != 200:
+                    yield unavailable(f'Failed to fetch {url}: {resp.status_code}')
+                    return
+                chunks = resp.iter_content(chunk_size=config.FILING_CHUNK_SIZE)
+                if self.cache is None:
+                    yield chunks
+                    return
+                # cached as it is read, a reader stopping early only caches the prefix it read
+                chunks = self.cache.tee(path, chunks)
+                try:
+                    yield chunks
+                finally:
+                    chunks.close()
+
+    def stream_document(self, txt_url: str) -> XbrlDocument:
+        """Stream a filing and parse its XBRL instance document, closing the transfer as soon as it was read
+        Args:
+            txt_url str: The archive path of the full submission .txt filing
+        Returns:
+            The parsed document
+        """
+        read = 0
+
+        def counted(chunks: Iterator[bytes]) -> Iterator[bytes]:
+            nonlocal read
+            for chunk in chunks:
+                read += len(chunk)
+                yield chunk
+
+        with self.open_archive(txt_url, prefix=True) as chunks:
+            document = XbrlDocument.from_stream(counted(chunks))
+        logging.debug(f"read {read} bytes of {txt_url}")
+        return document
+
+    def download_instance(self, txt_url: str) -> Optional[bytes]:
+        """Read the XBRL instance document of a filing, closing the transfer as soon as it was read
+        Args:
+            txt_url str: The archive path of the full submission .txt filing
+        Returns:
+            The instance document, None if the filing has none
+        Raises:
+            ArchiveUnavailable: The filing could not be fetched
+        """
+        with self.open_archive(txt_url, prefix=True, required=True) as chunks:
+            return read_instance(chunks)
+
+    def extract_financial_data(self, document: Union[BeautifulSoup, XbrlDocument]) -> Tuple[Optional[Dict], str]:
+        """Extract from passed document all financial data_assets according to keywords list
+        Args:
+            document: The soup or XbrlDocument holding the report to parse
+        Returns:
+            The extracted data_assets, or None if the report has no focus date,
+            and the date of the shares outstanding
+        """
+        document = SoupDocument(self, document) if isinstance(document, BeautifulSoup) else document
         element_list = self.ELEMENT_LIST
 
         # get from the report the focus date of the report and shares
-        report_date_focus = soup.find("dei:documentfiscalperiodfocus")
-        report_date = self.parse_element(soup, report_date_focus)
-        shares = soup.find_all("dei:entitycommonstocksharesoutstanding")
+        report_date_focus = document.find("dei:documentfiscalperiodfocus")
         if report_date_focus is None:
-            return
+            return None, 'NA'
+        report_date = document.parse_element(report_date_focus)
+        shares = document.find_all("dei:entitycommonstocksharesoutstanding")
 
         # extract all the data_assets according to the report focus date and the keywords
         filtered_list = []
         for key_name, keywords in element_list.items():
-            report_focus = report_date_focus['contextref']
-            element_dict = self._get_data_by_key(soup, keywords, report_focus)
+            report_focus = report_date_focus.attrs['contextref']
+            element_dict = self._get_data_by_key(document, keywords, report_focus)
             if element_dict:
                 element_dict['name'] = key_name
                 filtered_list.append(element_dict)
             # TODO: check that this makes sense
             else:
-                report_focus = f"FI{report_date_focus['contextref'].strip('FDYT')}"
-                element_dict = self._get_data_by_key(soup, keywords, report_focus)
+                report_focus = f"FI{report_date_focus.attrs['contextref'].strip('FDYT')}"
+                element_dict = self._get_data_by_key(document, keywords, report_focus)
                 if element_dict:
                     element_dict['name'] = key_name
                     filtered_list.append(element_dict)
@@ -112,7 +263,7 @@ class SecGov:
         # calculate total shares
         total_shares = 0
         for share in shares:
-            element_dict = self.parse_element(soup, share, False)
+            element_dict = document.parse_element(share, False)
             if element_dict:
                 total_shares += element_dict['value']
         if len(shares) > 0:
@@ -125,29 +276,60 @@ class SecGov:
         # TBD should this be save? We need to filter what is not interesting for us
         if not data:
             data['None'] = 0
-            logging.info(f'Data for {ticker}  {year} is empty')
 
         # calculated fields
         if 'Assets' in data and 'Liabilities' in data:
             data['TotalEquityGross'] = data['Assets'] - data['Liabilities']
 
-        # make sure that we have prices stored
-        if 'SharesOutstanding' in data:
-            dt = datetime.strptime(element_dict['date'], '%Y-%m-%d')
-            ticker_price = self.data_access.get_price(ticker, dt)
-            data['MarketCap'] = data['SharesOutstanding'] * ticker_price
-
         # make sure we have GrossProfit
         if 'GrossProfit' not in data:
             data['GrossProfit'] = data['Revenue'] - data['Costs']
 
         data['ReportFocus'] = report_date['date']
 
+        shares_date = element_dict['date'] if 'SharesOutstanding' in data else 'NA'
+        return data, shares_date
+
+    def get_financial_data(self, document: Union[BeautifulSoup, XbrlDocument], ticker: str, year: int) -> None:
+        """Extract from passed document all financial data_assets according to keywords list and store them
+        Args:
+            document: The soup or XbrlDocument holding the report to parse
+            ticker int: The ticker of the company
+            year int: The year to fetch stocks data_assets
+        Returns:
+            None
+        """
+        start = time.time()
+        data, shares_date = self.extract_financial_data(document)
+        if data is None:
+            return
+        self.add_market_cap(ticker, data, shares_date)
+
         self.data_access.store_ticker_financials(ticker, year, data)
+        # the source is the txt_url of the same year
+        self.data_access.store_ticker_info(ticker, {f'fingerprint:{year}': self.fingerprint()})
         logging.info(f'successfully stored {ticker} {year} from sec')
         end = time.time()
         logging.debug(f"elapsed time to parse: {(end - start)}")
 
+    def add_market_cap(self, ticker: str, data: Dict, shares_date: str) -> None:
+        """Complete extracted financial data_assets with the market cap at the shares outstanding date
+        Args:
+            ticker str: The ticker of the company
+            data dict: As returned by extract_financial_data
+            shares_date str: As returned by extract_financial_data
+        Returns:
+            None
+        """
+        if 'None' in data:
+            logging.info(f'Data for {ticker} is empty')
+
+        # make sure that we have prices stored
+        if 'SharesOutstanding' in data:
+            dt = datetime.strptime(shares_date, '%Y-%m-%d')
+            ticker_price = self.data_access.get_price(ticker, dt)
+            data['MarketCap'] = data['SharesOutstanding'] * ticker_price
+
     def clean_value(self, string):
         """
         Take a value that's stored as a string,
@@ -156,15 +338,7 @@ class SecGov:
         If it's just a dash, it's taken to mean
         zero.
         """
-        if string.strip() == "-":
-            return 0.0
-
-        try:
-            return float(string.strip().replace(",", "").replace(" ", ""))
-        except:
-            pass
-
-        return string
+        return clean_value(string)
 
     def retrieve_from_context(self, soup, contextref):
         """
@@ -334,36 +508,146 @@ class SecGov:
         is_ixd_stored = self.data_access.is_index_stored(year)
         if not is_ixd_stored:
             logging.info(f"Index file for year {year} is not accessible, fetching from web")
-            for q in range(1, 5):  # 1 to 4 inclusive
-                self._prepare_index(year, q)
+            self.prepare_year_index(year)
 
         if ticker:
-            ticker_cik = self.data_access.get_ticker_cik(ticker)
-            result = self.data_access.get_index_row_by_cik(ticker_cik, year)
-            if result is not None:
-                ticker_info_hash = {
-                    'company_name': result[0],
-                    f'txt_url:{year}': result[1]
-                }
-                self.data_access.store_ticker_info(ticker, ticker_info_hash)
+            if self.resolve_filing(ticker, year):
                 self.fetch_company_data(ticker, year)
                 self.data_access.commit_ticker_data()
             else:
                 logging.info(f'Could not fetch data for {ticker} for year {year}')
         else:
-            idx = self.data_access.get_index_by_year(year)
-            for result in idx:
-                current_ticker = self.data_access.get_ticker_by_cik(result[2])
-                if result is not None:
-                    ticker_info_hash = {
-                        'company_name': result[0],
-                        f'txt_url:{year}': result[1]
-                    }
-                    self.data_access.store_ticker_info(current_ticker, ticker_info_hash)
-                    self.fetch_company_data(ticker, year)
-                else:
-                    logging.info(f'Could not fetch data for {ticker} for year {year}')
-            self.data_access.commit_ticker_data()
+            self.ingest_year(year)
+
+    def ingest_year(self, year: int, retry_failed: bool = False) -> Counter:
+        """Ingest the 10-K of every mapped filer of the year, recording the status of every filing,
+        so a stopped run resumes with the filings that are still pending
+        Args:
+            year int: The year to ingest
+            retry_failed bool: ingest again the filings that failed in previous runs
+        Returns:
+            The number of filings per status, for the filings of this run
+        """
+        if not self.data_access.is_index_stored(year):
+            logging.info(f"Index file for year {year} is not accessible, fetching from web")
+            self.prepare_year_index(year)
+
+        idx = self.data_access.get_index_by_year(year)
+        tickers = self.data_access.get_tickers_by_cik_many([cik for _, _, cik in idx])
+        filings = [(cik, ticker, company, url) for (company, url, cik), ticker in zip(idx, tickers) if ticker]
+        logging.info(f'{len(filings)} of the {len(idx)} filings of {year} are of mapped tickers')
+
+        progress = self.data_access.get_ingest_status(year)
+        new = {cik: PENDING for cik, _, _, _ in filings if cik not in progress}
+        if new:
+            self.data_access.store_ingest_status(year, new)
+            progress.update(new)
+        statuses = {PENDING, FAILED} if retry_failed else {PENDING}
+        todo = [filing for filing in filings if progress[filing[0]] in statuses]
+        logging.info(f'{len(filings) - len(todo)} filings of {year} were already ingested, {len(todo)} to go')
+        if not todo:
+            return Counter()
+
+        self.data_access.store_ticker_info_bulk({ticker: {'company_name': company, f'txt_url:{year}': url}
+                                                 for _, ticker, company, url in todo})
+        cik_by_url = {url: cik for cik, _, _, url in todo}
+        start = time.time()
+        processed = 0
+
+        def on_status(batch: List[Tuple[FilingJob, str]]) -> None:
+            nonlocal processed
+            self.data_access.store_ingest_status(year, {cik_by_url[job.txt_url]: status for job, status in batch})
+            processed += len(batch)
+            elapsed = time.time() - start
+            rate = processed / elapsed if elapsed else 0
+            eta = (len(todo) - processed) / rate if rate else 0
+            logging.info(f'{year}: {processed}/{len(todo)} filings, {rate:.1f} filings/s, '
+                         f'ETA {timedelta(seconds=int(eta))}')
+
+        jobs = (FilingJob(ticker, year, url) for _, ticker, _, url in todo)
+        return IngestPipeline(self, on_status=on_status).run(jobs)
+
+    def resolve_filing(self, ticker: str, year: int) -> Optional[str]:
+        """Find the 10-K of a ticker in the index of the year, and store it in the ticker info
+        Args:
+            ticker str: The ticker name
+            year int: The year
+        Returns:
+            The archive path of the filing, None if there is none
+        """
+        ticker_cik = self.data_access.get_ticker_cik(ticker)
+        result = self.data_access.get_index_row_by_cik(ticker_cik, year)
+        if result is None:
+            return None
+        ticker_info_hash = {
+            'company_name': result[0],
+            f'txt_url:{year}': result[1]
+        }
+        self.data_access.store_ticker_info(ticker, ticker_info_hash)
+        return result[1]
+
+    def fetch_financials_many(self, keys: List[Tuple[str, int]]) -> None:
+        """Fetch the financials of many tickers and years from sec, downloading within the sec rate limit
+        and parsing on every core
+        Args:
+            keys list: (ticker, year) pairs to fetch
+        Returns:
+            None
+        """
+        # prepare the indexes up front, so concurrent fetches of a year don't all build it
+        for year in sorted({year for _, year in keys}):
+            if not self.data_access.is_index_stored(year):
+                logging.info(f"Index file for year {year} is not accessible, fetching from web")
+                self.prepare_year_index(year)
+
+        jobs = []
+        for ticker, year in keys:
+            txt_url = self.resolve_filing(ticker, year)
+            if txt_url:
+                jobs.append(FilingJob(ticker, year, txt_url))
+            else:
+                logging.info(f'Could not fetch data for {ticker} for year {year}')
+
+        counts = IngestPipeline(self).run(jobs)
+        logging.info(f"Fetched {counts[DONE]}/{len(keys)} filings")
+
+    def find_stale_financials(self, years: List[int], tickers: List[str] = None) -> List[FilingJob]:
+        """Find the stored financials extracted by another version of the extraction logic or ELEMENT_LIST.
+        The rows of the financial statement data sets are not extracted from a filing, and are left out
+        Args:
+            years list: The years to check
+            tickers list: The tickers to check, all known tickers if None
+        Returns:
+            The filings of the stale rows
+        """
+        tickers = tickers or self.data_access.get_ticker_list()
+        fingerprint = self.fingerprint()
+        candidates = []
+        for ticker, info in zip(tickers, self.data_access.get_ticker_info_many(tickers)):
+            for year in years:
+                row_fingerprint = info.get(f'fingerprint:{year}')
+                # rows ingested from the financial statement data sets are refreshed by ingesting them again
+                if row_fingerprint and row_fingerprint.startswith(FINGERPRINT_PREFIX):
+                    continue
+                txt_url = info.get(f'txt_url:{year}')
+                if txt_url and row_fingerprint != fingerprint:
+                    candidates.append(FilingJob(ticker, year, txt_url))
+        # a single batch telling which of them are stored
+        stored = self.data_access.get_ticker_fields_many([(job.ticker, job.year) for job in candidates], [])
+        return [job for job, entry in zip(candidates, stored) if entry is not None]
+
+    def reextract_stale(self, years: List[int], tickers: List[str] = None) -> int:
+        """Extract again the stale financials from their source filing, which is read from the filing cache if there
+        Args:
+            years list: The years to check
+            tickers list: The tickers to check, all known tickers if None
+        Returns:
+            The number of re-extracted rows
+        """
+        stale = self.find_stale_financials(years, tickers)
+        logging.info(f'Found {len(stale)} stale financials, re-extracting with fingerprint {self.fingerprint()}')
+
+        return IngestPipeline(self).run(stale)[DONE]
 
     def fetch_company_data(self, ticker: str, year: int) -> None:
         """Fetch the data_assets for the specified company and year from sec
@@ -391,30 +675,143 @@ class SecGov:
         if not txt_url:
             return
 
-        to_get_html_site = f'{self.SEC_ARCHIVE_URL}/{txt_url}'
-        data = requests.get(to_get_html_site).content
+        if config.XBRL_PARSER == 'soup':
+            with self.open_archive(txt_url) as chunks:
+                data = b''.join(chunks)
+            document = self.parse_soup(data)
+        else:
+            document = self.stream_document(txt_url)
 
-        xbrl_doc = SoupStrainer("xbrl")
-        soup = BeautifulSoup(data, 'lxml', parse_only=xbrl_doc)
+        if document:
+            self.get_financial_data(document, ticker, year)
 
-        if soup:
-            self.get_financial_data(soup, ticker, year)
+    def _iter_index_rows(self, path: str, filing: str = '10-K') -> Iterator[Tuple[str, str, str, str]]:
+        """Stream an edgar master index file line by line
+        Args:
+            path str: The archive path of the full or daily master index
+            filing str: The form type to keep
+        Returns:
+            (cik, company, form type, url) tuples of the matching filings
+        """
+        with self.open_archive(path) as chunks:
+            yield from parse_index_rows(chunks, filing)
 
-    def _prepare_index(self, year: int, quarter: int) -> None:
+    def _fetch_index_file(self, path: str, year: int) -> Tuple[int, int]:
+        """Store the rows of an edgar master index file, unless it is unchanged since it was stored last.
+        The ETag and Last-Modified of the stored files are kept, to only fetch them again once they changed
+        Args:
+            path str: The archive path of the full or daily master index
+            year int: The year of the index
+        Returns:
+            The http status of the fetch and the number of stored rows
+        """
+        if config.SEC_OFFLINE:
+            return 200, self.data_access.store_index(self._iter_index_rows(path), year)
+
+        headers = {}
+        state = self.data_access.get_index_file_state(path)
+        if state is not None:
+            etag, last_modified = state
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        count = 0
+        with self.fetcher.get(f'{self.SEC_ARCHIVE_URL}/{path}', stream=True, headers=headers) as resp:
+            if resp.status_code != 200:
+                if resp.status_code != 304:
+                    logging.info(f'Could not fetch index {path}: {resp.status_code}')
+                return resp.status_code, 0
+            etag, last_modified = resp.headers.get('ETag', ''), resp.headers.get('Last-Modified', '')
+            chunks = resp.iter_content(chunk_size=config.FILING_CHUNK_SIZE)
+            if self.cache is None:
+                count = self.data_access.store_index(parse_index_rows(chunks), year)
+            else:
+                # refresh the cached copy, then read it from there
+                self.cache.put_chunks(path, chunks)
+        if self.cache is not None:
+            count = self.data_access.store_index(self._iter_index_rows(path), year)
+        self.data_access.store_index_file_state(path, etag, last_modified)
+        return 200, count
+
+    def _prepare_index(self, year: int, quarter: int) -> int:
         """Prepare the edgar index for the passed year and quarter
         The data_assets will be saved to DB
         Args:
             year int: The year to build the index for
             quarter int: The quarter to build the index between 1-4
         Returns:
-            None
+            The number of inserted rows
         """
-        filing = '|10-K|'
-        download = requests.get(f'{self.SEC_ARCHIVE_URL}/edgar/full-index/{year}/QTR{quarter}/master.idx').content
-        decoded = download.decode("ISO-8859-1").split('\n')
-
-        self.data_access.store_index(decoded, year, filing)
-        logging.info(f"Inserted year {year} qtr {quarter} to DB")
+        start = time.time()
+        _, count = self._fetch_index_file(f'edgar/full-index/{year}/QTR{quarter}/master.idx', year)
+        elapsed = time.time() - start
+        logging.info(f"Inserted year {year} qtr {quarter} to DB: {count} rows in {elapsed:.2f}s "
+                     f"({count / elapsed if elapsed else 0:.0f} rows/s)")
+        return count
+
+    def prepare_year_index(self, year: int) -> int:
+        """Prepare the edgar index of all four quarters of the passed year concurrently
+        Args:
+            year int: The year to build the index for
+        Returns:
+            The number of inserted rows
+        """
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            count = sum(executor.map(lambda quarter: self._prepare_index(year, quarter), range(1, 5)))
+        elapsed = time.time() - start
+        logging.info(f"Inserted year {year} to DB: {count} rows in {elapsed:.2f}s "
+                     f"({count / elapsed if elapsed else 0:.0f} rows/s)")
+        return count
+
+    def refresh_index(self, year: int) -> List[int]:
+        """Bring the edgar index of a year up to date, fetching only the index files that are new or changed:
+        the full index of the completed quarters, and the daily indexes of the current one.
+        The new 10-K of mapped tickers are queued for ingest_year as pending
+        Args:
+            year int: The year to refresh
+        Returns:
+            The ciks of the new index rows
+        """
+        if config.SEC_OFFLINE:
+            logging.info(f'Cannot refresh the {year} index, sec is offline')
+            return []
+        start = time.time()
+        before = set(self.data_access.get_year_index(year))
+        today = date.today()
+        fetched = 0
+        for quarter in range(1, 5):
+            quarter_start = date(year, 3 * quarter - 2, 1)
+            if quarter_start > today:
+                break
+            quarter_end = date(year + 1, 1, 1) if quarter == 4 else date(year, 3 * quarter + 1, 1)
+            if quarter_end <= today:
+                status, _ = self._fetch_index_file(f'edgar/full-index/{year}/QTR{quarter}/master.idx', year)
+                fetched += status == 200
+                continue
+            day = quarter_start
+            while day <= today:
+                path = f'edgar/daily-index/{year}/QTR{quarter}/master.{day:%Y%m%d}.idx'
+                # published daily indexes don't change, only the missing ones are fetched
+                if day.weekday() < 5 and self.data_access.get_index_file_state(path) is None:
+                    status, _ = self._fetch_index_file(path, year)
+                    fetched += status == 200
+                    if status == 404 and day < today - timedelta(days=7):
+                        # a holiday, no index will be published
+                        self.data_access.store_index_file_state(path, '', '')
+                day += timedelta(days=1)
+
+        new_ciks = sorted(set(self.data_access.get_year_index(year)) - before)
+        tickers = self.data_access.get_tickers_by_cik_many(new_ciks)
+        progress = self.data_access.get_ingest_status(year)
+        queued = {cik: PENDING for cik, ticker in zip(new_ciks, tickers) if ticker and cik not in progress}
+        if queued:
+            self.data_access.store_ingest_status(year, queued)
+        logging.info(f'Refreshed the {year} index in {time.time() - start:.1f}s: fetched {fetched} index files, '
+                     f'{len(new_ciks)} new filings, {len(queued)} queued for ingestion')
+        return new_ciks
 
     def fetch_tickers_list(self) -> List[str]:
         """Fetch a list of tickers from sec, and store them in the DB.
@@ -423,7 +820,7 @@ class SecGov:
             a list of tickers
         """
         ticker_list = []
-        resp = requests.get(self.TICKER_CIK_LIST_URL)
+        resp = self.fetcher.get(self.TICKER_CIK_LIST_URL)
         ticker_cik_list_lines = resp.content.decode("utf-8").split('\n')
         for entry in ticker_cik_list_lines:
             ticker, cik = entry.strip().split()
@@ -433,3 +830,39 @@ class SecGov:
             ticker_list.append(ticker)
         logging.info(f'Successfully mapped tickers to cik')
         return ticker_list
+
+    def fetch_ticker_exchanges(self) -> None:
+        """Fetch the exchange of every listed ticker from sec, and store it in the ticker info.
+        Returns:
+            None
+        """
+        resp = self.fetcher.get(self.TICKER_EXCHANGE_URL).json()
+        fields = resp['fields']
+        info = {}
+        for row in resp['data']:
+            entry = dict(zip(fields, row))
+            if entry.get('ticker') and entry.get('exchange'):
+                info[entry['ticker'].lower()] = {'exchange': entry['exchange']}
+        self.data_access.store_ticker_info_bulk(info)
+        logging.info(f'Successfully stored the exchange of {len(info)} tickers')
+
+
+class SoupDocument:
+    """
+    Adapts a BeautifulSoup document to the XbrlDocument lookups used by SecGov.extract_financial_data
+    """
+
+    def __init__(self, sec_gov: SecGov, soup: BeautifulSoup):
+        self.sec_gov = sec_gov
+        self.soup = soup
+
+    def find(self, tag: str, contextref: str = None):
+        if contextref is None:
+            return self.soup.find(tag)
+        return self.soup.find(tag, {"contextref": contextref})
+
+    def find_all(self, tag: str):
+        return self.soup.find_all(tag)
+
+    def parse_element(self, element, check_is_sub_entity: bool = True) -> Dict:
+        return self.sec_gov.parse_element(self.soup, element, check_is_sub_entity)
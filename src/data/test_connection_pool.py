@@ -0,0 +1,43 @@
+import pytest
+from .connection_pool import MySQLConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+def make_pool() -> MySQLConnectionPool:
+    pool = MySQLConnectionPool(max_size=1, checkout_timeout=1)
+    pool._connect = FakeConnection
+    return pool
+
+
+def test_transaction_ends_before_reuse():
+    pool = make_pool()
+    with pool.connection() as connection:
+        pass
+    # the snapshot of the read is not carried over to the next checkout
+    assert connection.rollbacks == 1
+    with pool.connection() as reused:
+        assert reused is connection
+    assert connection.rollbacks == 2
+
+
+def test_rollback_on_error():
+    pool = make_pool()
+    with pytest.raises(ValueError):
+        with pool.connection() as connection:
+            raise ValueError()
+    assert connection.rollbacks == 1
+    with pool.connection() as reused:
+        assert reused is connection
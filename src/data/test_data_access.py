@@ -0,0 +1,115 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from .data_access import DataAccess
+
+TICKER = 'test-tk'
+OTHER_TICKER = 'test-other'
+YEAR = 1990
+START = datetime(1990, 1, 1)
+DAYS = 20
+
+BACKENDS = ['embedded']
+# the Redis/MySQL backend needs running servers, e.g. from docker-compose
+if os.getenv('TEST_REDIS_BACKEND'):
+    BACKENDS.append('redis')
+
+
+@pytest.fixture(params=BACKENDS)
+def da(request, tmp_path) -> DataAccess:
+    DataAccess._year_index.clear()
+    if request.param == 'embedded':
+        from .embedded_data_access import EmbeddedDataAccess
+        yield EmbeddedDataAccess(str(tmp_path / 'findb.sqlite'), str(tmp_path / 'series'))
+    else:
+        from .redis_data_access import RedisDataAccess
+        backend = RedisDataAccess()
+        backend.price_store = type(backend.price_store)(str(tmp_path / 'prices'))
+        yield backend
+        keys = [key for pattern in (f'{TICKER}:*', f'{OTHER_TICKER}:*') for key in backend.redis_client.keys(pattern)]
+        if keys:
+            backend.redis_client.delete(*keys)
+        backend.redis_client.srem(backend.REDIS_TICKER_SET, TICKER, OTHER_TICKER)
+        with backend.db_pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute('DELETE FROM sec_idx WHERE year = %s', (YEAR,))
+            connection.commit()
+    DataAccess._year_index.clear()
+
+
+def test_financials(da):
+    assert not da.is_ticker_stored(TICKER, YEAR)
+    assert da.get_ticker_financials(TICKER, YEAR) == {}
+    da.store_ticker_financials(TICKER, YEAR, {'Revenue': 1.5, 'NetIncome': 2})
+    assert da.is_ticker_stored(TICKER, YEAR)
+    assert da.get_ticker_financials(TICKER, YEAR) == {'Revenue': '1.5', 'NetIncome': '2'}
+    assert da.get_financials_bulk([TICKER, OTHER_TICKER], [YEAR, YEAR + 1]) == {
+        TICKER: {str(YEAR): {'Revenue': '1.5', 'NetIncome': '2'}, str(YEAR + 1): {}},
+        OTHER_TICKER: {str(YEAR): {}, str(YEAR + 1): {}},
+    }
+    assert da.get_ticker_fields_many([(TICKER, YEAR), (TICKER, YEAR + 1)], ['NetIncome', 'Assets']) == [
+        {'NetIncome': '2'}, None
+    ]
+    assert da.get_ticker_fields_many([(TICKER, YEAR)], ['Assets']) == [{}]
+    assert da.get_ticker_fields_many([(TICKER, YEAR), (OTHER_TICKER, YEAR)], []) == [{}, None]
+
+
+def test_ticker_info_and_mapping(da):
+    da.store_ticker_cik_mapping(TICKER, '123')
+    da.store_ticker_info(TICKER, {'company_name': 'Test', f'txt_url:{YEAR}': 'edgar/data/123.txt'})
+    da.store_ticker_info_bulk({TICKER: {'exchange': 'Nasdaq'}})
+    assert da.is_ticker_mapped(TICKER)
+    assert not da.is_ticker_mapped(OTHER_TICKER)
+    assert da.is_ticker_list_exist()
+    assert TICKER in da.get_ticker_list()
+    assert da.get_ticker_cik(TICKER) == '123'
+    assert da.get_ticker_by_cik(123) == TICKER
+    assert da.get_ticker_url(TICKER, YEAR) == 'edgar/data/123.txt'
+    assert da.get_ticker_url(TICKER, YEAR + 1) is None
+
+    da.store_ticker_financials(TICKER, YEAR, {'MarketCap': 1e9})
+    records = da.get_universe_records([TICKER], YEAR)
+    assert records[TICKER]['cik'] == '123'
+    assert records[TICKER]['exchange'] == 'Nasdaq'
+    assert float(records[TICKER]['mktCap']) == 1e9
+
+
+def test_prices(da):
+    dates = [START + timedelta(days=i) for i in range(DAYS)]
+    timestamps = [int(d.timestamp()) for d in dates]
+    assert not da.is_ticker_price_exists(TICKER)
+    assert da.store_ticker_series_bulk(TICKER, timestamps, [10.0 + i for i in range(DAYS)],
+                                       [100.0 * i for i in range(DAYS)], batch_size=7) == DAYS
+    assert da.is_ticker_price_exists(TICKER)
+    assert da.get_missing_price_tickers([TICKER, OTHER_TICKER]) == [OTHER_TICKER]
+    assert da.get_last_price_timestamps([TICKER, OTHER_TICKER]) == [timestamps[-1], None]
+
+    assert da.get_price(TICKER, dates[5]) == 15.0
+    assert da.get_volume(TICKER, dates[5]) == 500.0
+    assert da.get_price(TICKER, START - timedelta(days=1)) == 0
+    assert [price for _, price in da.get_prices(TICKER, dates[2], dates[4])] == [12.0, 13.0, 14.0]
+    assert da.get_prices_at([TICKER, OTHER_TICKER], [dates[0], dates[-1] + timedelta(days=3)]) == {
+        TICKER: [10.0, 10.0 + DAYS - 1],
+        OTHER_TICKER: [0, 0],
+    }
+
+    timestamps_column, prices_column, volumes_column = da.get_price_volume_columns(TICKER)
+    assert timestamps_column.tolist() == timestamps
+    assert prices_column.tolist() == [10.0 + i for i in range(DAYS)]
+    assert volumes_column.tolist() == [100.0 * i for i in range(DAYS)]
+    assert da.get_price_volume_columns(OTHER_TICKER) is None
+
+
+def test_index(da):
+    assert not da.is_index_stored(YEAR)
+    rows = [('123', 'Test', '10-K', 'edgar/data/123.txt'),
+            ('456', 'Other', '10-K', 'edgar/data/456.txt'),
+            ('123', 'Test', '10-K', 'edgar/data/123-2.txt')]
+    assert da.store_index(rows, YEAR, batch_size=2) == 3
+    assert da.is_index_stored(YEAR)
+    # the first 10-K of a company is kept
+    assert da.get_index_row_by_cik(123, YEAR) == ('Test', 'edgar/data/123.txt')
+    assert da.get_index_row_by_cik('456', YEAR) == ('Other', 'edgar/data/456.txt')
+    assert da.get_index_row_by_cik(789, YEAR) is None
+    assert sorted(da.get_index_by_year(YEAR)) == [('Other', 'edgar/data/456.txt', 456),
+                                                  ('Test', 'edgar/data/123.txt', 123)]
@@ -0,0 +1,60 @@
+import os
+
+from .filing_cache import FilingCache
+
+
+def test_put_get(tmp_path):
+    cache = FilingCache(str(tmp_path))
+    data = b'CIK|Company Name|Form Type|Date Filed|Filename\n' * 100
+    cache.put_chunks('edgar/full-index/2018/QTR1/master.idx', [data[:7], data[7:]])
+    assert 'edgar/full-index/2018/QTR1/master.idx' in cache
+    assert 'edgar/full-index/2018/QTR2/master.idx' not in cache
+    assert cache.get('edgar/full-index/2018/QTR1/master.idx') == data
+    assert cache.get('edgar/full-index/2018/QTR2/master.idx') is None
+    # compressed on disk
+    assert cache.size() < len(data)
+
+
+def test_same_content_stored_once(tmp_path):
+    cache = FilingCache(str(tmp_path))
+    cache.put('a.txt', b'filing')
+    cache.put('b.txt', b'filing')
+    assert len(cache) == 2
+    assert len(os.listdir(os.path.join(str(tmp_path), 'objects'))) == 1
+    assert cache.get('b.txt') == b'filing'
+
+
+def test_evict_least_recently_read(tmp_path):
+    cache = FilingCache(str(tmp_path), max_bytes=10 ** 6)
+    for name in ['a', 'b', 'c']:
+        cache.put(f'{name}.txt', os.urandom(1000))
+    cache.get('a.txt')
+    cache.max_bytes = 2500
+    cache.evict()
+    assert 'a.txt' in cache
+    assert 'b.txt' not in cache
+    assert 'c.txt' in cache
+
+
+def test_tee_caches_the_prefix_read(tmp_path):
+    cache = FilingCache(str(tmp_path))
+    chunks = [b'<XBRL>', b'instance', b'</XBRL>', b'exhibits']
+    reader = cache.tee('a.txt', iter(chunks))
+    assert next(reader) == b'<XBRL>'
+    assert next(reader) == b'instance'
+    reader.close()
+    # only readers stopping early too get the prefix
+    assert 'a.txt' not in cache
+    with cache.open('a.txt', prefix=True) as f:
+        assert f.read() == b'<XBRL>instance'
+
+    assert list(cache.tee('a.txt', iter(chunks))) == chunks
+    assert cache.get('a.txt') == b''.join(chunks)
+    # a prefix doesn't replace the whole file
+    reader = cache.tee('a.txt', iter(chunks))
+    next(reader)
+    reader.close()
+    assert cache.get('a.txt') == b''.join(chunks)
+    # no temporary file is left behind
+    objects = os.path.join(str(tmp_path), 'objects')
+    assert not [name for name in os.listdir(objects) if name.endswith('.tmp.gz')]
@@ -0,0 +1,46 @@
+import zipfile
+
+from .fs_datasets import FinancialStatementDataSet
+from .sec_gov import SecGov
+
+SUB = """adsh\tcik\tname\tsic\tform\tperiod\tfy\tfp\tfiled
+0000000001-19-000001\t1\tACME INC\t3570\t10-K\t20181231\t2018\tFY\t20190220
+0000000001-19-000002\t1\tACME INC\t3570\t10-Q\t20190331\t2019\tQ1\t20190501
+"""
+
+NUM = """adsh\ttag\tversion\tcoreg\tddate\tqtrs\tuom\tvalue\tfootnote
+0000000001-19-000001\tRevenues\tus-gaap/2018\t\t20181231\t4\tUSD\t900000.0000\t
+0000000001-19-000001\tRevenues\tus-gaap/2018\t\t20171231\t4\tUSD\t800000.0000\t
+0000000001-19-000001\tRevenues\tus-gaap/2018\tSubsidiary\t20181231\t4\tUSD\t400000.0000\t
+0000000001-19-000001\tSalesRevenueNet\tus-gaap/2018\t\t20181231\t4\tUSD\t1.0000\t
+0000000001-19-000001\tCostOfRevenue\tus-gaap/2018\t\t20181231\t4\tUSD\t500000.0000\t
+0000000001-19-000001\tNetIncomeLoss\tus-gaap/2018\t\t20181231\t4\tUSD\t-120000.0000\t
+0000000001-19-000001\tLiabilities\tus-gaap/2018\t\t20181231\t0\tUSD\t300000.0000\t
+0000000001-19-000001\tAssets\tus-gaap/2018\t\t20181231\t0\tUSD\t800000.0000\t
+0000000001-19-000001\tEntityCommonStockSharesOutstanding\tdei/2018\t\t20190215\t0\tshares\t1250000.0000\t
+0000000001-19-000002\tRevenues\tus-gaap/2018\t\t20190331\t1\tUSD\t200000.0000\t
+"""
+
+
+def test_iter_records(tmp_path):
+    path = str(tmp_path / '2019q1.zip')
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('sub.txt', SUB)
+        archive.writestr('num.txt', NUM)
+
+    records = list(FinancialStatementDataSet(path, SecGov.ELEMENT_LIST).iter_records())
+    assert len(records) == 1
+    submission, data, shares_date = records[0]
+    assert (submission.cik, submission.year) == (1, 2019)
+    assert data == {
+        'Revenue': 900000.0,
+        'Costs': 500000.0,
+        'NetIncome': -120000.0,
+        'Liabilities': 300000.0,
+        'Assets': 800000.0,
+        'SharesOutstanding': 1250000.0,
+        'TotalEquityGross': 500000.0,
+        'GrossProfit': 400000.0,
+        'ReportFocus': '2018-12-31',
+    }
+    assert shares_date == '2019-02-15'
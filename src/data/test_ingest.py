@@ -0,0 +1,82 @@
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import ingest
+from .ingest import DONE, FAILED, NO_XBRL, FilingJob, IngestPipeline
+from .test_sec_gov import make_sec_gov
+from .test_xbrl_extractor import FILING, SCHEMA
+from .xbrl_extractor import read_instance
+
+
+def test_pipeline(tmp_path):
+    sec_gov = make_sec_gov(tmp_path)
+    instance = read_instance([FILING + SCHEMA])
+    filings = {'a.txt': instance, 'b.txt': instance, 'no-xbrl.txt': None}
+
+    def download_instance(txt_url):
+        return filings[txt_url]
+
+    sec_gov.download_instance = download_instance
+    statuses = []
+    jobs = [FilingJob('aaa', 2018, 'a.txt'), FilingJob('bbb', 2018, 'b.txt'),
+            FilingJob('ccc', 2018, 'no-xbrl.txt'), FilingJob('ddd', 2018, 'missing.txt')]
+    counts = IngestPipeline(sec_gov, downloaders=2, parsers=2, batch_size=2, on_status=statuses.extend).run(jobs)
+
+    assert counts == {DONE: 2, NO_XBRL: 1, FAILED: 1}
+    assert sorted((job.ticker, status) for job, status in statuses) == \
+        [('aaa', DONE), ('bbb', DONE), ('ccc', NO_XBRL), ('ddd', FAILED)]
+    financials = sec_gov.data_access.get_ticker_financials('aaa', 2018)
+    assert financials['Revenue'] == '900000.0'
+
+
+def test_ingest_year_resumes(tmp_path):
+    sec_gov = make_sec_gov(tmp_path)
+    da = sec_gov.data_access
+    da.store_index([('1', 'A Inc', '10-K', 'a.txt'), ('2', 'B Inc', '10-K', 'b.txt'),
+                    ('3', 'Unmapped Inc', '10-K', 'c.txt')], 2018)
+    da.store_ticker_cik_mapping('aaa', '1')
+    da.store_ticker_cik_mapping('bbb', '2')
+    instance = read_instance([FILING + SCHEMA])
+    downloaded = []
+
+    def download_instance(txt_url):
+        downloaded.append(txt_url)
+        if txt_url == 'b.txt':
+            raise IOError('connection reset')
+        return instance
+
+    sec_gov.download_instance = download_instance
+    assert sec_gov.ingest_year(2018) == {DONE: 1, FAILED: 1}
+    assert da.get_ingest_status(2018) == {1: DONE, 2: FAILED}
+    assert da.get_ticker_url('aaa', 2018) == 'a.txt'
+
+    downloaded.clear()
+    assert sec_gov.ingest_year(2018) == {}
+    assert downloaded == []
+
+    sec_gov.ingest_year(2018, retry_failed=True)
+    assert downloaded == ['b.txt']
+
+
+class BrokenPool(ProcessPoolExecutor):
+
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool('a parser process died')
+
+
+def test_pipeline_survives_a_broken_pool(tmp_path, monkeypatch):
+    sec_gov = make_sec_gov(tmp_path)
+    instance = read_instance([FILING + SCHEMA])
+    sec_gov.download_instance = lambda txt_url: instance
+    monkeypatch.setattr(ingest, 'ProcessPoolExecutor', BrokenPool)
+    # more jobs than the downloads queue holds
+    jobs = [FilingJob(f't{i}', 2018, f'{i}.txt') for i in range(20)]
+    counts = Counter()
+    runner = threading.Thread(target=lambda: counts.update(IngestPipeline(sec_gov, downloaders=2, parsers=1).run(jobs)),
+                              daemon=True)
+    runner.start()
+    runner.join(timeout=10)
+    assert not runner.is_alive()
+    assert counts == {FAILED: 20}
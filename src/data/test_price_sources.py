@@ -0,0 +1,39 @@
+import calendar
+from datetime import datetime
+
+from . import ticker_price
+from .embedded_data_access import EmbeddedDataAccess
+from .price_sources import DirectoryPriceSource
+
+CSV = """Date,Open,High,Low,Close,Volume
+2018-01-02,1,1,1,10.5,100
+2018-01-03,1,1,1,11.0,200
+2018-01-04,1,1,1,,0
+2018-01-05,1,1,1,11.5,300
+"""
+
+
+def test_directory_source(tmp_path):
+    (tmp_path / 'aaa.csv').write_text(CSV)
+    source = DirectoryPriceSource(str(tmp_path))
+    history = source.history(['aaa', 'bbb'])
+    assert list(history) == ['aaa']
+    # dates are taken as UTC midnight, like the yfinance index
+    assert history['aaa'].timestamps.tolist() == [calendar.timegm((2018, 1, day, 0, 0, 0)) for day in [2, 3, 5]]
+    assert history['aaa'].close.tolist() == [10.5, 11.0, 11.5]
+    assert source.history(['aaa'], datetime(2018, 1, 3))['aaa'].volume.tolist() == [200, 300]
+
+
+def test_refresh_prices(tmp_path, monkeypatch):
+    prices_dir = tmp_path / 'prices'
+    prices_dir.mkdir()
+    (prices_dir / 'aaa.csv').write_text(CSV)
+    (prices_dir / 'bbb.csv').write_text(CSV)
+    da = EmbeddedDataAccess(str(tmp_path / 'findb.sqlite'), str(tmp_path / 'series'))
+    monkeypatch.setattr(ticker_price, 'get_data_access', lambda: da)
+    source = DirectoryPriceSource(str(prices_dir))
+
+    assert ticker_price.refresh_prices(['aaa'], source=source) == (3, 0)
+    # aaa is up to date, its last bar is fetched again and skipped
+    assert ticker_price.refresh_prices(['aaa', 'bbb', 'ccc'], download_batch=1, source=source) == (3, 1)
+    assert da.get_prices('bbb', datetime(2018, 1, 1), datetime(2018, 1, 6))[-1][1] == 11.5
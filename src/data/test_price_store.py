@@ -0,0 +1,85 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from .price_store import COLUMNS, PriceStore
+
+TICKER = 'tk'
+START = datetime(2018, 1, 1)
+DAYS = 30
+
+
+def make_store(tmp_path) -> PriceStore:
+    store = PriceStore(str(tmp_path))
+    # trading days only, no samples on weekends
+    dates = [START + timedelta(days=i) for i in range(DAYS) if (START + timedelta(days=i)).weekday() < 5]
+    store.write(TICKER,
+                [int(d.timestamp()) for d in dates],
+                [100.0 + i for i in range(len(dates))],
+                [1000.0 * i for i in range(len(dates))])
+    return store
+
+
+def test_as_of_price(tmp_path):
+    store = make_store(tmp_path)
+    # 2018-01-01 is a Monday, so Saturday the 6th resolves to Friday's close
+    assert store.get_price(TICKER, START) == 100.0
+    assert store.get_price(TICKER, START + timedelta(days=5)) == 104.0
+    assert store.get_volume(TICKER, START + timedelta(days=5)) == 4000.0
+
+
+def test_as_of_out_of_range(tmp_path):
+    store = make_store(tmp_path)
+    assert store.get_price(TICKER, START - timedelta(days=1)) == 0
+    assert store.get_price(TICKER, START + timedelta(days=DAYS + 30)) == 0
+    assert store.get_price('missing', START) is None
+
+
+def test_range_is_a_view(tmp_path):
+    store = make_store(tmp_path)
+    series = store.get_range(TICKER, START + timedelta(days=7), START + timedelta(days=11))
+    assert list(series.close) == [105.0, 106.0, 107.0, 108.0, 109.0]
+    assert series.close.base is not None
+
+
+def test_sees_series_replaced_by_another_store(tmp_path):
+    store = make_store(tmp_path)
+    assert store.get_price(TICKER, START) == 100.0
+    # e.g. the exporter or another worker process
+    other = PriceStore(str(tmp_path))
+    other.write(TICKER, [int(START.timestamp())], [42.0], [1.0])
+    assert store.get_price(TICKER, START) == 42.0
+    assert len(store.load(TICKER).timestamps) == 1
+
+
+def test_write_swaps_the_whole_series(tmp_path):
+    store = make_store(tmp_path)
+    for close in [1.0, 2.0]:
+        PriceStore(str(tmp_path)).write(TICKER, [int(START.timestamp())], [close], [1.0])
+    assert store.get_price(TICKER, START) == 2.0
+    # a single version is left, and no temporary file
+    names = os.listdir(str(tmp_path))
+    assert len(names) == 2 and f'{TICKER}.current' in names
+    with pytest.raises(ValueError):
+        store.write(TICKER, [1, 2], [1.0], [1.0])
+
+
+def test_reads_the_unversioned_layout(tmp_path):
+    store = PriceStore(str(tmp_path))
+    for column, values in [('timestamps', [int(START.timestamp())]), ('close', [7.0]), ('volume', [1.0])]:
+        np.save(str(tmp_path / f'{TICKER}.{column}.npy'), np.asarray(values, dtype=COLUMNS[column]))
+    assert store.get_price(TICKER, START) == 7.0
+    store.upsert(TICKER, [int(START.timestamp())], close=[8.0])
+    assert store.get_price(TICKER, START) == 8.0
+    assert not (tmp_path / f'{TICKER}.timestamps.npy').exists()
+
+
+def test_as_of_skips_missing_values(tmp_path):
+    store = make_store(tmp_path)
+    # a volume only sample, e.g. from add_volume, has no close
+    store.upsert(TICKER, [int((START + timedelta(days=6)).timestamp())], volume=[5.0])
+    assert store.get_price(TICKER, START + timedelta(days=6)) == 104.0
+    assert store.get_volume(TICKER, START + timedelta(days=6)) == 5.0
+    store.write(TICKER, [int(START.timestamp())], [float('nan')], [1.0])
+    assert store.get_price(TICKER, START) == 0
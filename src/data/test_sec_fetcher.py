@@ -0,0 +1,37 @@
+import time
+
+import requests
+from .sec_fetcher import SecFetcher, TokenBucket
+
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    # the first token is available at once, the other ten at 50 per second
+    assert time.monotonic() - start >= 0.19
+
+
+def make_response(status: int) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = b''
+    resp._content_consumed = True
+    resp.headers['Retry-After'] = '0'
+    return resp
+
+
+def test_retry_throttled_requests(monkeypatch):
+    fetcher = SecFetcher(rate=1000, max_in_flight=2, retries=3, backoff=0)
+    statuses = iter([429, 503, 200])
+    monkeypatch.setattr(fetcher.session, 'get', lambda url, **kwargs: make_response(next(statuses)))
+    assert fetcher.get('https://www.sec.gov/x').status_code == 200
+
+    statuses = iter([500] * 4)
+    assert fetcher.get('https://www.sec.gov/x').status_code == 500
+
+
+def test_map_keeps_order():
+    fetcher = SecFetcher(rate=1000, max_in_flight=4)
+    assert fetcher.map(lambda i: i * i, range(10)) == [i * i for i in range(10)]
@@ -0,0 +1,120 @@
+import pytest
+from src.common import config
+
+from .embedded_data_access import EmbeddedDataAccess
+from .filing_cache import FilingCache
+from .fs_datasets import fingerprint
+from .sec_gov import ArchiveUnavailable, SecGov
+
+
+def make_sec_gov(tmp_path) -> SecGov:
+    # the year index cache is shared by all instances, across DBs
+    EmbeddedDataAccess._year_index.clear()
+    sec_gov = SecGov.__new__(SecGov)
+    sec_gov.data_access = EmbeddedDataAccess(str(tmp_path / 'findb.sqlite'), str(tmp_path / 'series'))
+    return sec_gov
+
+
+def test_find_stale_financials(tmp_path):
+    sec_gov = make_sec_gov(tmp_path)
+    da = sec_gov.data_access
+    for ticker in ['fresh', 'stale', 'missing', 'data-set']:
+        da.store_ticker_cik_mapping(ticker, '1')
+        da.store_ticker_info(ticker, {'txt_url:2018': f'edgar/data/{ticker}.txt'})
+    for ticker in ['fresh', 'stale', 'data-set']:
+        da.store_ticker_financials(ticker, 2018, {'Revenue': 1})
+    da.store_ticker_info('fresh', {'fingerprint:2018': SecGov.fingerprint()})
+    da.store_ticker_info('stale', {'fingerprint:2018': 'old'})
+    da.store_ticker_info('data-set', {'fingerprint:2018': fingerprint(SecGov.ELEMENT_LIST)})
+
+    assert sec_gov.find_stale_financials([2018]) == [('stale', 2018, 'edgar/data/stale.txt')]
+    assert sec_gov.find_stale_financials([2018], ['fresh']) == []
+
+
+class FakeResponse:
+
+    def __init__(self, status_code: int, content: bytes = b'', etag: str = ''):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'ETag': etag} if etag else {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+
+class FakeFetcher:
+
+    def __init__(self, files):
+        self.files = files
+        self.requests = []
+
+    def get(self, url, stream=False, headers=None):
+        path = url.split('Archives//')[-1]
+        self.requests.append((path, headers))
+        content = self.files.get(path)
+        if content is None:
+            return FakeResponse(404)
+        etag = f'"{len(content)}"'
+        if headers and headers.get('If-None-Match') == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, content, etag)
+
+
+def index_file(*rows):
+    header = b'CIK|Company Name|Form Type|Date Filed|Filename\n--------\n'
+    return header + b''.join(f'{cik}|{company}|{form}|2018-03-01|{url}\n'.encode() for cik, company, form, url in rows)
+
+
+def test_refresh_index(tmp_path):
+    sec_gov = make_sec_gov(tmp_path)
+    sec_gov.cache = None
+    da = sec_gov.data_access
+    da.store_ticker_cik_mapping('aaa', '1')
+    da.store_ticker_cik_mapping('bbb', '2')
+    files = {f'edgar/full-index/2018/QTR{quarter}/master.idx': index_file() for quarter in range(1, 5)}
+    files['edgar/full-index/2018/QTR1/master.idx'] = index_file((1, 'A Inc', '10-K', 'a.txt'),
+                                                                (1, 'A Inc', '8-K', 'a8.txt'))
+    sec_gov.fetcher = FakeFetcher(files)
+
+    assert sec_gov.refresh_index(2018) == [1]
+    assert da.get_index_row_by_cik(1, 2018) == ('A Inc', 'a.txt')
+    assert da.get_ingest_status(2018) == {1: 'pending'}
+
+    # unchanged files are not fetched again
+    files['edgar/full-index/2018/QTR2/master.idx'] = index_file((2, 'B Inc', '10-K', 'b.txt'))
+    sec_gov.fetcher.requests.clear()
+    assert sec_gov.refresh_index(2018) == [2]
+    assert all(headers.get('If-None-Match') for _, headers in sec_gov.fetcher.requests)
+    assert da.get_ingest_status(2018) == {1: 'pending', 2: 'pending'}
+
+
+def test_download_stops_early_with_the_cache(tmp_path, monkeypatch):
+    sec_gov = make_sec_gov(tmp_path)
+    sec_gov.cache = FilingCache(str(tmp_path / 'filings'))
+    # the exhibits span many chunks
+    filing = b'<SEC-DOCUMENT>\n<XBRL>\n<xbrl><fact contextRef="c">1</fact></xbrl>\n</XBRL>\n' + b'exhibit ' * 10 ** 5
+    sec_gov.fetcher = FakeFetcher({'edgar/data/1.txt': filing})
+    instance = sec_gov.download_instance('edgar/data/1.txt')
+    assert instance.startswith(b'<xbrl>')
+    # the rest of the filing wasn't downloaded, only the prefix read is cached
+    assert 'edgar/data/1.txt' not in sec_gov.cache
+
+    # extracted again offline from the cached prefix
+    monkeypatch.setattr(config, 'SEC_OFFLINE', True)
+    sec_gov.fetcher.requests.clear()
+    assert sec_gov.download_instance('edgar/data/1.txt') == instance
+    with pytest.raises(ArchiveUnavailable):
+        sec_gov.download_instance('edgar/data/2.txt')
+    assert sec_gov.fetcher.requests == []
+    monkeypatch.setattr(config, 'SEC_OFFLINE', False)
+
+    with sec_gov.open_archive('edgar/data/1.txt') as chunks:
+        assert b''.join(chunks) == filing
+    assert sec_gov.cache.get('edgar/data/1.txt') == filing
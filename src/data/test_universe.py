@@ -0,0 +1,44 @@
+import os
+
+from .universe import UniverseIndex
+
+RECORDS = {
+    'aaa': dict(cik='1', mktCap='5e9', exchange='Nasdaq', industry='Software', currency='USD'),
+    'bbb': dict(cik='2', mktCap='2e8', exchange='NYSE', industry='Banks', currency='USD'),
+    'ccc': dict(cik='3', mktCap='9e10', exchange='Nasdaq', industry='Semiconductors', currency='USD'),
+    'ddd': dict(cik='4', mktCap=None, exchange='OTC', industry=None, currency='EUR'),
+}
+
+
+def test_select_by_category():
+    universe = UniverseIndex.from_records(2018, RECORDS)
+    assert universe.select(exchanges=['Nasdaq']) == ['aaa', 'ccc']
+    assert universe.select(exchanges=['Nasdaq', 'NYSE'], industries=['Banks']) == ['bbb']
+    assert universe.select(currencies=['EUR']) == ['ddd']
+    assert universe.select(industries=['Unknown']) == []
+
+
+def test_select_by_mkt_cap():
+    universe = UniverseIndex.from_records(2018, RECORDS)
+    assert universe.select(min_mkt_cap=1e9) == ['aaa', 'ccc']
+    assert universe.select(min_mkt_cap=1e9, max_mkt_cap=9e10) == ['aaa']
+    assert universe.select(tickers=['bbb', 'ccc', 'zzz'], max_mkt_cap=1e12) == ['bbb', 'ccc']
+
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / 'universe.npz')
+    UniverseIndex.from_records(2018, RECORDS).save(path)
+    universe = UniverseIndex.load(path)
+    assert universe.year == 2018
+    assert 'ddd' in universe
+    assert universe.select(exchanges=['OTC']) == ['ddd']
+    assert UniverseIndex.load(str(tmp_path / 'missing.npz')) is None
+    # no temporary file is left behind
+    assert os.listdir(str(tmp_path)) == ['universe.npz']
+
+
+def test_select_keeps_unknown_mkt_cap():
+    universe = UniverseIndex.from_records(2018, RECORDS)
+    assert universe.select(min_mkt_cap=1e9, max_mkt_cap=1e12) == ['aaa', 'ccc']
+    assert universe.select(min_mkt_cap=1e9, max_mkt_cap=1e12, unknown_mkt_cap=True) == ['aaa', 'ccc', 'ddd']
+    assert universe.select(exchanges=['NYSE'], min_mkt_cap=1e9, unknown_mkt_cap=True) == []
@@ -0,0 +1,100 @@
+from .sec_gov import SecGov
+from .xbrl_extractor import XbrlDocument
+
+FILING = b"""<SEC-DOCUMENT>0000000001-19-000001.txt
+<DOCUMENT>
+<TYPE>EX-101.INS
+<TEXT>
+<XBRL>
+<?xml version="1.0" encoding="utf-8"?>
+<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:dei="http://xbrl.sec.gov/dei/2018-01-31"
+    xmlns:us-gaap="http://fasb.org/us-gaap/2018-01-31" xmlns:xbrldi="http://xbrl.org/2006/xbrldi">
+  <xbrli:context id="FD2018Q4YTD">
+    <xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0000000001</xbrli:identifier></xbrli:entity>
+    <xbrli:period><xbrli:startDate>2018-01-01</xbrli:startDate><xbrli:endDate>2018-12-31</xbrli:endDate></xbrli:period>
+  </xbrli:context>
+  <xbrli:context id="FI2018Q4">
+    <xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0000000001</xbrli:identifier></xbrli:entity>
+    <xbrli:period><xbrli:instant>2018-12-31</xbrli:instant></xbrli:period>
+  </xbrli:context>
+  <xbrli:context id="FD2018Q4YTD_segment">
+    <xbrli:entity>
+      <xbrli:identifier scheme="http://www.sec.gov/CIK">0000000001</xbrli:identifier>
+      <xbrli:segment><xbrldi:explicitMember dimension="us-gaap:StatementBusinessSegmentsAxis">acme:ToolsMember</xbrldi:explicitMember></xbrli:segment>
+    </xbrli:entity>
+    <xbrli:period><xbrli:startDate>2018-01-01</xbrli:startDate><xbrli:endDate>2018-12-31</xbrli:endDate></xbrli:period>
+  </xbrli:context>
+  <xbrli:context id="I2019Q1_class_a">
+    <xbrli:entity>
+      <xbrli:identifier scheme="http://www.sec.gov/CIK">0000000001</xbrli:identifier>
+      <xbrli:segment><xbrldi:explicitMember dimension="us-gaap:StatementClassOfStockAxis">us-gaap:CommonClassAMember</xbrldi:explicitMember></xbrli:segment>
+    </xbrli:entity>
+    <xbrli:period><xbrli:instant>2019-02-15</xbrli:instant></xbrli:period>
+  </xbrli:context>
+  <xbrli:context id="I2019Q1_class_b">
+    <xbrli:entity>
+      <xbrli:identifier scheme="http://www.sec.gov/CIK">0000000001</xbrli:identifier>
+      <xbrli:segment><xbrldi:explicitMember dimension="us-gaap:StatementClassOfStockAxis">us-gaap:CommonClassBMember</xbrldi:explicitMember></xbrli:segment>
+    </xbrli:entity>
+    <xbrli:period><xbrli:instant>2019-02-15</xbrli:instant></xbrli:period>
+  </xbrli:context>
+  <xbrli:unit id="usd"><xbrli:measure>iso4217:USD</xbrli:measure></xbrli:unit>
+  <xbrli:unit id="shares"><xbrli:measure>xbrli:shares</xbrli:measure></xbrli:unit>
+  <dei:DocumentFiscalPeriodFocus contextRef="FD2018Q4YTD">FY</dei:DocumentFiscalPeriodFocus>
+  <dei:EntityCommonStockSharesOutstanding contextRef="I2019Q1_class_a" unitRef="shares" decimals="INF">1,000,000</dei:EntityCommonStockSharesOutstanding>
+  <dei:EntityCommonStockSharesOutstanding contextRef="I2019Q1_class_b" unitRef="shares" decimals="INF">250000</dei:EntityCommonStockSharesOutstanding>
+  <us-gaap:Revenues contextRef="FD2018Q4YTD_segment" unitRef="usd" decimals="-3">400000</us-gaap:Revenues>
+  <us-gaap:Revenues contextRef="FD2018Q4YTD" unitRef="usd" decimals="-3">900000</us-gaap:Revenues>
+  <us-gaap:CostOfRevenue contextRef="FD2018Q4YTD" unitRef="usd" decimals="-3">500000</us-gaap:CostOfRevenue>
+  <us-gaap:NetIncomeLoss contextRef="FD2018Q4YTD" unitRef="usd" decimals="-3" sign="-">120000</us-gaap:NetIncomeLoss>
+  <us-gaap:Liabilities contextRef="FI2018Q4" unitRef="usd" decimals="-3">300000</us-gaap:Liabilities>
+  <us-gaap:Assets contextRef="FI2018Q4" unitRef="usd" decimals="-3">800000</us-gaap:Assets>
+</xbrli:xbrl>
+</XBRL>
+</TEXT>
+</DOCUMENT>
+"""
+
+SCHEMA = b"""<DOCUMENT>
+<TYPE>EX-101.SCH
+<TEXT>
+<XBRL>
+<?xml version="1.0" encoding="utf-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"/>
+</XBRL>
+</TEXT>
+</DOCUMENT>
+</SEC-DOCUMENT>
+"""
+
+
+def test_extract_financial_data_parity():
+    sec_gov = SecGov.__new__(SecGov)
+    soup_data = sec_gov.extract_financial_data(sec_gov.parse_soup(FILING + SCHEMA))
+    lxml_data = sec_gov.extract_financial_data(XbrlDocument(FILING + SCHEMA))
+    assert lxml_data == soup_data
+    data, shares_date = lxml_data
+    assert data['Revenue'] == 900000
+    assert data['NetIncome'] == -120000
+    assert data['Liabilities'] == 300000
+    assert data['SharesOutstanding'] == 1250000
+    assert data['GrossProfit'] == 400000
+    assert data['ReportFocus'] == '2018-12-31'
+    assert shares_date == '2019-02-15'
+
+
+def test_from_stream_stops_after_instance():
+    filing = FILING + SCHEMA
+    chunk_size = 7
+    read = []
+
+    def chunks():
+        for i in range(0, len(filing), chunk_size):
+            read.append(i)
+            yield filing[i:i + chunk_size]
+
+    document = XbrlDocument.from_stream(chunks())
+    assert document.facts == XbrlDocument(filing).facts
+    assert document.ids == XbrlDocument(filing).ids
+    # the transfer stopped within a chunk of the instance end marker
+    assert read[-1] < len(FILING)
@@ -1,13 +1,128 @@
-import yfinance as yf
-from src.data.data_access import DataAccess
-
-
-def fetch_ticker_price_volume(ticker: str) -> None:
-    yf_ticker = yf.Ticker(ticker)
-    da = DataAccess()
-    # allowed periods are: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max
-    price_history = yf_ticker.history(period="max")
-    for index, row in price_history.iterrows():
-        da.store_ticker_price(ticker, int(index.timestamp()), row['Close'])
-        da.store_ticker_volume(ticker, int(index.timestamp()), row['Volume'])
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from src.common import config
+from src.data.data_access import DataAccess, get_data_access
+from src.data.price_sources import PriceSource, get_price_source
+from src.data.price_store import PriceSeries
+
+
+def _append_bars(da: DataAccess, ticker: str, series: PriceSeries, last_timestamp: Optional[int],
+                 batch_size: int, log_level: int = logging.INFO) -> Tuple[int, int]:
+    """
+    :param log_level: of the throughput line, refresh_prices logs it per batch instead of per ticker
+    :return: number of new bars, and of bars that were already stored
+    """
+    start = time.time()
+    new = series.timestamps > last_timestamp if last_timestamp is not None else slice(None)
+    timestamps = series.timestamps[new].tolist()
+    skipped = len(series.timestamps) - len(timestamps)
+    if not timestamps:
+        return 0, skipped
+    written = da.store_ticker_series_bulk(ticker, timestamps, series.close[new].tolist(),
+                                         series.volume[new].tolist(), batch_size)
     da.commit_ticker_data()
+
+    elapsed = time.time() - start
+    rate = written / elapsed if elapsed else 0
+    logging.log(log_level,
+                f'stored {written}/{len(timestamps)} price rows for {ticker} in {elapsed:.2f}s ({rate:.0f} rows/s)')
+    return len(timestamps), skipped
+
+
+def _start_of(last_timestamp: Optional[int]) -> Optional[datetime]:
+    # from the day of the last stored bar, which is skipped
+    if last_timestamp is None:
+        return None
+    return datetime.utcfromtimestamp(last_timestamp).replace(hour=0, minute=0, second=0)
+
+
+def fetch_ticker_price_volume(ticker: str, batch_size: int = config.PRICE_BATCH_SIZE,
+                              incremental: bool = True, source: PriceSource = None) -> Tuple[int, int]:
+    """
+    Fetch the price history of a ticker and store it
+    :param ticker:
+    :param batch_size: number of samples per write
+    :param incremental: only fetch the bars after the last stored one, and append them
+    :param source: defaults to get_price_source()
+    :return: number of new bars, and of fetched bars that were already stored
+    """
+    da = get_data_access()
+    last_timestamp = da.get_last_price_timestamps([ticker])[0] if incremental else None
+    series = (source or get_price_source()).history([ticker], _start_of(last_timestamp)).get(ticker)
+    if series is None:
+        logging.info(f'No price history for {ticker}')
+        return 0, 0
+    return _append_bars(da, ticker, series, last_timestamp, batch_size)
+
+
+def refresh_prices(tickers: List[str], batch_size: int = config.PRICE_BATCH_SIZE,
+                   download_batch: int = config.PRICE_DOWNLOAD_BATCH, source: PriceSource = None) -> Tuple[int, int]:
+    """
+    Append the missing bars of every passed ticker, downloading many tickers at once
+    :param tickers:
+    :param batch_size: number of samples per write
+    :param download_batch: number of tickers per download
+    :param source: defaults to get_price_source()
+    :return: number of new bars, and of fetched bars that were already stored
+    """
+    start = time.time()
+    da = get_data_access()
+    source = source or get_price_source()
+    last_timestamps = dict(zip(tickers, da.get_last_price_timestamps(tickers)))
+    # tickers without prices need their whole history, the others are downloaded with
+    # the ones of a close last bar, so the shared start of a download fetches few extra bars
+    new_tickers = [ticker for ticker in tickers if last_timestamps[ticker] is None]
+    stored_tickers = sorted((ticker for ticker in tickers if last_timestamps[ticker] is not None),
+                            key=last_timestamps.get)
+    batches = [group[i:i + download_batch] for group in [new_tickers, stored_tickers]
+               for i in range(0, len(group), download_batch)]
+
+    total_new = total_skipped = done = 0
+    for batch in batches:
+        batch_new = 0
+        batch_start = _start_of(last_timestamps[batch[0]])
+        try:
+            history = source.history(batch, batch_start)
+        except Exception as error:
+            logging.error(f'Failed to download the prices of {len(batch)} tickers: {error}')
+            continue
+        write_start = time.time()
+        for ticker in batch:
+            series = history.get(ticker)
+            if series is None:
+                logging.info(f'No price history for {ticker}')
+                continue
+            new, skipped = _append_bars(da, ticker, series, last_timestamps[ticker], batch_size, logging.DEBUG)
+            batch_new += new
+            total_skipped += skipped
+        total_new += batch_new
+        done += len(batch)
+        write_elapsed = time.time() - write_start
+        elapsed = time.time() - start
+        logging.info(f'refreshed {done}/{len(tickers)} tickers ({done / elapsed if elapsed else 0:.1f} tickers/s), '
+                     f'stored {batch_new} price rows in {write_elapsed:.2f}s '
+                     f'({batch_new / write_elapsed if write_elapsed else 0:.0f} rows/s)')
+    logging.info(f'refreshed {len(tickers)} tickers in {time.time() - start:.0f}s: '
+                 f'{total_new} new bars, {total_skipped} skipped')
+    return total_new, total_skipped
+
+
+def main():
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Append the missing price bars of the tickers')
+    parser.add_argument("tickers",
+                        nargs='*',
+                        help="The tickers to refresh, all known tickers if omitted")
+    args = parser.parse_args()
+
+    tickers = args.tickers or get_data_access().get_ticker_list()
+    refresh_prices(tickers)
+
+
+if __name__ == "__main__":
+    main()
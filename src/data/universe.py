@@ -0,0 +1,197 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from src.common import config
+
+# categorical columns, stored as int16 codes into a per-column vocabulary
+CATEGORIES = ['exchange', 'industry', 'currency']
+UNKNOWN = -1
+
+
+class UniverseIndex:
+    """
+    Compact per-ticker metadata (CIK, exchange, industry, currency and market cap) of the ticker universe,
+    with secondary indexes to select sub-universes without loading any financials.
+    """
+
+    def __init__(self, year: int, tickers: np.ndarray, cik: np.ndarray, mkt_cap: np.ndarray,
+                 codes: Dict[str, np.ndarray], vocabularies: Dict[str, np.ndarray]):
+        """
+        :param year: the year the market caps were taken from
+        :param tickers: ticker names
+        :param cik: CIK per ticker, 0 if unknown
+        :param mkt_cap: market cap per ticker, NaN if unknown
+        :param codes: category name to the int16 code per ticker, UNKNOWN if missing
+        :param vocabularies: category name to the values the codes point to
+        """
+        self.year = year
+        self.tickers = tickers
+        self.cik = cik
+        self.mkt_cap = mkt_cap
+        self.codes = codes
+        self.vocabularies = vocabularies
+
+        # secondary indexes
+        self._row_by_ticker = {ticker: row for row, ticker in enumerate(tickers.tolist())}
+        self._rows_by_value: Dict[str, Dict[str, np.ndarray]] = {}
+        for category in CATEGORIES:
+            category_codes = codes[category]
+            self._rows_by_value[category] = {
+                value: np.flatnonzero(category_codes == code)
+                for code, value in enumerate(vocabularies[category].tolist())
+            }
+        known_caps = np.flatnonzero(~np.isnan(mkt_cap))
+        self._rows_by_mkt_cap = known_caps[np.argsort(mkt_cap[known_caps], kind='stable')]
+        self._sorted_mkt_cap = mkt_cap[self._rows_by_mkt_cap]
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._row_by_ticker
+
+    @classmethod
+    def from_records(cls, year: int, records: Dict[str, Dict]) -> 'UniverseIndex':
+        """
+        :param year:
+        :param records: ticker to a dict with any of the keys cik, mktCap, exchange, industry and currency
+        :return:
+        """
+        tickers = sorted(records)
+        cik = np.array([int(records[t].get('cik') or 0) for t in tickers], dtype=np.int64)
+        mkt_cap = np.array([float(records[t].get('mktCap') or np.nan) for t in tickers], dtype=np.float64)
+        codes = {}
+        vocabularies = {}
+        for category in CATEGORIES:
+            values = [records[t].get(category) for t in tickers]
+            vocabulary = sorted({value for value in values if value})
+            code_of = {value: code for code, value in enumerate(vocabulary)}
+            codes[category] = np.array([code_of.get(value, UNKNOWN) for value in values], dtype=np.int16)
+            vocabularies[category] = np.array(vocabulary, dtype=str)
+        return cls(year, np.array(tickers, dtype=str), cik, mkt_cap, codes, vocabularies)
+
+    def save(self, path: str = config.UNIVERSE_INDEX_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        arrays = {'year': np.array(self.year), 'tickers': self.tickers, 'cik': self.cik, 'mkt_cap': self.mkt_cap}
+        for category in CATEGORIES:
+            arrays[f'{category}_codes'] = self.codes[category]
+            arrays[f'{category}_vocabulary'] = self.vocabularies[category]
+        # a temp file of its own, so concurrent builds don't write into each other's
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp.npz', dir=os.path.dirname(path) or '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str = config.UNIVERSE_INDEX_PATH) -> Optional['UniverseIndex']:
+        """
+        :param path:
+        :return: the persisted index, or None if it was never built
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as arrays:
+            return cls(
+                year=int(arrays['year']),
+                tickers=arrays['tickers'],
+                cik=arrays['cik'],
+                mkt_cap=arrays['mkt_cap'],
+                codes={category: arrays[f'{category}_codes'] for category in CATEGORIES},
+                vocabularies={category: arrays[f'{category}_vocabulary'] for category in CATEGORIES}
+            )
+
+    def _category_mask(self, category: str, values: Iterable[str]) -> np.ndarray:
+        mask = np.zeros(len(self.tickers), dtype=bool)
+        rows_by_value = self._rows_by_value[category]
+        for value in values:
+            rows = rows_by_value.get(value)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def _mkt_cap_mask(self, min_mkt_cap: float = None, max_mkt_cap: float = None) -> np.ndarray:
+        first = 0 if min_mkt_cap is None else np.searchsorted(self._sorted_mkt_cap, min_mkt_cap, side='right')
+        last = (len(self._sorted_mkt_cap) if max_mkt_cap is None
+                else np.searchsorted(self._sorted_mkt_cap, max_mkt_cap, side='left'))
+        mask = np.zeros(len(self.tickers), dtype=bool)
+        mask[self._rows_by_mkt_cap[first:last]] = True
+        return mask
+
+    def select(self, tickers: Iterable[str] = None, exchanges: Iterable[str] = None,
+               industries: Iterable[str] = None, currencies: Iterable[str] = None,
+               min_mkt_cap: float = None, max_mkt_cap: float = None, unknown_mkt_cap: bool = False) -> List[str]:
+        """
+        Select the sub-universe matching all the passed criteria, None means no restriction.
+        Market cap bounds are exclusive, like Filter, and tickers with an unknown value never match a criterion,
+        except an unknown market cap when unknown_mkt_cap is set.
+        :param tickers: restrict the selection to these tickers
+        :param exchanges:
+        :param industries:
+        :param currencies:
+        :param min_mkt_cap:
+        :param max_mkt_cap:
+        :param unknown_mkt_cap: let the tickers without a market cap pass the market cap bounds
+        :return: the matching tickers, in index order
+        """
+        if tickers is None:
+            mask = np.ones(len(self.tickers), dtype=bool)
+        else:
+            mask = np.zeros(len(self.tickers), dtype=bool)
+            rows = [self._row_by_ticker[t] for t in tickers if t in self._row_by_ticker]
+            mask[rows] = True
+
+        for category, values in zip(CATEGORIES, [exchanges, industries, currencies]):
+            if values is not None:
+                mask &= self._category_mask(category, values)
+        if min_mkt_cap is not None or max_mkt_cap is not None:
+            mkt_cap_mask = self._mkt_cap_mask(min_mkt_cap, max_mkt_cap)
+            if unknown_mkt_cap:
+                mkt_cap_mask |= np.isnan(self.mkt_cap)
+            mask &= mkt_cap_mask
+        return self.tickers[mask].tolist()
+
+
+def build(year: int, tickers: List[str] = None) -> UniverseIndex:
+    """
+    Build the universe index from the stored ticker info and financials
+    :param year: the year to take the market cap from
+    :param tickers: defaults to every known ticker
+    :return:
+    """
+    from src.data.data_access import get_data_access
+    da = get_data_access()
+    tickers = tickers or da.get_ticker_list()
+    records = da.get_universe_records(tickers, year)
+    universe = UniverseIndex.from_records(year, records)
+    logging.info(f'built universe index of {len(universe)} tickers for {year}')
+    return universe
+
+
+def main():
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Build the ticker universe index')
+    parser.add_argument("year",
+                        type=int,
+                        help="The year to take market caps from")
+    parser.add_argument("--exchanges",
+                        action='store_true',
+                        help="Refresh the ticker exchanges from sec first")
+    args = parser.parse_args()
+
+    if args.exchanges:
+        from src.data.sec_gov import SecGov
+        SecGov().fetch_ticker_exchanges()
+    build(args.year).save()
+
+
+if __name__ == "__main__":
+    main()
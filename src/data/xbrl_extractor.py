@@ -0,0 +1,353 @@
+import argparse
+import logging
+import re
+import sys
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from dateutil import parser
+from lxml import etree
+
+# A fact of the instance document. name is the lower case prefixed tag, e.g. us-gaap:revenues,
+# attrs are keyed by lower case local names, e.g. contextref
+XbrlElement = namedtuple('XbrlElement', ['name', 'attrs', 'text'])
+
+# An element with an id attribute (contexts and units). descendants holds the text of the
+# first descendant of every tag, which is all the parser ever looks up in them
+IdElement = namedtuple('IdElement', ['text', 'descendants'])
+
+# EDGAR wraps every XBRL document of a submission in upper case <XBRL> tags,
+# unlike the lower case root of the instance document itself
+XBRL_SECTION = re.compile(rb'<XBRL>(.*?)</XBRL>', re.DOTALL)
+# only instance documents have facts, which all have a context
+CONTEXT_REF = re.compile(rb'contextref=', re.IGNORECASE)
+XBRL_START = b'<XBRL>'
+XBRL_END = b'</XBRL>'
+
+DATE_TAG_LIST = ["xbrli:enddate",
+                 "xbrli:instant",
+                 "xbrli:period",
+                 "enddate",
+                 "instant",
+                 "period"]
+
+
+def clean_value(string):
+    """
+    Take a value that's stored as a string,
+    clean it and convert to numeric.
+
+    If it's just a dash, it's taken to mean
+    zero.
+    """
+    if string.strip() == "-":
+        return 0.0
+
+    try:
+        return float(string.strip().replace(",", "").replace(" ", ""))
+    except:
+        pass
+
+    return string
+
+
+def _tag_name(element) -> str:
+    local_name = etree.QName(element).localname
+    return f'{element.prefix}:{local_name}'.lower() if element.prefix else local_name.lower()
+
+
+def _attrs(element) -> Dict[str, str]:
+    return {etree.QName(key).localname.lower(): value for key, value in element.attrib.items()}
+
+
+def _text(element) -> str:
+    return ''.join(element.itertext())
+
+
+def _xbrl_sections(data: bytes) -> List[bytes]:
+    """
+    The XBRL documents of a full submission .txt filing, or the data itself if it is a bare instance document
+    """
+    sections = [section.strip() for section in XBRL_SECTION.findall(data)]
+    return sections or [data.strip()]
+
+
+class _SectionStream:
+    """
+    Splits a stream of filing chunks into the chunks of its XBRL sections, without buffering more than a chunk
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def _read(self) -> bool:
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        self._buffer += chunk
+        return True
+
+    def next_section(self) -> bool:
+        """
+        Skip the stream up to the start of the next XBRL section
+        :return: False if the stream ended first
+        """
+        while True:
+            i = self._buffer.find(XBRL_START)
+            if i >= 0:
+                self._buffer = self._buffer[i + len(XBRL_START):]
+                return True
+            # keep a possibly split marker
+            self._buffer = self._buffer[-(len(XBRL_START) - 1):]
+            if not self._read():
+                return False
+
+    def section_chunks(self) -> Iterator[bytes]:
+        """
+        :return: the chunks of the current section, up to its end marker, with the leading whitespace stripped
+        """
+        started = False
+        keep = len(XBRL_END) - 1
+        while True:
+            i = self._buffer.find(XBRL_END)
+            if i >= 0:
+                data, self._buffer = self._buffer[:i], self._buffer[i + len(XBRL_END):]
+                ended = True
+            elif len(self._buffer) > keep:
+                data, self._buffer = self._buffer[:-keep], self._buffer[-keep:]
+                ended = False
+            else:
+                data, ended = b'', False
+            if not started:
+                data = data.lstrip()
+                started = bool(data)
+            if data:
+                yield data
+            if ended:
+                return
+            if not self._read():
+                # truncated filing, parse what we got
+                if self._buffer:
+                    yield self._buffer
+                    self._buffer = b''
+                return
+
+
+def read_instance(chunks: Iterable[bytes]) -> Optional[bytes]:
+    """
+    Read the XBRL instance document of a streamed filing, i.e. its first XBRL section holding facts,
+    and stop reading the stream once it closes
+    :param chunks: the filing, e.g. response.iter_content()
+    :return: the instance document, or None if the filing has none
+    """
+    stream = _SectionStream(chunks)
+    while stream.next_section():
+        section = b''.join(stream.section_chunks())
+        if CONTEXT_REF.search(section):
+            return section
+    return None
+
+
+class XbrlDocument:
+    """
+    XBRL filing parsed in a single lxml iterparse pass into a fact index by tag name and a map of the elements
+    with an id (contexts and units), offering the lookups SecGov does on a BeautifulSoup document.
+    """
+
+    def __init__(self, data: bytes = None):
+        """
+        :param data: a full submission .txt filing, or an XBRL instance document
+        """
+        self.facts: Dict[str, List[XbrlElement]] = {}
+        self.ids: Dict[str, IdElement] = {}
+        if data is not None:
+            for section in _xbrl_sections(data):
+                self._index([section])
+
+    @classmethod
+    def from_stream(cls, chunks: Iterable[bytes]) -> 'XbrlDocument':
+        """
+        Parse the first XBRL section of a streamed filing that holds facts, which is the instance document,
+        and stop reading the stream once it closes. Only a chunk and the open top level element are held in memory.
+        :param chunks: the filing, e.g. response.iter_content()
+        :return:
+        """
+        document = cls()
+        stream = _SectionStream(chunks)
+        while stream.next_section():
+            document._index(stream.section_chunks())
+            if document.facts:
+                break
+        return document
+
+    def _index(self, chunks: Iterable[bytes]) -> None:
+        root = None
+        xml_parser = etree.XMLPullParser(events=('start', 'end'), recover=True, huge_tree=True)
+        try:
+            for chunk in chunks:
+                xml_parser.feed(chunk)
+                root = self._index_events(xml_parser, root)
+            xml_parser.close()
+            self._index_events(xml_parser, root)
+        except etree.XMLSyntaxError as error:
+            logging.debug(f'stopped parsing xbrl section: {error}')
+
+    def _index_events(self, xml_parser: etree.XMLPullParser, root):
+        for event, element in xml_parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+            if not isinstance(element.tag, str):
+                # comments and processing instructions
+                continue
+            self._index_element(element)
+            # top level elements are fully indexed once they end, drop them to bound memory
+            if element.getparent() is root:
+                element.clear()
+                while element.getprevious() is not None:
+                    del root[0]
+        return root
+
+    def _index_element(self, element) -> None:
+        attrs = _attrs(element)
+        element_id = attrs.get('id')
+        if element_id and element_id not in self.ids:
+            descendants = {}
+            for descendant in element.iterdescendants():
+                if isinstance(descendant.tag, str):
+                    descendants.setdefault(_tag_name(descendant), _text(descendant))
+            self.ids[element_id] = IdElement(_text(element), descendants)
+        if 'contextref' in attrs:
+            name = _tag_name(element)
+            self.facts.setdefault(name, []).append(XbrlElement(name, attrs, _text(element)))
+
+    def find(self, tag: str, contextref: str = None) -> Optional[XbrlElement]:
+        """
+        :param tag: lower case prefixed tag name
+        :param contextref: if passed, only match facts of that context
+        :return: the first matching fact
+        """
+        for element in self.facts.get(tag, []):
+            if contextref is None or element.attrs.get('contextref') == contextref:
+                return element
+        return None
+
+    def find_all(self, tag: str) -> List[XbrlElement]:
+        return self.facts.get(tag, [])
+
+    def retrieve_from_context(self, contextref: str) -> str:
+        try:
+            contents = self.ids[contextref].descendants["xbrldi:explicitmember"].split(":")[-1].strip()
+        except:
+            contents = ""
+        return contents
+
+    def retrieve_unit(self, element: XbrlElement) -> str:
+        try:
+            unit_str = self.ids[element.attrs['unitref']].text
+        except:
+            try:
+                unit_str = element.attrs['unitref']
+            except:
+                return "NA"
+
+        return unit_str.strip()
+
+    def retrieve_date(self, element: XbrlElement) -> str:
+        for tag in DATE_TAG_LIST:
+            try:
+                return parser.parse(self.ids[element.attrs['contextref']].descendants[tag]).date().isoformat()
+            except:
+                pass
+
+        try:
+            return parser.parse(element.attrs['contextref']).date().isoformat()
+        except:
+            pass
+
+        return "NA"
+
+    def parse_element(self, element: XbrlElement, check_is_sub_entity: bool = True) -> Dict:
+        """
+        Same as SecGov.parse_element, for a fact of this document
+        """
+        # no context so we can't extract data
+        if "contextref" not in element.attrs:
+            return {}
+
+        # check if this is a subentity
+        if check_is_sub_entity:
+            context = self.ids.get(element.attrs['contextref'])
+            if context and "xbrli:segment" in context.descendants:
+                return {}
+
+        element_dict = {}
+
+        # Basic name and value
+        try:
+            # Method for XBRLi docs first
+            element_dict['name'] = element.attrs['name'].lower().split(":")[-1]
+        except:
+            # Method for XBRL docs second
+            element_dict['name'] = element.name.split(":")[-1]
+
+        element_dict['value'] = element.text
+        element_dict['unit'] = self.retrieve_unit(element)
+        element_dict['date'] = self.retrieve_date(element)
+
+        # If there's no value retrieved, try raiding the associated context data
+        if element_dict['value'] == "":
+            element_dict['value'] = self.retrieve_from_context(element.attrs['contextref'])
+
+        # If the value has a defined unit (eg a currency) convert to numeric
+        if element_dict['unit'] != "NA":
+            element_dict['value'] = clean_value(element_dict['value'])
+
+        # Retrieve sign of element if exists
+        try:
+            element_dict['sign'] = element.attrs['sign']
+
+            # if it's negative, convert the value then and there
+            if element_dict['sign'].strip() == "-":
+                element_dict['value'] = 0.0 - element_dict['value']
+        except:
+            pass
+
+        return element_dict
+
+
+def main():
+    """
+    Compare the per filing parse time of the BeautifulSoup and the lxml extractors on local filings
+    """
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    arg_parser = argparse.ArgumentParser(description='Benchmark the XBRL extractors on local filings')
+    arg_parser.add_argument("filings",
+                            nargs='+',
+                            help="Paths of full submission .txt filings")
+    args = arg_parser.parse_args()
+
+    from src.data.sec_gov import SecGov
+    sec_gov = SecGov()
+    for path in args.filings:
+        with open(path, 'rb') as filing:
+            data = filing.read()
+
+        start = time.time()
+        soup_data = sec_gov.extract_financial_data(sec_gov.parse_soup(data))
+        soup_time = time.time() - start
+
+        start = time.time()
+        lxml_data = sec_gov.extract_financial_data(XbrlDocument(data))
+        lxml_time = time.time() - start
+
+        parity = 'same data' if soup_data == lxml_data else 'DIFFERENT data'
+        print(f'{path}: soup {soup_time:.3f}s, lxml {lxml_time:.3f}s, '
+              f'speedup {soup_time / lxml_time if lxml_time else 0:.1f}x, {parity}')
+
+
+if __name__ == "__main__":
+    main()